@@ -8,7 +8,9 @@ PLOT = {  # noqa: F811
     'title_prefix': '',  # 标题前缀，如果不为空则会添加到标题前
     'distribution': {
         'figsize': (25, 15),
-        'subplot_layout': (5, 4)
+        'subplot_layout': (5, 4),  # 分页总览时每页的网格（行数, 列数）
+        'paginate': False,  # 是否分页输出总览图（列数很多时建议开启）
+        'page_format': 'pdf'  # 分页格式：'pdf' 多页PDF 或 'png' 带编号的PNG
     },
     'boxplot': {
         'figsize': (20, 10)
@@ -18,6 +20,18 @@ PLOT = {  # noqa: F811
     'enable_group_boxplot': False,  # 控制是否生成分组箱线图
     'enable_all_columns_compare': False,  # 控制是否生成整体分组对比图
     'enable_correlation': False,  # 控制是否生成相关性分析图
+    'enable_spc': False,  # 控制是否生成SPC控制图（按 Time 排序，输出到 spc 子目录）
+    'spc': {
+        'chart': 'auto',  # 控制图类型：'auto'、'xbar_r'、'xbar_s' 或 'imr'（auto: 子组大小1为I-MR，不超过10为X̄-R，否则为X̄-S）
+        'subgroup_size': 5,  # 子组大小（连续的行数），为1时绘制单值-移动极差图
+        'rules': [1, 2, 3, 4],  # 启用的 Western Electric 判异规则
+        'figsize': (15, 8)
+    },
+    'enable_pareto': False,  # 控制是否生成NG柏拉图（整体和每个分组各一张，输出到 pareto 子目录）
+    'pareto': {
+        'top_n': 20,  # 图中最多显示的数据列数（表格包含全部有超限的数据列），0 表示全部显示
+        'figsize': (12, 6)
+    },
 }
 
 # 数据配置
@@ -28,7 +42,20 @@ DATA = {
 # 输出配置
 OUTPUT = {
     'subfolder': 'output',
-    'correlation_dir': 'correlation_analysis'  # 相关性分析图的输出目录
+    'correlation_dir': 'correlation_analysis',  # 相关性分析图的输出目录
+    'render_cache': True,  # 是否启用渲染缓存，数据和配置未变化的图表直接复用上次的结果
+    'render_cache_dir': '',  # 渲染缓存目录，为空时使用输出子文件夹下的 .render_cache
+    'async_write': True,  # 是否在后台线程中编码和写出图表/Excel，与下一张图表的渲染重叠
+    'write_workers': 2,  # 后台写出的线程数
+    'write_queue_size': 8,  # 同时等待写出的文件数上限，达到上限时绘图暂停等待（背压）
+    'archive': False,  # 是否把全部输出写入一个ZIP文件（含 manifest.json 索引），适合网络共享等小文件写入很慢的位置
+    'statistics_export': 'legacy',  # 统计导出方式：'legacy' 每个目录一个 statistics_summary.xlsx（文本格式），'combined' 整体和各分组合并为一个 statistics.xlsx（数值格式），'both' 两者都导出
+    'statistics_sidecar': '',  # 额外导出的统计长表：''（不导出）、'csv' 或 'parquet'（需要 pyarrow，未安装时改为CSV）
+    'dataset_export': '',  # 导出清理后的数据集：''（不导出）、'parquet' 或 'feather'（需要 pyarrow），规格限保存在文件元数据中
+    'dataset_chunk_rows': 100000,  # 数据集分块写出的行数
+    'unit_yield': False,  # 导出单元良率 unit_yield.xlsx（每个单元的PASS/FAIL和第一个超限项、每列的超限单元数、整体和各分组的良率）
+    'results_db': False,  # 结果数据库（python cli.py trend 查询）：False 不记录，True 使用输出子文件夹下的 results.sqlite，也可以填写路径（多个数据目录共享）
+    'sn_index': False,  # 同时把每个测量行（SN、Camera_S、时间、结果和全部测量值）写入结果数据库，按SN追溯历次测量（python cli.py trace SN）；数据库随运行次数持续增长（百万行、上百列约1GB/次），需要时再开启
 }
 
 # 数据预处理配置
@@ -36,9 +63,36 @@ DATA_PROCESSING = {
     'remove_duplicates': False,
     'remove_null': True,
     'remove_invalid': True,
+    'time_windows': {
+        'enabled': False,  # 是否按时间窗口（班次、天、ISO周）分析，输出到 time_windows 子目录
+        'rules': ['day'],  # 窗口规则：'shift'、'day'、'week'
+        'shifts': [  # 班次日历（开始时间），跨午夜的班次归属开始的那一天
+            {'name': '白班', 'start': '08:00'},
+            {'name': '夜班', 'start': '20:00'},
+        ],
+        'min_rows': 2,  # 行数少于该值的窗口被跳过
+    },
+    'retest': {
+        'enabled': False,  # 是否分析复测（同一SN多次测试），导出直通率、最终良率、复测次数分布和每列的复测挽回数到 retest.xlsx；需要关闭 remove_duplicates
+    },
+    'repeatability': {
+        'enabled': False,  # 是否由复测（同一SN多次测量）估计每列的测量重复性，导出到 repeatability.xlsx（statistics_export 为 'combined' 或 'both' 时为 statistics.xlsx 的“重复性”工作表）；需要关闭 remove_duplicates
+        'sigma_multiplier': 6.0,  # 公差占比 PctTolerance = sigma_multiplier * 重复性σ / (USL - LSL)，也常用 5.15
+    },
+    'outliers': {
+        'enabled': False,  # 是否检测异常值，结果导出到 outliers.xlsx（每列的阈值汇总和每个异常值的明细）
+        'rules': ['iqr', 'mad', 'zscore'],  # 检测规则：'iqr'、'mad'、'zscore'、'grubbs'
+        'iqr_k': 1.5,  # IQR规则：超出 [Q1 - k*IQR, Q3 + k*IQR]（1.5 与箱线图的离群点一致）
+        'mad_k': 3.5,  # MAD规则：修正Z分数超过该值
+        'z_k': 3.0,  # Z分数规则：偏离均值超过 k 倍标准差
+        'grubbs_alpha': 0.05,  # Grubbs 检验的显著性水平
+        'exclude': False,  # 排除模式：被标记的值不参与统计表（Test、Mean、Std、CPK、NG）的计算和统计导出，单元良率等 PASS/FAIL 判定仍使用原始测量值
+    },
     'group_analysis': {
         'enabled': True,           # 是否启用分组分析
-        'group_by': 'Line',        # 分组列名
+        'group_by': 'Line',        # 分组列名，多级分组时为列名列表，如 ['Line', 'Fixture']
+        'max_combinations': 1000,  # 分组组合数上限，超过时跳过分组分析
+        'cube': False,             # 是否计算并导出统计立方体（各分组列组合及小计，group_cube.xlsx）
         # 'plot_types': {
         #     'distribution': True,   # 是否生成分组分布图
         #     'boxplot': True,       # 是否生成分组箱线图
@@ -48,6 +102,11 @@ DATA_PROCESSING = {
     }
 }
 
+# 分析流程配置
+PIPELINE = {
+    'max_workers': 4,  # 任务图执行器的线程数，相互独立的数据处理和导出任务并发执行
+}
+
 # 数据列配置
 DATA_COLUMNS = {
     'patterns': [  # 数据列的匹配模式列表
@@ -58,4 +117,11 @@ DATA_COLUMNS = {
     ],
     'skip_columns': 5,  # 跳过前5列，其余列作为数据列
     'selection_mode': 'pattern'  # 'pattern' 或 'skip'，用于选择数据列的方式
-} 
\ No newline at end of file
+} 
+
+# 诊断配置
+DIAGNOSTICS = {
+    'trace': False,  # 记录各阶段耗时，并在输出目录写入 trace.json（Chrome trace / Perfetto）和 timing_summary.csv
+    'memory': False,  # 记录各阶段的内存峰值（tracemalloc/RSS）和打开的图表数，并在输出目录写入 memory_profile.csv
+    'max_open_figures': 0,  # 内存诊断时每个任务结束后允许保持打开的图表数，超过时报错（FigureLeakError）
+}
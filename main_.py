@@ -10,9 +10,6 @@ def main():
     
     # 让 finite values 警告只显示一次
     warnings.filterwarnings('once', message='posx and posy should be finite values')
-    # 添加matplotlib的warning过滤
-    plt.rcParams.update({'figure.max_open_warning': 0})
-    
     try:
         data_path = check_path(config.DATA['path'])
         output_dir = analyze_data(data_path, config)
@@ -1,12 +1,38 @@
 import os
+import shutil
+import sqlite3
+import time
+from dataclasses import dataclass, field, fields
+from functools import partial
+from typing import List, Optional, Union
 import pandas as pd
 import matplotlib.pyplot as plt
 import numpy as np
-from .data_processing import clean_data, get_data_columns, preprocess_data
-from .distribution_plots import plot_distributions, plot_single_distribution, export_statistics_to_excel
+from .data_processing import (clean_data, get_data_columns, preprocess_data,
+                              get_group_columns, add_group_key, group_label, GROUP_KEY_SEPARATOR)
+from .distribution_plots import (plot_distributions, plot_single_distribution,
+                                 save_distribution_pages, export_statistics_to_excel)
 from .box_plots import plot_boxplots, plot_group_boxplots, plot_all_columns_by_group
 from .utils import get_output_dir
 from .correlation_plots import plot_correlations    
+from .render_cache import get_render_cache, save_figure_cached, data_digest
+from .pipeline import TaskGraph, StageTimer
+from .progress import ProgressTracker, AnalysisCancelled
+from .instrument import TRACER
+from .memory_profile import MemoryProfiler
+from .output_writer import get_output_writer
+from .statistics_export import compute_statistics, export_statistics_workbook
+from .dataset_export import export_dataset
+from .results_store import ResultsStore, get_results_db_path
+from .spc import compute_spc, export_spc_summary, plot_control_chart
+from .time_windows import (build_time_index, window_statistics, plot_window_trend,
+                           export_window_statistics, DEFAULT_SHIFTS)
+from .stats_cube import StatsCube, CardinalityError, build_stats_cube, export_stats_cube
+from .outliers import OUTLIER_RULES, detect_outliers, exclude_outliers, export_outliers
+from .unit_yield import compute_unit_yield, export_unit_yield
+from .pareto import OVERALL_SCOPE, pareto_tables, plot_pareto, export_pareto
+from .retest import RetestResult, compute_retest, export_retest
+from .repeatability import compute_repeatability, export_repeatability
 
 def setup_matplotlib():
     """设置matplotlib的基本配置"""
@@ -15,10 +41,11 @@ def setup_matplotlib():
     # 解决负号显示问题
     plt.rcParams['axes.unicode_minus'] = False
 
-def create_output_dirs(data_path):
+def create_output_dirs(data_path, writer=None):
     """创建输出目录结构
     Args:
         data_path: 数据文件路径
+        writer: 输出写入器，归档输出时目录位于本地暂存位置
     Returns:
         output_dir: 主输出目录
         single_dist_dir: 单个分布图目录
@@ -31,6 +58,8 @@ def create_output_dirs(data_path):
     
     # 添加时间戳到目录名
     output_dir = f"{base_output_dir}_{timestamp}"
+    if writer is not None:
+        output_dir = writer.begin(output_dir)
     
     # 创建单个分布图的子目录
     single_dist_dir = os.path.join(output_dir, 'single_distributions')
@@ -41,55 +70,177 @@ def create_output_dirs(data_path):
     
     return output_dir, single_dist_dir
 
-def generate_plots(df, data_columns, data_df, lsl_values, usl_values, output_dir, single_dist_dir, config, is_group_data=False):
-    """生成所有基本图表"""
-    # 导出统计数据到Excel
-    export_statistics_to_excel(df, config, output_dir, is_group_data)
-    
-    # 生成并保存总体分布图
-    if config.PLOT.get('enable_distribution', True):
-        print("\n生成分布图...")
-        plot_distributions(df, config)
-        plt.savefig(os.path.join(output_dir, 'distribution_plots.png'))
-        plt.close()
-        
-        # 为每个数据列生成单独的分布图
-        for col in data_columns:
-            fig = plot_single_distribution(data_df, col, lsl_values, usl_values, config)
-            plt.savefig(os.path.join(single_dist_dir, f'{col}.png'))
-            plt.close(fig)
-    
-    # 生成并保存箱线图
-    if config.PLOT.get('enable_boxplot', True):
-        print("\n生成箱线图...")
-        plot_boxplots(df, config)
-        plt.savefig(os.path.join(output_dir, 'boxplot.png'))
-        plt.close()
-    
-    # 生成相关性分析图
-    if config.PLOT.get('enable_correlation', True):
-        print("\n生成相关性分析图...")
-        plot_correlations(df, config)
+def _limits(lsl_values, usl_values, columns):
+    """提取指定列的规格限，用作缓存键的一部分"""
+    return tuple(
+        (float(lsl_values[col]) if lsl_values is not None else None,
+         float(usl_values[col]) if usl_values is not None else None)
+        for col in columns
+    )
 
-def analyze_data(data_path: str, config: object) -> str:
-    """执行完整的数据分析流程
-    Args:
-        data_path: 数据文件路径
-        config: 配置对象
-    Returns:
-        output_dir: 输出目录路径
+class AnalysisPipeline:
+    """数据分析流程的任务图构建器
+
+    数据加载、清理、预处理、统计导出以及每一张图表都是任务图中的一个节点，
+    节点之间显式声明依赖。按列、按分组的节点在数据清理完成后由 plan 节点展开，
+    同一分组的数据和预处理结果只计算一次，供该分组的所有图表和导出共用。
     """
-    # 设置matplotlib基本配置
-    setup_matplotlib()
-    
-    # 关闭交互模式
-    plt.ioff()
-    try:
-        # 读取Excel数据文件
+    def __init__(self, data_path: str, config: object, df: pd.DataFrame = None, writer=None):
+        self.data_path = data_path
+        self.config = config
+        self.df = df
+        # 异步输出写入器（OutputWriter），为None时在绘图线程中直接写盘
+        self.writer = writer
+        self.graph = TaskGraph()
+        self.output_dir = None
+
+    def build(self) -> TaskGraph:
+        """声明数据准备阶段的节点，输出节点由 plan 节点在运行时展开"""
+        graph = self.graph
+        graph.add('load', self._load, stage='读取数据')
+        graph.add('check', self._check, ['load'], stage='数据检查')
+        graph.add('clean', self._clean, ['load'], stage='数据清理')
+        graph.add('columns', partial(get_data_columns, config=self.config), ['clean'], stage='数据清理')
+        outlier_config = self.config.DATA_PROCESSING.get('outliers', {})
+        if outlier_config.get('enabled', False):
+            # 异常值检测基于预处理后的整体数据；排除模式下只有统计表（CPK等）使用排除后的数据
+            graph.add('prepare:raw', preprocess_data, ['clean'], stage='数据预处理')
+            graph.add('outliers', partial(self._detect_outliers, outlier_config),
+                      ['prepare:raw', 'columns'], stage='异常值检测')
+            graph.add('prepare', self._prepare_excluding if outlier_config.get('exclude', False)
+                      else lambda prepared, outliers: prepared,
+                      ['prepare:raw', 'outliers'], stage='数据预处理')
+        else:
+            graph.add('prepare', preprocess_data, ['clean'], stage='数据预处理')
+        # 数据清理成功后才创建输出目录，避免读取失败时留下空目录
+        graph.add('output_dirs', self._create_output_dirs, ['clean'],
+                  kind='export', stage='创建输出目录')
+        # 渲染缓存：数据和配置未变化的图表直接复用上次的结果
+        graph.add('cache', partial(get_render_cache, self.data_path, self.config), stage='渲染缓存')
+        # 单元良率：超限矩阵只计算一次，汇总信息也由它得出
+        graph.add('unit_yield', self._unit_yield, ['clean', self.raw_prepare_node(), 'columns'], stage='单元良率')
+        if self.config.OUTPUT.get('unit_yield', False):
+            graph.add('unit_yield:export',
+                      lambda result, dirs: export_unit_yield(result, dirs[0], self.writer),
+                      ['unit_yield', 'output_dirs'], kind='export', stage='单元良率')
+        graph.add('summary', self._summarize, ['load', 'columns', 'unit_yield'], stage='数据预处理')
+        if self.config.DATA_PROCESSING.get('retest', {}).get('enabled', False):
+            # 复测分析需要同一SN的全部测试记录
+            if self.config.DATA_PROCESSING.get('remove_duplicates', False):
+                print("警告: 已开启 remove_duplicates，每个SN只保留最后一次测试，复测分析中没有复测")
+            graph.add('retest', self._retest, ['clean', self.raw_prepare_node(), 'columns'], stage='复测分析')
+            graph.add('retest:export', lambda result, dirs: export_retest(result, dirs[0], self.writer),
+                      ['retest', 'output_dirs'], kind='export', stage='复测分析')
+        if self.config.OUTPUT.get('dataset_export', ''):
+            # 导出清理后的数据集（含规格限元数据），供其它工具直接读取
+            graph.add('dataset', self._export_dataset, ['clean', 'columns', 'prepare', 'output_dirs'],
+                      kind='export', stage='数据集导出')
+        if outlier_config.get('enabled', False):
+            graph.add('outliers:export',
+                      lambda outliers, dirs: export_outliers(outliers, dirs[0], self.writer),
+                      ['outliers', 'output_dirs'], kind='export', stage='异常值检测')
+        repeat_config = self.config.DATA_PROCESSING.get('repeatability', {})
+        if repeat_config.get('enabled', False):
+            # 重复性分析：同一SN的多次测量，同样需要关闭 remove_duplicates
+            graph.add('repeatability',
+                      partial(self._repeatability, repeat_config.get('sigma_multiplier', 6.0)),
+                      ['clean', self.raw_prepare_node(), 'columns'], stage='重复性分析')
+            if self.config.OUTPUT.get('statistics_export', 'legacy') not in ('combined', 'both'):
+                graph.add('repeatability:export',
+                          lambda table, dirs: export_repeatability(table, dirs[0], self.writer),
+                          ['repeatability', 'output_dirs'], kind='export', stage='重复性分析')
+        graph.add('plan', self._plan, ['clean', 'columns', 'cache'], stage='任务规划')
+        return graph
+
+    @staticmethod
+    def _detect_outliers(outlier_config, prepared, data_columns):
+        result = detect_outliers(prepared, data_columns, outlier_config)
+        counts = ', '.join(f"{OUTLIER_RULES[rule]}: {len(hit[0])}" for rule, hit in result.hits.items())
+        print(f"\n异常值检测: {counts}")
+        return result
+
+    @staticmethod
+    def _prepare_excluding(prepared, outliers):
+        excluded = exclude_outliers(prepared, outliers)
+        print(f"排除模式: {len(outliers.positions()[0])} 个异常值不参与统计计算")
+        return excluded
+
+    def raw_prepare_node(self):
+        """PASS/FAIL 判定和按单元、按时间的分析使用的预处理节点
+
+        排除模式只影响统计表（Mean、Std、CPK 等），单元良率、柏拉图、复测、重复性、SPC 和时间窗口
+        仍使用原始测量值，被标记为异常值的超限值不会被当作通过。
+        """
+        if self.config.DATA_PROCESSING.get('outliers', {}).get('enabled', False):
+            return 'prepare:raw'
+        return 'prepare'
+
+    def _excluding_outliers(self):
+        outlier_config = self.config.DATA_PROCESSING.get('outliers', {})
+        return outlier_config.get('enabled', False) and outlier_config.get('exclude', False)
+
+    def _unit_yield(self, df, prepared, data_columns):
+        group_config = self.config.DATA_PROCESSING.get('group_analysis', {})
+        group_columns = get_group_columns(self.config) if group_config.get('enabled', False) else []
+        result = compute_unit_yield(df, prepared, data_columns, group_columns)
+        print(f"\n单元良率: {result.units - result.failed_units}/{result.units} = {result.yield_rate:.2%}")
+        return result
+
+    @staticmethod
+    def _retest(df, prepared, data_columns):
+        result = compute_retest(df, prepared, data_columns)
+        print(f"\n复测分析: {result.retested_units}/{result.units} 个单元有复测，"
+              f"直通率 {result.first_pass_yield:.2%}，最终良率 {result.final_yield:.2%}")
+        return result
+
+    @staticmethod
+    def _repeatability(sigma_multiplier, df, prepared, data_columns):
+        table = compute_repeatability(df, prepared, data_columns, sigma_multiplier)
+        print(f"\n重复性分析: {int(table['Units'].max()) if len(table) else 0} 个单元有多次测量")
+        return table
+
+    @staticmethod
+    def _summarize(raw_df, data_columns, unit_yield):
+        """汇总行数、超限数量和单元良率"""
+        return {
+            'raw_rows': int((~raw_df['SN'].isin(['LSL', 'USL'])).sum()),
+            'rows': unit_yield.units,
+            'columns': len(data_columns),
+            'ng_total': int(unit_yield.item_ng.sum()),
+            'failed_units': unit_yield.failed_units,
+            'unit_yield': unit_yield.yield_rate,
+        }
+
+    def _create_output_dirs(self, df):
+        output_dir, single_dist_dir = create_output_dirs(self.data_path, self.writer)
+        self.output_dir = output_dir
+        return output_dir, single_dist_dir
+
+    def statistics(self, results):
+        """运行结束后取出各范围的统计表
+        Returns:
+            List[Tuple[Optional[str], pd.DataFrame]]: (分组名, 统计表)，整体数据的分组名为None
+        """
+        return [(group, results[node]) for _, group, node in getattr(self, '_stats_nodes', [])
+                if node in results]
+
+    def _export_dataset(self, df, data_columns, prepared, dirs):
+        return export_dataset(df, data_columns, prepared, dirs[0], self.config, self.data_path)
+
+    def _load(self):
+        if self.df is not None:
+            # 直接使用内存中的数据（如基准测试生成的数据），不读取文件
+            print(f"使用内存中的数据: {self.df.shape}")
+            return self.df
         print("读取数据文件...")
-        df = pd.read_excel(data_path)
-        print(f"数据加载成功！从: {data_path}")
-        
+        with TRACER.span('read_excel', 'io') as sp:
+            df = pd.read_excel(self.data_path)
+            sp.set_items(len(df))
+        print(f"数据加载成功！从: {self.data_path}")
+        return df
+
+    @staticmethod
+    def _check(df):
         # 数据检查阶段
         print("\n=== 数据检查阶段 ===")
         print("数据形状:", df.shape)
@@ -108,123 +259,579 @@ def analyze_data(data_path: str, config: object) -> str:
         
         if not has_invalid_data:
             print("未发现无效值")
-        
+
+    def _clean(self, df):
         # 数据处理阶段
         print("\n=== 开始数据处理 ===")
         print("正在清理数据...")
-        df = clean_data(df, config)
-        
-        # 创建输出目录结构
-        output_dir, single_dist_dir = create_output_dirs(data_path)
-        # 获取需要分析的数据列
-        data_columns = get_data_columns(df, config)
-        
-        # 首先生成整体分析图
-        print("\n=== 生成整体分析图 ===")
-        data_df, lsl_values, usl_values = preprocess_data(df)
-        generate_plots(df, data_columns, data_df, lsl_values, usl_values,
-                      output_dir, single_dist_dir, config)
-        
+        return clean_data(df, self.config)
+
+    def _plan(self, df, data_columns, cache):
+        """根据数据列和分组展开输出节点"""
+        plot_config = self.config.PLOT
+        # (工作表名, 分组名, 统计节点)，用于合并的统计工作簿
+        self._stats_nodes = []
+        self._add_output_nodes('overall', 'clean', 'prepare', 'output_dirs',
+                               data_columns, cache, is_group_data=False,
+                               raw_prepare_node=self.raw_prepare_node(),
+                               with_distribution=plot_config.get('enable_distribution', True),
+                               with_boxplot=plot_config.get('enable_boxplot', True))
+        if plot_config.get('enable_correlation', True):
+            self.graph.add('overall:correlation', self._plot_correlation,
+                           ['clean', 'output_dirs'], kind='plot', stage='相关性分析图')
+        if plot_config.get('enable_spc', False):
+            self._add_spc_nodes(data_columns, cache)
+        window_config = self.config.DATA_PROCESSING.get('time_windows', {})
+        if window_config.get('enabled', False):
+            self._add_time_window_nodes(window_config, data_columns, cache)
+        # 分组分析展开后记录实际的分组名，柏拉图每组一张
+        self._pareto_groups = []
+        self._plan_groups(df, data_columns, cache)
+        if plot_config.get('enable_pareto', False):
+            self._add_pareto_nodes(cache)
+        self._add_statistics_workbook_node()
+
+    def _add_spc_nodes(self, data_columns, cache):
+        """添加控制图节点：所有列的控制图数据一次算出，每列一张图"""
+        graph = self.graph
+        graph.add('spc', partial(compute_spc, config=self.config), ['clean', 'columns', self.raw_prepare_node()],
+                  stage='SPC控制图')
+        graph.add('spc:dirs', partial(create_group_dirs, 'spc', with_single=False),
+                  ['output_dirs'], kind='export', stage='创建输出目录')
+        graph.add('spc:summary', lambda charts, dirs: export_spc_summary(charts, dirs[0], self.writer),
+                  ['spc', 'spc:dirs'], kind='export', stage='SPC控制图')
+        for col in data_columns:
+            graph.add(f'spc:{col}', partial(self._plot_control_chart, col, cache),
+                      ['spc', 'spc:dirs'], kind='plot', stage='SPC控制图')
+
+    def _add_pareto_nodes(self, cache):
+        """添加NG柏拉图节点：各范围的计数来自单元良率，整体和每个分组各一张图"""
+        graph = self.graph
+        graph.add('pareto', pareto_tables, ['unit_yield'], stage='NG柏拉图')
+        graph.add('pareto:dirs', partial(create_group_dirs, 'pareto', with_single=False),
+                  ['output_dirs'], kind='export', stage='创建输出目录')
+        graph.add('pareto:export', lambda tables, dirs: export_pareto(tables, dirs[0], self.writer),
+                  ['pareto', 'pareto:dirs'], kind='export', stage='NG柏拉图')
+        for scope in [OVERALL_SCOPE] + [str(name) for name in self._pareto_groups]:
+            graph.add(f'pareto:{scope}', partial(self._plot_pareto, scope, cache),
+                      ['pareto', 'pareto:dirs'], kind='plot', stage='NG柏拉图')
+
+    def _plot_pareto(self, scope, cache, tables, dirs):
+        table = dict(tables).get(scope)
+        if table is None or table.empty:
+            return None
+        file_name = 'pareto.png' if scope == OVERALL_SCOPE else f'pareto_{scope}.png'
+        output_path = os.path.join(dirs[0], file_name)
+        save_figure_cached(output_path, lambda: plot_pareto(table, scope, self.config),
+                           cache, data_digest(table), scope, writer=self.writer)
+        return output_path
+
+    def _plan_groups(self, df, data_columns, cache):
         # 然后检查是否需要生成分组分析图
-        group_config = config.DATA_PROCESSING.get('group_analysis', {})
+        group_config = self.config.DATA_PROCESSING.get('group_analysis', {})
         print("\n=== 检查分组分析配置 ===")
         print(f"group_config: {group_config}")
         
         # 检查是否启用分组分析功能
-        if group_config.get('enabled', False):
-            print("分组分析已启用")
-            group_by = group_config.get('group_by')
-            
-            if group_by and group_by in df.columns:
-                print(f"找到分组列: {group_by}")
-                spec_mask = df['SN'].isin(['LSL', 'USL'])
-                spec_data = df[spec_mask]
-                actual_data = df[~spec_mask]
-                groups = actual_data[group_by].unique()
-                print(f"发现的{group_by}组: {groups}")
-                
-                # 1. 生成分组分布图
-                if config.PLOT.get('enable_distribution', True):
-                    print(f"\n=== 生成{group_by}分组分布图 ===")
-                    for group_name in groups:
-                        # 合并当前组的数据和规格数据
-                        group_data = pd.concat([
-                            spec_data,
-                            actual_data[actual_data[group_by] == group_name]
-                        ])
-                        # 创建当前组的输出目录
-                        group_output_dir = os.path.join(output_dir, f"{group_by}_{group_name}")
-                        group_single_dist_dir = os.path.join(group_output_dir, 'single_distributions')
-                        os.makedirs(group_output_dir, exist_ok=True)
-                        os.makedirs(group_single_dist_dir, exist_ok=True)
-                        
-                        print(f"\n处理 {group_by}: {group_name}")
-                        # 预处理数据并生成图表
-                        data_df, lsl_values, usl_values = preprocess_data(group_data)
-                        generate_plots(group_data, data_columns, data_df, lsl_values, usl_values,
-                                    group_output_dir, group_single_dist_dir, config, is_group_data=True)
-                
-                # 2. 生成分组箱线图
-                if config.PLOT.get('enable_group_boxplot', True):
-                    print(f"\n=== 生成{group_by}分组箱线图 ===")
-                    for group_name in groups:
-                        # 合并当前组的数据和规格数据
-                        group_data = pd.concat([
-                            spec_data,
-                            actual_data[actual_data[group_by] == group_name]
-                        ])
-                        # 创建输出目录
-                        group_output_dir = os.path.join(output_dir, f"{group_by}_{group_name}")
-                        os.makedirs(group_output_dir, exist_ok=True)
-                        
-                        print(f"\n处理 {group_by}: {group_name}")
-                        # 预处理数据并生成箱线图
-                        data_df, lsl_values, usl_values = preprocess_data(group_data)
-                        fig, ax = plot_boxplots(group_data, config)
-                        plt.savefig(os.path.join(group_output_dir, 'boxplot.png'))
-                        plt.close(fig)
-                
-                # 3. 生成分组对比图（每列单独的分组对比）
-                if config.PLOT.get('enable_group_boxplot', True):
-                    print(f"\n=== 生成{group_by}分组对比图 ===")
-                    # 创建分组对比图的专用目录
-                    group_plots_dir = os.path.join(output_dir, f'{group_by}_comparison')
-                    os.makedirs(group_plots_dir, exist_ok=True)
-                    
-                    # 为每个数据列生成分组对比图
-                    for col in data_columns:
-                        print(f"\n处理列: {col}")
-                        fig, ax = plot_group_boxplots(df[['SN', group_by, col]], group_by, config)
-                        output_path = os.path.join(group_plots_dir, f'{col}_group_comparison.png')
-                        fig.savefig(output_path)
-                        plt.close(fig)
-                        print(f"已保存分组对比图: {output_path}")
-                
-                # 4. 生成整体分组对比图
-                if config.PLOT.get('enable_all_columns_compare', True):
-                    print(f"\n=== 生成{group_by}整体分组对比图 ===")
-                    group_plots_dir = os.path.join(output_dir, f'{group_by}_comparison')
-                    os.makedirs(group_plots_dir, exist_ok=True)
-                    
-                    print("\n生成整体分组对比图...")
-                    fig, ax = plot_all_columns_by_group(df, group_by, config)
-                    output_path = os.path.join(group_plots_dir, 'all_columns_comparison.png')
-                    fig.savefig(output_path)
-                    plt.close(fig)
-                    print(f"已保存整体分组对比图: {output_path}")
-            else:
-                print(f"警告: 未找到分组列 {group_by}")
-        else:
+        if not group_config.get('enabled', False):
             print("分组分析未启用")
+            return
+        print("分组分析已启用")
+        group_columns = get_group_columns(self.config)
+        missing = [col for col in group_columns if col not in df.columns]
+        if not group_columns or missing:
+            print(f"警告: 未找到分组列 {missing or group_config.get('group_by')}")
+            return
+        
+        print(f"找到分组列: {group_columns}")
+        # 多个分组列时按各列取值的组合分组，组合分组名如 'LineA+F1'
+        group_by = GROUP_KEY_SEPARATOR.join(group_columns)
+        actual_data = df[~df['SN'].isin(['LSL', 'USL'])]
+        groups = add_group_key(actual_data[group_columns], group_columns, group_by)[group_by].dropna().unique()
+        print(f"发现的{group_by}组: {groups}")
+        # 组合数过多时每组的图表和导出数量失控，直接跳过分组分析
+        max_combinations = group_config.get('max_combinations', 1000)
+        if len(groups) > max_combinations:
+            print(f"警告: 分组组合数 {len(groups)} 超过上限 {max_combinations}，跳过分组分析")
+            return
+        self._pareto_groups = list(groups)
+        if group_config.get('cube', False):
+            self._add_cube_nodes(group_columns, max_combinations)
+        self._add_group_nodes(group_columns, groups, data_columns, cache)
+
+    def _add_cube_nodes(self, group_columns, max_combinations):
+        """添加统计立方体节点：所有分组层（各列组合及小计）的统计量一次算出"""
+        graph = self.graph
+        graph.add('group_cube', partial(self._build_cube, group_columns, max_combinations,
+                                        self._excluding_outliers()),
+                  ['clean', 'prepare', 'columns'], stage='分组统计')
+        graph.add('group_cube:export',
+                  lambda cube, dirs: export_stats_cube(cube, dirs[0], self.writer) if cube is not None else None,
+                  ['group_cube', 'output_dirs'], kind='export', stage='统计导出')
+
+    @staticmethod
+    def _build_cube(group_columns, max_combinations, count_valid, df, prepared, data_columns):
+        try:
+            return build_stats_cube(df, prepared, data_columns, group_columns, max_combinations,
+                                    count_valid)
+        except CardinalityError as e:
+            print(f"警告: {e}，跳过统计立方体")
+            return None
+
+    def _add_group_nodes(self, group_columns, groups, data_columns, cache):
+        """添加分组数据、分组图表和分组对比图节点"""
+        graph = self.graph
+        plot_config = self.config.PLOT
+        with_distribution = plot_config.get('enable_distribution', True)
+        with_group_boxplot = plot_config.get('enable_group_boxplot', True)
+        group_by = GROUP_KEY_SEPARATOR.join(group_columns)
+        
+        graph.add('groups', partial(split_groups, group_by=group_columns), ['clean'], stage='分组数据')
+        for group_name in groups:
+            if not (with_distribution or with_group_boxplot):
+                break
+            prefix = f"{group_by}_{group_name}"
+            graph.add(f'{prefix}:data', partial(_select_group, group_name=group_name),
+                      ['groups'], stage='分组数据')
+            # 排除模式下同时排除整体数据中被标记的值，分布图的良率信息仍使用未排除的数据
+            raw_prepare_node = f'{prefix}:prepare'
+            if self._excluding_outliers():
+                raw_prepare_node = graph.add(f'{prefix}:prepare:raw', preprocess_data,
+                                             [f'{prefix}:data'], stage='数据预处理')
+                graph.add(f'{prefix}:prepare', exclude_outliers, [raw_prepare_node, 'outliers'],
+                          stage='数据预处理')
+            else:
+                graph.add(f'{prefix}:prepare', preprocess_data, [f'{prefix}:data'], stage='数据预处理')
+            graph.add(f'{prefix}:dirs',
+                      partial(create_group_dirs, prefix, with_single=with_distribution),
+                      ['output_dirs'], kind='export', stage='创建输出目录')
+            # 1. 分组分布图（包含该组的统计导出和箱线图）
+            self._add_output_nodes(prefix, f'{prefix}:data', f'{prefix}:prepare', f'{prefix}:dirs',
+                                   data_columns, cache, is_group_data=True, group_name=group_name,
+                                   raw_prepare_node=raw_prepare_node,
+                                   with_distribution=with_distribution,
+                                   with_boxplot=plot_config.get('enable_boxplot', True) and with_distribution)
+            # 2. 分组箱线图
+            if with_group_boxplot:
+                self._add_boxplot_node(prefix, f'{prefix}:data', f'{prefix}:prepare', f'{prefix}:dirs',
+                                       data_columns, cache)
+        
+        # 对比图按单个分组列绘制，多个分组列时先添加组合分组列
+        compare_source = 'clean'
+        if len(group_columns) > 1:
+            compare_source = 'grouped'
+            graph.add('grouped', partial(add_group_key, group_columns=group_columns, key=group_by),
+                      ['clean'], stage='分组数据')
+        compare_dir = f'{group_by}_comparison'
+        if with_group_boxplot or plot_config.get('enable_all_columns_compare', True):
+            graph.add('compare:dirs', partial(create_group_dirs, compare_dir, with_single=False),
+                      ['output_dirs'], kind='export', stage='创建输出目录')
+        # 3. 分组对比图（每列单独的分组对比）
+        if with_group_boxplot:
+            for col in data_columns:
+                graph.add(f'compare:{col}',
+                          partial(self._plot_group_comparison, col, group_by, cache),
+                          [compare_source, 'compare:dirs'], kind='plot', stage='分组对比图')
+        # 4. 整体分组对比图
+        if plot_config.get('enable_all_columns_compare', True):
+            graph.add('compare:all',
+                      partial(self._plot_all_columns_comparison, group_by, data_columns, cache),
+                      [compare_source, 'compare:dirs'], kind='plot', stage='整体分组对比图')
+
+    def _add_output_nodes(self, prefix, data_node, prepare_node, dirs_node, data_columns, cache,
+                          is_group_data, with_distribution, with_boxplot, group_name=None,
+                          raw_prepare_node=None):
+        """添加一组数据（整体或某个分组）的统计导出和基本图表节点
+
+        raw_prepare_node 为未排除异常值的预处理节点（默认与 prepare_node 相同），
+        用于分布图总标题中与单元良率一致的 NG/Yield
+        """
+        graph = self.graph
+        deps = [data_node, prepare_node, dirs_node]
+        # 计算统计量（数值类型），供各种统计导出共用；排除模式下 Test 不计被排除的值
+        graph.add(f'{prefix}:stats',
+                  partial(compute_statistics, data_columns=data_columns,
+                          count_valid=self._excluding_outliers()),
+                  [prepare_node], stage='统计导出')
+        self._stats_nodes.append(('整体' if group_name is None else str(group_name),
+                                  None if group_name is None else str(group_name),
+                                  f'{prefix}:stats'))
+        # 导出统计数据到Excel（每个目录一个文件，数值为文本）
+        if self.config.OUTPUT.get('statistics_export', 'legacy') in ('legacy', 'both'):
+            graph.add(f'{prefix}:statistics',
+                      partial(self._export_statistics, is_group_data),
+                      deps + [f'{prefix}:stats'], kind='export', stage='统计导出')
+        
+        # 生成并保存总体分布图和单个分布图
+        if with_distribution:
+            graph.add(f'{prefix}:distribution',
+                      partial(self._plot_distribution, data_columns, cache),
+                      deps + [raw_prepare_node or prepare_node], kind='plot', stage='分布图')
+            for col in data_columns:
+                graph.add(f'{prefix}:single:{col}',
+                          partial(self._plot_single_distribution, col, cache),
+                          [prepare_node, dirs_node], kind='plot', stage='单个分布图')
+        
+        # 生成并保存箱线图
+        if with_boxplot:
+            self._add_boxplot_node(prefix, data_node, prepare_node, dirs_node, data_columns, cache)
+
+    def _add_boxplot_node(self, prefix, data_node, prepare_node, dirs_node, data_columns, cache):
+        self.graph.add(f'{prefix}:boxplot',
+                       partial(self._plot_boxplot, data_columns, cache),
+                       [data_node, prepare_node, dirs_node], kind='plot', stage='箱线图')
+
+    def _add_statistics_workbook_node(self):
+        """添加合并的统计工作簿节点（整体和各分组各一个工作表）"""
+        if self.config.OUTPUT.get('statistics_export', 'legacy') not in ('combined', 'both'):
+            return
+        sheets = [(title, group) for title, group, _ in self._stats_nodes]
+        # 重复性分析作为附加工作表与统计一起导出
+        extra = ['repeatability'] if 'repeatability' in self.graph.tasks else []
+        self.graph.add('statistics:workbook',
+                       partial(self._export_statistics_workbook, sheets, bool(extra)),
+                       ['output_dirs'] + extra + [node for _, _, node in self._stats_nodes],
+                       kind='export', stage='统计导出')
+
+    def _export_statistics(self, is_group_data, df, prepared, dirs, stats):
+        export_statistics_to_excel(df, self.config, dirs[0], is_group_data, prepared, self.writer, stats)
+        return os.path.join(dirs[0], 'statistics_summary.xlsx')
+
+    def _export_statistics_workbook(self, sheets, with_repeatability, dirs, *tables):
+        extra_sheets = []
+        if with_repeatability:
+            extra_sheets.append(('重复性', tables[0]))
+            tables = tables[1:]
+        return export_statistics_workbook(
+            [(title, group, table) for (title, group), table in zip(sheets, tables)],
+            dirs[0], self.config.OUTPUT.get('statistics_sidecar', ''), self.writer, extra_sheets)
+
+    def _plot_distribution(self, data_columns, cache, df, prepared, dirs, raw_prepared):
+        output_dir = dirs[0]
+        data_df, lsl_values, usl_values = prepared
+        print(f"\n生成分布图: {output_dir}")
+        if self.config.PLOT['distribution'].get('paginate', False):
+            # 分页输出总览图，每次只在内存中保留一页
+            return save_distribution_pages(df, self.config, output_dir, prepared, self.writer,
+                                           raw_prepared)
+        output_path = os.path.join(output_dir, 'distribution_plots.png')
+        key_parts = [data_digest(data_df[data_columns]), _limits(lsl_values, usl_values, data_columns)]
+        if raw_prepared is not prepared:
+            # 总标题的良率信息来自未排除的数据
+            key_parts.append(data_digest(raw_prepared[0][data_columns]))
+        save_figure_cached(output_path,
+                           lambda: plot_distributions(df, self.config, prepared, raw_prepared), cache,
+                           *key_parts, writer=self.writer)
+        return output_path
+
+    def _plot_single_distribution(self, col, cache, prepared, dirs):
+        data_df, lsl_values, usl_values = prepared
+        output_path = os.path.join(dirs[1], f'{col}.png')
+        save_figure_cached(output_path,
+                           lambda: plot_single_distribution(data_df, col, lsl_values, usl_values, self.config),
+                           cache, data_digest(data_df[col]),
+                           _limits(lsl_values, usl_values, [col]), writer=self.writer)
+        return output_path
+
+    def _plot_boxplot(self, data_columns, cache, df, prepared, dirs):
+        data_df, lsl_values, usl_values = prepared
+        print(f"\n生成箱线图: {dirs[0]}")
+        output_path = os.path.join(dirs[0], 'boxplot.png')
+        save_figure_cached(output_path,
+                           lambda: plot_boxplots(df, self.config, prepared)[0], cache,
+                           data_digest(data_df[data_columns]),
+                           _limits(lsl_values, usl_values, data_columns), writer=self.writer)
+        return output_path
+
+    def _add_time_window_nodes(self, window_config, data_columns, cache):
+        """添加时间窗口节点：数据只按时间排序一次，每种窗口规则一个统计表和一张趋势图"""
+        graph = self.graph
+        graph.add('windows', build_time_index, ['clean', self.raw_prepare_node()], stage='时间窗口分析')
+        graph.add('windows:dirs', partial(create_group_dirs, 'time_windows', with_single=False),
+                  ['output_dirs'], kind='export', stage='创建输出目录')
+        for rule in window_config.get('rules', ['day']):
+            graph.add(f'windows:{rule}',
+                      partial(self._window_statistics, rule, data_columns, window_config),
+                      ['windows'], stage='时间窗口分析')
+            graph.add(f'windows:{rule}:export',
+                      partial(self._export_window_statistics, rule),
+                      [f'windows:{rule}', 'windows:dirs'], kind='export', stage='时间窗口分析')
+            graph.add(f'windows:{rule}:trend',
+                      partial(self._plot_window_trend, rule, cache),
+                      [f'windows:{rule}', 'windows:dirs'], kind='plot', stage='时间窗口分析')
+
+    @staticmethod
+    def _window_statistics(rule, data_columns, window_config, index):
+        if index is None:
+            return None
+        return window_statistics(index, data_columns, rule,
+                                 window_config.get('shifts', DEFAULT_SHIFTS),
+                                 window_config.get('min_rows', 2))
+
+    def _export_window_statistics(self, rule, windows, dirs):
+        if windows is None:
+            return None
+        summary, stats = windows
+        return export_window_statistics(summary, stats, rule, dirs[0], self.writer)
+
+    def _plot_window_trend(self, rule, cache, windows, dirs):
+        if windows is None or windows[0].empty:
+            return None
+        summary = windows[0]
+        output_path = os.path.join(dirs[0], f'{rule}_trend.png')
+        save_figure_cached(output_path, lambda: plot_window_trend(summary, rule, self.config),
+                           cache, data_digest(summary), rule,
+                           self.config.DATA_PROCESSING.get('time_windows', {}).get('figsize'),
+                           writer=self.writer)
+        return output_path
+
+    def _plot_control_chart(self, col, cache, charts, dirs):
+        output_path = os.path.join(dirs[0], f'{col}_spc.png')
+        save_figure_cached(output_path, lambda: plot_control_chart(charts, col, self.config),
+                           cache, data_digest(charts.column_frame(col)), writer=self.writer)
+        return output_path
+
+    def _plot_correlation(self, df, dirs):
+        print("\n生成相关性分析图...")
+        # 写入本次运行的输出目录，归档输出时随其它输出一起收入ZIP
+        plot_correlations(df, self.config, self.writer, dirs[0])
+
+    def _plot_group_comparison(self, col, group_by, cache, df, dirs):
+        col_df = df[['SN', group_by, col]]
+        output_path = os.path.join(dirs[0], f'{col}_group_comparison.png')
+        save_figure_cached(output_path,
+                           lambda: plot_group_boxplots(col_df, group_by, self.config)[0],
+                           cache, data_digest(col_df), writer=self.writer)
+        print(f"已保存分组对比图: {output_path}")
+        return output_path
+
+    def _plot_all_columns_comparison(self, group_by, data_columns, cache, df, dirs):
+        output_path = os.path.join(dirs[0], 'all_columns_comparison.png')
+        save_figure_cached(output_path,
+                           lambda: plot_all_columns_by_group(df, group_by, self.config)[0],
+                           cache, data_digest(df[['SN', group_by] + data_columns]),
+                           writer=self.writer)
+        print(f"已保存整体分组对比图: {output_path}")
+        return output_path
+
+def split_groups(df: pd.DataFrame, group_by: Union[str, List[str]]) -> dict:
+    """按分组列一次性拆分数据，每个分组都附带LSL/USL规格行
+    Args:
+        df: 清理后的数据框
+        group_by: 分组列名或分组列名列表
+    Returns:
+        dict: 组名（多个分组列时为组合分组名，见 group_label） -> 该组数据（包含规格行）
+    """
+    group_columns = [group_by] if isinstance(group_by, str) else list(group_by)
+    spec_mask = df['SN'].isin(['LSL', 'USL'])
+    spec_data = df[spec_mask]
+    actual_data = df[~spec_mask]
+    return {
+        group_label(group_name): pd.concat([spec_data, group_data])
+        for group_name, group_data in actual_data.groupby(group_columns, sort=False)
+    }
+
+def _select_group(groups, group_name):
+    return groups[group_name]
+
+def create_group_dirs(name, output_dirs, with_single=True):
+    """在主输出目录下创建分组输出目录
+    Args:
+        name: 子目录名
+        output_dirs: create_output_dirs 的返回值
+        with_single: 是否同时创建单个分布图目录
+    Returns:
+        group_output_dir: 分组输出目录
+        group_single_dist_dir: 分组单个分布图目录
+    """
+    group_output_dir = os.path.join(output_dirs[0], name)
+    group_single_dist_dir = os.path.join(group_output_dir, 'single_distributions')
+    os.makedirs(group_output_dir, exist_ok=True)
+    if with_single:
+        os.makedirs(group_single_dist_dir, exist_ok=True)
+    return group_output_dir, group_single_dist_dir
+
+def write_trace(output_dir: str) -> None:
+    """把计时记录写入输出目录：trace.json（Chrome trace / Perfetto）和 timing_summary.csv"""
+    TRACER.export_chrome_trace(os.path.join(output_dir, 'trace.json'))
+    TRACER.write_summary(os.path.join(output_dir, 'timing_summary.csv'))
+    print("\n=== 耗时统计（前10项） ===")
+    for row in TRACER.summary()[:10]:
+        print(f"{row['name']}: {row['wall_total']:.3f}秒 x{row['count']} (CPU {row['cpu_total']:.3f}秒)")
+
+def _time_range(df):
+    """数据中 Time 列的最早和最晚时间（ISO格式），没有 Time 列时为None"""
+    if 'Time' not in df.columns:
+        return None, None
+    times = pd.to_datetime(df.loc[~df['SN'].isin(['LSL', 'USL']), 'Time'], errors='coerce').dropna()
+    if times.empty:
+        return None, None
+    return times.min().isoformat(), times.max().isoformat()
+
+def record_results(db_path, result, tables, df, units=None):
+    """把运行信息和统计量写入结果数据库，失败时只输出警告
+    Args:
+        units: (清理后的数据, 预处理结果, 数据列, UnitYield)，提供时同时写入单元追溯索引
+    Returns:
+        运行编号，写入失败时为None
+    """
+    try:
+        with ResultsStore(db_path) as store:
+            run_id = store.record_run(result, tables, _time_range(df), units)
+        print(f"\n分析结果已写入数据库: {db_path}（运行编号 {run_id}）")
+        return run_id
+    except sqlite3.Error as e:
+        print(f"警告: 写入结果数据库失败: {e}")
+        return None
+
+@dataclass
+class AnalysisResult:
+    """一次分析的结果摘要
+
+    标记为 summary=False 的字段是分析明细（DataFrame、数组等），不属于摘要：
+    批量分析的工作进程只返回 summary() 的结果，不序列化这些对象。
+    """
+    data_path: str
+    output_dir: str
+    raw_rows: int = 0        # 读取的测量行数（不含规格行）
+    rows: int = 0            # 清理后的测量行数
+    columns: int = 0         # 数据列数
+    ng_total: int = 0        # 超限数据点总数（一个单元有多项超限时计多次）
+    failed_units: int = 0    # 至少一项超限的单元数
+    unit_yield: float = 0.0  # 单元良率（0-1）
+    elapsed: float = 0.0     # 总耗时（秒）
+    stage_seconds: dict = field(default_factory=dict)  # 各阶段累计耗时（秒）
+    memory: dict = field(default_factory=dict)  # 各阶段内存统计（开启内存诊断时）
+    run_id: Optional[int] = None  # 结果数据库中的运行编号（启用结果数据库时）
+    cube: Optional[StatsCube] = field(default=None, repr=False, metadata={'summary': False})  # 各分组层的统计量（启用分组分析和统计立方体时），可直接按层或取值切片
+    first_pass_yield: Optional[float] = None  # 直通率（0-1，启用复测分析时）
+    final_yield: Optional[float] = None  # 复测后的最终良率（0-1，启用复测分析时）
+    retest: Optional[RetestResult] = field(default=None, repr=False, metadata={'summary': False})  # 复测明细（启用复测分析时）
+
+    def summary(self) -> dict:
+        """可序列化为JSON的结果摘要（不含分析明细）"""
+        return {f.name: getattr(self, f.name) for f in fields(self) if f.metadata.get('summary', True)}
+
+def analyze_data(data_path: str, config: object, progress=None, cancel=None) -> str:
+    """执行完整的数据分析流程
+    Args:
+        data_path: 数据文件路径
+        config: 配置对象
+        progress: 进度回调函数，接收 ProgressEvent，可选
+        cancel: CancelToken，取消时在当前工作单元结束后停止并删除未完成的输出
+    Returns:
+        output_dir: 输出目录路径
+    Raises:
+        AnalysisCancelled: 分析被取消时
+    """
+    return run_analysis(data_path, config, progress, cancel).output_dir
+
+def run_analysis(data_path: str, config: object, progress=None, cancel=None,
+                 df: pd.DataFrame = None) -> AnalysisResult:
+    """执行完整的数据分析流程并返回结果摘要
+    Args:
+        data_path: 数据文件路径
+        config: 配置对象
+        progress: 进度回调函数，接收 ProgressEvent，可选
+        cancel: CancelToken，取消时在当前工作单元结束后停止并删除未完成的输出
+        df: 已加载的数据（含LSL/USL规格行），提供时不再读取 data_path，
+            data_path 仍用于确定输出目录
+    Returns:
+        AnalysisResult: 输出目录、行数、超限数量和各阶段耗时
+    Raises:
+        AnalysisCancelled: 分析被取消时
+    """
+    start_time = time.perf_counter()
+    # 启用分阶段计时（未启用时计时点几乎没有开销）
+    diagnostics = getattr(config, 'DIAGNOSTICS', {})
+    trace_enabled = diagnostics.get('trace', False)
+    if trace_enabled:
+        TRACER.start()
+    # 内存诊断：按阶段记录内存峰值，图表未关闭时立即报错
+    memory_profiler = None
+    if diagnostics.get('memory', False):
+        memory_profiler = MemoryProfiler(diagnostics.get('max_open_figures', 0))
+        memory_profiler.start()
+    # 设置matplotlib基本配置
+    setup_matplotlib()
+    
+    # 关闭交互模式
+    plt.ioff()
+    # 异步输出：PNG编码和写盘在后台线程中进行，与下一张图表的渲染重叠
+    writer = get_output_writer(config)
+    pipeline = AnalysisPipeline(data_path, config, df, writer)
+    try:
+        graph = pipeline.build()
+        timer = StageTimer()
+        listeners = [timer]
+        if progress is not None:
+            listeners.append(ProgressTracker(progress, planning_task='plan'))
+        max_workers = getattr(config, 'PIPELINE', {}).get('max_workers', 4)
+        if memory_profiler is not None:
+            # 串行执行，内存峰值才能准确归属到各个阶段
+            listeners.append(memory_profiler)
+            max_workers = 1
+        results = graph.run(max_workers=max_workers, listeners=listeners, cancel=cancel)
+        if writer is not None:
+            # 等待后台写出完成，写出失败时在这里报错
+            writer.flush()
+        
+        cache = results['cache']
+        if cache is not None:
+            print(f"\n渲染缓存: 命中 {cache.hits} 张, 重新绘制 {cache.misses} 张")
+        
+        output_dir, _ = results['output_dirs']
+        if trace_enabled:
+            write_trace(output_dir)
+        memory = {}
+        if memory_profiler is not None:
+            memory_profiler.report()
+            memory_profiler.write_csv(os.path.join(output_dir, 'memory_profile.csv'))
+            memory = memory_profiler.summary()
+        if writer is not None and writer.archive_path:
+            # 归档在 finally 中关闭写入器时完成
+            output_dir = writer.archive_path
+        retest = results.get('retest')
+        result = AnalysisResult(data_path, output_dir,
+                                elapsed=time.perf_counter() - start_time,
+                                stage_seconds=dict(timer.stage_seconds),
+                                memory=memory,
+                                cube=results.get('group_cube'),
+                                first_pass_yield=retest.first_pass_yield if retest is not None else None,
+                                final_yield=retest.final_yield if retest is not None else None,
+                                retest=retest,
+                                **results['summary'])
+        results_db = get_results_db_path(data_path, config)
+        if results_db:
+            units = None
+            if config.OUTPUT.get('sn_index', False):
+                # 追溯索引保存原始测量值和 PASS/FAIL（单元良率同样基于原始测量值）
+                units = (results['clean'], results[pipeline.raw_prepare_node()],
+                         results['columns'], results['unit_yield'])
+            result.run_id = record_results(results_db, result, pipeline.statistics(results),
+                                           results['clean'], units)
+        return result
             
-        return output_dir
-            
+    except AnalysisCancelled:
+        # 丢弃尚未写出的文件，再清理未完成的输出
+        if writer is not None:
+            writer.close(discard=True)
+        if pipeline.output_dir and os.path.isdir(pipeline.output_dir):
+            shutil.rmtree(pipeline.output_dir, ignore_errors=True)
+        print("分析已取消")
+        raise
     except Exception as e:
         print(f"分析过程中出现错误: {str(e)}")
+        # 归档输出时不完成归档，避免不完整的结果看起来像完整的ZIP
+        if writer is not None:
+            writer.close(failed=True)
         raise
     finally:
+        if trace_enabled:
+            TRACER.stop()
+        if memory_profiler is not None:
+            memory_profiler.stop()
+        if writer is not None:
+            writer.close()
         # 恢复交互模式
         plt.ion()
-        print("分组分析未启用")
-    
-    return output_dir 
\ No newline at end of file
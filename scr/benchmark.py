@@ -0,0 +1,313 @@
+"""性能基准测试
+
+用 DataGenerator 生成不同规模的数据（行数、列数、分组数、空值和无效值比例），
+对每种组合运行完整的分析流程，记录各阶段、各图表类型和各计时点的耗时，
+结果保存为JSON。与之前版本的结果对比即可发现性能回退。
+
+用法示例:
+    python cli.py bench --preset quick -o benchmarks/v1.json
+    python cli.py bench --rows 1k,100k,1M --columns 20,200 --baseline benchmarks/v1.json
+    python cli.py bench-compare benchmarks/v1.json benchmarks/v2.json
+"""
+import os
+import sys
+import copy
+import json
+import time
+import shutil
+import platform
+import tempfile
+import itertools
+import contextlib
+from dataclasses import dataclass, asdict
+from typing import Dict, Iterable, List, Optional
+
+# 图表类型 -> PLOT中的启用开关
+PLOT_TYPES = {
+    'distribution': 'enable_distribution',
+    'boxplot': 'enable_boxplot',
+    'group_boxplot': 'enable_group_boxplot',
+    'all_columns_compare': 'enable_all_columns_compare',
+    'correlation': 'enable_correlation',
+    'spc': 'enable_spc',
+    'pareto': 'enable_pareto',
+}
+
+# 预设的参数组合
+PRESETS = {
+    'quick': {
+        'rows': [1000, 10000],
+        'columns': [20, 100],
+        'groups': [3],
+        'nan_rates': [0.01],
+        'sentinel_rates': [0.0],
+    },
+    'full': {
+        'rows': [1000, 10000, 100000, 1000000, 5000000],
+        'columns': [20, 200, 2000],
+        'groups': [1, 3, 10],
+        'nan_rates': [0.0, 0.01],
+        'sentinel_rates': [0.0, 0.01],
+    },
+}
+
+# 数据单元格数超过该值的组合默认跳过（约4GB的float64）
+DEFAULT_MAX_CELLS = 500_000_000
+
+@dataclass
+class BenchmarkCase:
+    """一个基准测试组合"""
+    rows: int
+    columns: int
+    groups: int
+    nan_rate: float
+    sentinel_rate: float
+
+    @property
+    def name(self) -> str:
+        return (f"r{self.rows}_c{self.columns}_g{self.groups}"
+                f"_n{self.nan_rate:g}_s{self.sentinel_rate:g}")
+
+def build_cases(rows: Iterable[int], columns: Iterable[int], groups: Iterable[int],
+                nan_rates: Iterable[float], sentinel_rates: Iterable[float]) -> List[BenchmarkCase]:
+    """生成所有参数组合（按规模从小到大）"""
+    return [BenchmarkCase(*values)
+            for values in itertools.product(rows, columns, groups, nan_rates, sentinel_rates)]
+
+def _environment() -> dict:
+    """记录运行环境，便于解释不同结果之间的差异"""
+    import numpy as np
+    import pandas as pd
+    import matplotlib
+    import seaborn as sns
+    from .render_cache import get_code_version
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'matplotlib': matplotlib.__version__,
+        'seaborn': sns.__version__,
+        'code_version': get_code_version()[:12],
+    }
+
+@contextlib.contextmanager
+def _config_overrides(config_module, overrides: Dict[str, dict]):
+    """临时覆盖配置，结束后恢复原值"""
+    from .cli import apply_config_overrides
+    saved = {section: copy.deepcopy(getattr(config_module, section, None))
+             for section in overrides}
+    apply_config_overrides(config_module, overrides)
+    try:
+        yield config_module
+    finally:
+        for section, value in saved.items():
+            if value is None:
+                delattr(config_module, section)
+            else:
+                setattr(config_module, section, value)
+
+def _case_overrides(case: BenchmarkCase, plots: List[str], data_path: str,
+                    max_workers: Optional[int], memory: bool) -> Dict[str, dict]:
+    overrides = {
+        'DATA': {'path': data_path},
+        'PLOT': {flag: name in plots for name, flag in PLOT_TYPES.items()},
+        # 只选择生成器产生的数据列，与用户的列配置无关
+        'DATA_COLUMNS': {'selection_mode': 'pattern', 'patterns': ['S_NearSfr'],
+                         'exclude_patterns': []},
+        'DATA_PROCESSING': {'group_analysis': {'enabled': case.groups > 1, 'group_by': 'Line'}},
+        # 测量的是实际绘制的耗时，不使用渲染缓存
+        'OUTPUT': {'render_cache': False, 'results_db': False},
+        'DIAGNOSTICS': {'trace': True, 'memory': memory},
+    }
+    if max_workers:
+        overrides['PIPELINE'] = {'max_workers': max_workers}
+    return overrides
+
+def run_case(case: BenchmarkCase, plots: List[str], work_dir: str, seed: int = 42,
+             with_excel: bool = False, max_workers: Optional[int] = None,
+             memory: bool = False, verbose: bool = False) -> dict:
+    """生成数据并运行一次完整分析
+    Args:
+        case: 参数组合
+        plots: 启用的图表类型（PLOT_TYPES 的键）
+        work_dir: 临时工作目录，数据文件和输出都写在这里
+        seed: 随机种子
+        with_excel: 是否先写出Excel文件再从文件读取（计入读取耗时）；
+            否则直接把生成的数据交给分析流程
+        max_workers: 任务图执行器的线程数，为None时使用配置值
+        memory: 是否同时记录各阶段的内存峰值（任务串行执行，耗时会变长）
+        verbose: 是否输出分析日志
+    Returns:
+        dict: 该组合的计时结果
+    """
+    import config
+    import matplotlib.pyplot as plt
+    from .analyzer import run_analysis
+    from .data_generator import DataGenerator
+    from .instrument import TRACER
+
+    record = {'name': case.name, 'params': asdict(case), 'status': 'ok'}
+    data_path = os.path.join(work_dir, f'{case.name}.xlsx')
+
+    start_time = time.perf_counter()
+    generator = DataGenerator(num_rows=case.rows, seed=seed, num_columns=case.columns,
+                              num_groups=case.groups, nan_rate=case.nan_rate,
+                              sentinel_rate=case.sentinel_rate, time_freq='s')
+    table = generator.generate_table()
+    record['generate_seconds'] = time.perf_counter() - start_time
+
+    if with_excel:
+        start_time = time.perf_counter()
+        table.to_excel(data_path, index=False)
+        record['write_excel_seconds'] = time.perf_counter() - start_time
+        table = None
+
+    log_target = sys.stderr if verbose else open(os.devnull, 'w', encoding='utf-8')
+    result = None
+    try:
+        with _config_overrides(config, _case_overrides(case, plots, data_path, max_workers, memory)), \
+                contextlib.redirect_stdout(log_target):
+            result = run_analysis(data_path, config, df=table)
+    except Exception as e:
+        record['status'] = 'error'
+        record['error'] = f"{type(e).__name__}: {e}"
+    finally:
+        if log_target is not sys.stderr:
+            log_target.close()
+        plt.close('all')
+
+    if result is not None:
+        record.update({
+            'elapsed': result.elapsed,
+            'rows_after_clean': result.rows,
+            'ng_total': result.ng_total,
+            'stages': result.stage_seconds,
+            'spans': {row['name']: {'count': row['count'],
+                                    'wall_total': row['wall_total'],
+                                    'cpu_total': row['cpu_total']}
+                      for row in TRACER.summary()},
+        })
+        if result.memory:
+            record['memory'] = result.memory
+        shutil.rmtree(result.output_dir, ignore_errors=True)
+    return record
+
+def run_benchmark(cases: List[BenchmarkCase], plots: List[str], repeat: int = 1,
+                  seed: int = 42, with_excel: bool = False, max_workers: Optional[int] = None,
+                  max_cells: int = DEFAULT_MAX_CELLS, memory: bool = False,
+                  verbose: bool = False) -> dict:
+    """依次运行所有组合
+    Args:
+        cases: 参数组合列表
+        plots: 启用的图表类型
+        repeat: 每个组合运行的次数，保留耗时最短的一次
+        seed: 随机种子
+        with_excel: 是否经过Excel文件读写
+        max_workers: 任务图执行器的线程数
+        max_cells: 数据单元格数（行数 x 列数）超过该值的组合被跳过
+        memory: 是否同时记录各阶段的内存峰值
+        verbose: 是否输出分析日志
+    Returns:
+        dict: 基准测试结果，可直接保存为JSON
+    """
+    report = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'environment': _environment(),
+        'settings': {'plots': plots, 'repeat': repeat, 'seed': seed,
+                     'with_excel': with_excel, 'max_workers': max_workers, 'memory': memory},
+        'cases': [],
+    }
+    work_dir = tempfile.mkdtemp(prefix='dac_bench_')
+    try:
+        for i, case in enumerate(cases, 1):
+            prefix = f"[{i}/{len(cases)}] {case.name}"
+            if case.rows * case.columns > max_cells:
+                print(f"{prefix}: 跳过（数据量超过 {max_cells} 个单元格）", file=sys.stderr)
+                report['cases'].append({'name': case.name, 'params': asdict(case),
+                                        'status': 'skipped'})
+                continue
+
+            runs = [run_case(case, plots, work_dir, seed, with_excel, max_workers, memory, verbose)
+                    for _ in range(repeat)]
+            succeeded = [run for run in runs if run['status'] == 'ok']
+            if succeeded:
+                record = min(succeeded, key=lambda run: run['elapsed'])
+                record['runs'] = [run['elapsed'] for run in succeeded]
+                print(f"{prefix}: {record['elapsed']:.2f}秒", file=sys.stderr)
+            else:
+                record = runs[-1]
+                print(f"{prefix}: 失败 {record['error']}", file=sys.stderr)
+            report['cases'].append(record)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return report
+
+def _metrics(record: dict) -> Dict[str, float]:
+    """展开一个组合的全部计时指标"""
+    metrics = {'elapsed': record['elapsed']}
+    for stage, seconds in record.get('stages', {}).items():
+        metrics[f'stage:{stage}'] = seconds
+    for name, span in record.get('spans', {}).items():
+        metrics[f'span:{name}'] = span['wall_total']
+    return metrics
+
+def compare_results(baseline: dict, current: dict, threshold: float = 0.2,
+                    min_seconds: float = 0.05) -> List[dict]:
+    """对比两次基准测试结果
+    Args:
+        baseline: 基准结果
+        current: 当前结果
+        threshold: 相对变慢超过该比例视为回退
+        min_seconds: 绝对变慢小于该秒数时忽略（避免计时抖动）
+    Returns:
+        List[dict]: 每个组合、每项指标的对比，regression 为True表示回退
+    """
+    base_cases = {case['name']: case for case in baseline['cases'] if case['status'] == 'ok'}
+    rows = []
+    for case in current['cases']:
+        base = base_cases.get(case['name'])
+        if case['status'] != 'ok' or base is None:
+            continue
+        base_metrics = _metrics(base)
+        for metric, seconds in _metrics(case).items():
+            if metric not in base_metrics:
+                continue
+            base_seconds = base_metrics[metric]
+            ratio = seconds / base_seconds if base_seconds > 0 else float('inf')
+            rows.append({
+                'case': case['name'],
+                'metric': metric,
+                'baseline': base_seconds,
+                'current': seconds,
+                'ratio': ratio,
+                'regression': (seconds > base_seconds * (1 + threshold)
+                               and seconds - base_seconds >= min_seconds),
+            })
+    return rows
+
+def print_comparison(rows: List[dict]) -> None:
+    """输出回退的指标和各组合的总耗时变化"""
+    for row in rows:
+        if row['metric'] == 'elapsed':
+            print(f"{row['case']}: {row['baseline']:.2f}秒 -> {row['current']:.2f}秒 "
+                  f"({row['ratio']:.2f}x)", file=sys.stderr)
+    regressions = [row for row in rows if row['regression']]
+    if not regressions:
+        print("未发现性能回退", file=sys.stderr)
+        return
+    print(f"\n发现 {len(regressions)} 项性能回退:", file=sys.stderr)
+    for row in sorted(regressions, key=lambda row: row['ratio'], reverse=True):
+        print(f"  {row['case']} {row['metric']}: {row['baseline']:.3f}秒 -> "
+              f"{row['current']:.3f}秒 ({row['ratio']:.2f}x)", file=sys.stderr)
+
+def load_results(path: str) -> dict:
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def save_results(report: dict, path: str) -> str:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    return path
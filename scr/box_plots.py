@@ -6,22 +6,24 @@ from matplotlib.figure import Figure
 from matplotlib.axes import Axes
 from typing import List, Tuple, Optional
 from scr.plot_base import PlotStyle, PlotHelper
+from scr.instrument import TRACER
 from scr.data_processing import (get_data_columns, preprocess_data,
-                               calculate_out_of_spec, calculate_cpk)
+                               calculate_fail_matrix, calculate_cpk)
 
 class BoxPlot:
     """箱线图类"""
     def __init__(self, style: PlotStyle = PlotStyle()):
         self.style = style
 
-    def create(self, df: pd.DataFrame, config: object) -> Tuple[Figure, Axes]:
+    def create(self, df: pd.DataFrame, config: object,
+               prepared: Optional[tuple] = None) -> Tuple[Figure, Axes]:
         """创建箱线图"""
         data_columns = get_data_columns(df, config)
-        data_df, lsl_values, usl_values = preprocess_data(df)
+        data_df, lsl_values, usl_values = prepared if prepared is not None else preprocess_data(df)
         
-        total_count, out_of_spec_count = calculate_out_of_spec(
-            data_df, data_columns, lsl_values, usl_values
-        )
+        # 按单元计数（与分布图总标题一致），一个单元有多项超限时只计一次
+        fails = calculate_fail_matrix(data_df, data_columns, lsl_values, usl_values)
+        total_count, out_of_spec_count = len(fails), int(fails.any(axis=1).sum())
         
         fig, ax = plt.subplots(figsize=config.PLOT['boxplot']['figsize'])
         
@@ -38,8 +40,9 @@ class BoxPlot:
                 bbox=self.style.bbox_style)
         
         # 绘制箱线图
-        sns.boxplot(data=data_df[data_columns], ax=ax, 
-                   flierprops=self.style.flierprops)
+        with TRACER.span('sns.boxplot', 'plot'):
+            sns.boxplot(data=data_df[data_columns], ax=ax, 
+                       flierprops=self.style.flierprops)
         
         # 设置标签
         x_labels = [col.split('_')[-1] for col in data_columns]
@@ -49,7 +52,8 @@ class BoxPlot:
         # 添加统计信息
         self._add_statistics(ax, data_df, data_columns, lsl_values, usl_values, config)
         
-        plt.tight_layout()
+        with TRACER.span('tight_layout', 'layout'):
+            plt.tight_layout()
         return fig, ax
 
     def _add_statistics(self, ax: Axes, data_df: pd.DataFrame, 
@@ -75,7 +79,7 @@ class BoxPlot:
                        fontsize='small')
             
             # 添加中位数
-            median = np.median(data)
+            median = data.median()  # 忽略空值（保留空值或排除异常值时）
             ax.text(col_idx, median, f'{median:.3f}',
                     horizontalalignment='center',
                     verticalalignment='center',
@@ -112,8 +116,9 @@ class GroupBoxPlot:
         fig, ax = plt.subplots()
         
         # 绘制箱线图
-        sns.boxplot(data=actual_data, y=data_columns[0], x=group_by,
-                   ax=ax, flierprops=self.style.flierprops)
+        with TRACER.span('sns.boxplot', 'plot'):
+            sns.boxplot(data=actual_data, y=data_columns[0], x=group_by,
+                       ax=ax, flierprops=self.style.flierprops)
         
         # 设置标题
         title = f"{config.PLOT['title_prefix']} {data_columns[0]}" if config.PLOT['title_prefix'] else data_columns[0]
@@ -129,7 +134,8 @@ class GroupBoxPlot:
             ax.axhline(y=usl, color='r', linestyle='--', label=f'USL: {usl:.2f}')
         
         ax.legend()
-        plt.tight_layout()
+        with TRACER.span('tight_layout', 'layout'):
+            plt.tight_layout()
         return fig, ax
 
     def create_all_columns(self, df: pd.DataFrame, group_by: str, config: object) -> Tuple[Figure, Axes]:
@@ -171,7 +177,8 @@ class GroupBoxPlot:
         # 设置图表属性
         self._setup_plot_properties(ax, positions, data_columns, groups, config)
         
-        plt.tight_layout()
+        with TRACER.span('tight_layout', 'layout'):
+            plt.tight_layout()
         return fig, ax
 
     def _add_limit_lines(self, ax: Axes, data_columns: List[str],
@@ -224,10 +231,11 @@ class GroupBoxPlot:
         ax.legend(legend_elements, groups, loc='upper right')
 
 
-def plot_boxplots(df: pd.DataFrame, config: object) -> Tuple[Figure, Axes]:
+def plot_boxplots(df: pd.DataFrame, config: object,
+                  prepared: Optional[tuple] = None) -> Tuple[Figure, Axes]:
     """绘制箱线图"""
     plotter = BoxPlot()
-    return plotter.create(df, config)
+    return plotter.create(df, config, prepared)
 
 def plot_group_boxplots(df: pd.DataFrame, group_by: str, config: object) -> Tuple[Figure, Axes]:
     """绘制分组箱线图"""
@@ -0,0 +1,426 @@
+"""命令行入口
+
+用法示例:
+    python cli.py batch "data/**/*.xlsx" --config nightly.json --jobs 4 --summary summary.json
+    python cli.py watch //station-share/logs --config nightly.json --jobs 2 --poll
+    python cli.py bench --preset quick -o benchmarks/v1.json
+    python cli.py trend S_NearSfr_Center1 --group LineB --metric cpk --since 2024-06-01
+    python cli.py trace P010233
+
+配置文件为JSON，顶层键对应 config.py 中的配置段（PLOT、DATA_PROCESSING、
+DATA_COLUMNS、OUTPUT、PIPELINE 等，大小写均可），其中的值会覆盖默认配置。
+"""
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+import contextlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional
+
+# 退出码
+EXIT_OK = 0            # 全部成功
+EXIT_FAILED = 1        # 部分或全部文件分析失败
+EXIT_USAGE = 2         # 参数错误或没有匹配的输入文件
+EXIT_INTERRUPTED = 130 # 被用户中断
+
+def expand_inputs(patterns: List[str]) -> List[str]:
+    """展开输入路径和通配符，保持顺序并去重
+    Args:
+        patterns: 文件路径或通配符列表，支持 ** 递归匹配
+    Returns:
+        List[str]: 匹配到的文件的绝对路径
+    """
+    paths = []
+    seen = set()
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern, recursive=True)) if glob.has_magic(pattern) else [pattern]
+        for path in matches:
+            path = os.path.abspath(path)
+            if os.path.isfile(path) and path not in seen:
+                seen.add(path)
+                paths.append(path)
+    return paths
+
+def load_config_overrides(path: Optional[str]) -> Dict[str, dict]:
+    """读取JSON配置文件
+    Args:
+        path: 配置文件路径，为None时返回空配置
+    Returns:
+        Dict[str, dict]: 配置段名（大写） -> 覆盖值
+    Raises:
+        ValueError: 配置文件格式不正确时
+    """
+    if not path:
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        raw = json.load(f)
+    if not isinstance(raw, dict):
+        raise ValueError(f"配置文件顶层必须是对象: {path}")
+    return {section.upper(): values for section, values in raw.items()}
+
+def _deep_update(target: dict, overrides: dict) -> None:
+    for key, value in overrides.items():
+        if isinstance(value, dict) and isinstance(target.get(key), dict):
+            _deep_update(target[key], value)
+        else:
+            target[key] = value
+
+def apply_config_overrides(config_module, overrides: Dict[str, dict]) -> None:
+    """把覆盖值合并到配置模块中（在工作进程内调用，各进程互不影响）"""
+    for section, values in overrides.items():
+        current = getattr(config_module, section, None)
+        if isinstance(current, dict) and isinstance(values, dict):
+            _deep_update(current, values)
+        else:
+            setattr(config_module, section, values)
+
+def _init_worker() -> None:
+    """工作进程初始化：使用非交互式后端并预先导入分析模块"""
+    import matplotlib
+    matplotlib.use('Agg')
+    from . import analyzer  # noqa: F401
+
+def analyze_file(data_path: str, overrides: Dict[str, dict], verbose: bool = False) -> dict:
+    """在当前进程中分析单个文件并返回可序列化的结果摘要"""
+    import config
+    from .analyzer import run_analysis
+
+    apply_config_overrides(config, overrides)
+    config.DATA['path'] = data_path
+
+    start_time = time.perf_counter()
+    # 分析过程的输出不能混入标准输出中的JSON摘要
+    log_target = sys.stderr if verbose else open(os.devnull, 'w', encoding='utf-8')
+    try:
+        with contextlib.redirect_stdout(log_target):
+            result = run_analysis(data_path, config)
+        summary = result.summary()
+        summary['status'] = 'ok'
+        return summary
+    except Exception as e:
+        return {
+            'data_path': data_path,
+            'status': 'error',
+            'error': f"{type(e).__name__}: {e}",
+            'elapsed': time.perf_counter() - start_time,
+        }
+    finally:
+        if log_target is not sys.stderr:
+            log_target.close()
+        import matplotlib.pyplot as plt
+        plt.close('all')
+
+def run_batch(paths: List[str], overrides: Dict[str, dict], jobs: int = 1,
+              verbose: bool = False) -> dict:
+    """并行分析多个文件
+    Args:
+        paths: 输入文件列表
+        overrides: 配置覆盖值
+        jobs: 并行的工作进程数
+        verbose: 是否把分析日志输出到标准错误
+    Returns:
+        dict: 批量运行的摘要
+    """
+    start_time = time.perf_counter()
+    results = []
+    if jobs <= 1:
+        _init_worker()
+        for path in paths:
+            results.append(analyze_file(path, overrides, verbose))
+            print(f"[{len(results)}/{len(paths)}] {results[-1]['status']}: {path}", file=sys.stderr)
+    else:
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker) as pool:
+            futures = {pool.submit(analyze_file, path, overrides, verbose): (path, time.perf_counter())
+                       for path in paths}
+            for future in as_completed(futures):
+                path, submitted = futures[future]
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    # 工作进程异常退出（BrokenProcessPool）或结果无法传回时只记录该文件失败
+                    results.append({
+                        'data_path': path,
+                        'status': 'error',
+                        'error': f"{type(e).__name__}: {e}",
+                        'elapsed': time.perf_counter() - submitted,
+                    })
+                print(f"[{len(results)}/{len(paths)}] {results[-1]['status']}: {path}", file=sys.stderr)
+
+    # 按输入顺序输出
+    order = {path: i for i, path in enumerate(paths)}
+    results.sort(key=lambda item: order[item['data_path']])
+    succeeded = [item for item in results if item['status'] == 'ok']
+    return {
+        'total': len(results),
+        'succeeded': len(succeeded),
+        'failed': len(results) - len(succeeded),
+        'rows': sum(item['rows'] for item in succeeded),
+        'ng_total': sum(item['ng_total'] for item in succeeded),
+        'jobs': jobs,
+        'elapsed': time.perf_counter() - start_time,
+        'files': results,
+    }
+
+def _add_batch_parser(subparsers) -> None:
+    parser = subparsers.add_parser('batch', help='批量分析多个数据文件')
+    parser.add_argument('inputs', nargs='+', help='输入文件路径或通配符（支持 **）')
+    parser.add_argument('-c', '--config', help='JSON配置文件，覆盖 config.py 中的配置')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1,
+                        help='并行的工作进程数（默认: CPU核数）')
+    parser.add_argument('-o', '--summary', help='同时把JSON摘要写入该文件')
+    parser.add_argument('-v', '--verbose', action='store_true', help='把分析日志输出到标准错误')
+    parser.set_defaults(handler=_cmd_batch)
+
+def _cmd_batch(args) -> int:
+    try:
+        overrides = load_config_overrides(args.config)
+    except (OSError, ValueError) as e:
+        print(f"读取配置文件失败: {e}", file=sys.stderr)
+        return EXIT_USAGE
+
+    paths = expand_inputs(args.inputs)
+    if not paths:
+        print("没有匹配的输入文件", file=sys.stderr)
+        return EXIT_USAGE
+
+    jobs = max(1, min(args.jobs, len(paths)))
+    summary = run_batch(paths, overrides, jobs, args.verbose)
+
+    text = json.dumps(summary, ensure_ascii=False, indent=2)
+    print(text)
+    if args.summary:
+        with open(args.summary, 'w', encoding='utf-8') as f:
+            f.write(text)
+    return EXIT_OK if summary['failed'] == 0 else EXIT_FAILED
+
+def _add_watch_parser(subparsers) -> None:
+    parser = subparsers.add_parser('watch', help='监视文件夹并自动分析新的数据文件')
+    parser.add_argument('folder', help='监视的文件夹')
+    parser.add_argument('-c', '--config', help='JSON配置文件，覆盖 config.py 中的配置')
+    parser.add_argument('-p', '--pattern', default='*.xlsx', help='文件名匹配模式（默认: *.xlsx）')
+    parser.add_argument('-r', '--recursive', action='store_true', help='同时监视子文件夹')
+    parser.add_argument('-j', '--jobs', type=int, default=2, help='工作进程数（默认: 2）')
+    parser.add_argument('--settle', type=float, default=5.0,
+                        help='文件保持不变多少秒后才开始分析（默认: 5）')
+    parser.add_argument('--interval', type=float, default=2.0, help='检查间隔秒数（默认: 2）')
+    parser.add_argument('--ledger', help='已处理记录的数据库路径（默认: 输出子文件夹下的 processed.sqlite）')
+    parser.add_argument('--poll', action='store_true', help='强制使用定时扫描（适用于网络共享）')
+    parser.add_argument('-v', '--verbose', action='store_true', help='把分析日志输出到标准错误')
+    parser.set_defaults(handler=_cmd_watch)
+
+def _cmd_watch(args) -> int:
+    from .watcher import FolderWatcher
+    try:
+        overrides = load_config_overrides(args.config)
+    except (OSError, ValueError) as e:
+        print(f"读取配置文件失败: {e}", file=sys.stderr)
+        return EXIT_USAGE
+    if not os.path.isdir(args.folder):
+        print(f"文件夹不存在: {args.folder}", file=sys.stderr)
+        return EXIT_USAGE
+
+    watcher = FolderWatcher(args.folder, overrides, pattern=args.pattern,
+                            recursive=args.recursive, jobs=args.jobs,
+                            settle_seconds=args.settle, poll_interval=args.interval,
+                            ledger_path=args.ledger, use_polling=args.poll,
+                            verbose=args.verbose)
+    watcher.run()
+    return EXIT_OK
+
+def _parse_count(text: str) -> int:
+    """解析数量，支持 k/M 后缀，如 1k、5M"""
+    text = text.strip()
+    scale = {'k': 1_000, 'm': 1_000_000}.get(text[-1:].lower(), 1)
+    number = text[:-1] if scale != 1 else text
+    return int(float(number) * scale)
+
+def _count_list(text: str) -> List[int]:
+    return [_parse_count(item) for item in text.split(',') if item.strip()]
+
+def _float_list(text: str) -> List[float]:
+    return [float(item) for item in text.split(',') if item.strip()]
+
+def _add_bench_parser(subparsers) -> None:
+    from .benchmark import PLOT_TYPES, PRESETS, DEFAULT_MAX_CELLS
+    parser = subparsers.add_parser('bench', help='用生成的数据运行性能基准测试')
+    parser.add_argument('--preset', choices=sorted(PRESETS), default='quick',
+                        help='预设的参数组合（默认: quick），下面的参数会覆盖预设值')
+    parser.add_argument('--rows', type=_count_list, help='行数列表，如 1k,100k,5M')
+    parser.add_argument('--columns', type=_count_list, help='数据列数列表，如 20,200,2000')
+    parser.add_argument('--groups', type=_count_list, help='分组数列表，1表示不做分组分析')
+    parser.add_argument('--nan-rates', type=_float_list, help='空值比例列表，如 0,0.01')
+    parser.add_argument('--sentinel-rates', type=_float_list, help='-10001无效值比例列表')
+    parser.add_argument('--plots', default='distribution,boxplot',
+                        help=f"启用的图表类型，逗号分隔（可选: {','.join(PLOT_TYPES)}，"
+                             f"默认: distribution,boxplot）")
+    parser.add_argument('--repeat', type=int, default=1, help='每个组合运行的次数，取最快的一次')
+    parser.add_argument('--seed', type=int, default=42, help='随机种子（默认: 42）')
+    parser.add_argument('--excel', action='store_true',
+                        help='先写出Excel文件再读取，把读取耗时计入结果（行数不能超过Excel上限）')
+    parser.add_argument('--max-workers', type=int, help='任务图执行器的线程数（默认: 配置值）')
+    parser.add_argument('--max-cells', type=_parse_count, default=DEFAULT_MAX_CELLS,
+                        help='行数x列数超过该值的组合被跳过')
+    parser.add_argument('--memory', action='store_true',
+                        help='同时记录各阶段的内存峰值（任务串行执行，耗时不宜与普通结果对比）')
+    parser.add_argument('-o', '--output', help='结果文件（默认: benchmarks/bench_时间戳.json）')
+    parser.add_argument('--baseline', help='与该结果文件对比，发现回退时返回退出码1')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='相对变慢超过该比例视为回退（默认: 0.2）')
+    parser.add_argument('-v', '--verbose', action='store_true', help='把分析日志输出到标准错误')
+    parser.set_defaults(handler=_cmd_bench)
+
+def _cmd_bench(args) -> int:
+    from .benchmark import (PLOT_TYPES, PRESETS, build_cases, run_benchmark,
+                            save_results, load_results, compare_results, print_comparison)
+    plots = [name.strip() for name in args.plots.split(',') if name.strip()]
+    unknown = [name for name in plots if name not in PLOT_TYPES]
+    if unknown:
+        print(f"未知的图表类型: {', '.join(unknown)}", file=sys.stderr)
+        return EXIT_USAGE
+    try:
+        baseline = load_results(args.baseline) if args.baseline else None
+    except (OSError, ValueError) as e:
+        print(f"读取基准结果失败: {e}", file=sys.stderr)
+        return EXIT_USAGE
+
+    preset = PRESETS[args.preset]
+    cases = build_cases(args.rows or preset['rows'], args.columns or preset['columns'],
+                        args.groups or preset['groups'],
+                        args.nan_rates if args.nan_rates is not None else preset['nan_rates'],
+                        args.sentinel_rates if args.sentinel_rates is not None
+                        else preset['sentinel_rates'])
+
+    _init_worker()
+    report = run_benchmark(cases, plots, repeat=max(1, args.repeat), seed=args.seed,
+                           with_excel=args.excel, max_workers=args.max_workers,
+                           max_cells=args.max_cells, memory=args.memory,
+                           verbose=args.verbose)
+    output = args.output or os.path.join('benchmarks', f"bench_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    save_results(report, output)
+    print(f"结果已保存到 {output}", file=sys.stderr)
+
+    failed = any(case['status'] == 'error' for case in report['cases'])
+    if baseline is not None:
+        rows = compare_results(baseline, report, args.threshold)
+        print_comparison(rows)
+        failed = failed or any(row['regression'] for row in rows)
+    return EXIT_FAILED if failed else EXIT_OK
+
+def _add_bench_compare_parser(subparsers) -> None:
+    parser = subparsers.add_parser('bench-compare', help='对比两次基准测试的结果')
+    parser.add_argument('baseline', help='基准结果文件')
+    parser.add_argument('current', help='当前结果文件')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='相对变慢超过该比例视为回退（默认: 0.2）')
+    parser.set_defaults(handler=_cmd_bench_compare)
+
+def _cmd_bench_compare(args) -> int:
+    from .benchmark import load_results, compare_results, print_comparison
+    try:
+        baseline = load_results(args.baseline)
+        current = load_results(args.current)
+    except (OSError, ValueError) as e:
+        print(f"读取基准结果失败: {e}", file=sys.stderr)
+        return EXIT_USAGE
+    rows = compare_results(baseline, current, args.threshold)
+    print_comparison(rows)
+    return EXIT_FAILED if any(row['regression'] for row in rows) else EXIT_OK
+
+def _default_results_db() -> str:
+    """配置中的结果数据库路径，未配置路径时使用 DATA['path'] 对应的输出子文件夹"""
+    import config
+    from .results_store import RESULTS_DB_NAME
+    from .utils import get_output_dir
+    db_path = config.OUTPUT.get('results_db', False)
+    if isinstance(db_path, str) and db_path:
+        return db_path
+    return os.path.join(os.path.dirname(get_output_dir(config.DATA['path'])), RESULTS_DB_NAME)
+
+def _add_trend_parser(subparsers) -> None:
+    from .results_store import METRICS
+    parser = subparsers.add_parser('trend', help='从结果数据库查询某个数据列的统计量趋势')
+    parser.add_argument('item', nargs='?', help='数据列名；省略时列出数据库中的数据列和分组')
+    parser.add_argument('--db', help='结果数据库路径（默认: 配置的 results_db 或输出子文件夹下的 results.sqlite）')
+    parser.add_argument('-m', '--metric', choices=METRICS, default='cpk', help='统计量（默认: cpk）')
+    parser.add_argument('-g', '--group', help='分组名，如 LineB（默认: 整体数据）')
+    parser.add_argument('--since', help='只包含该时间之后的运行，如 2024-06-01')
+    parser.add_argument('--until', help='只包含该时间之前的运行')
+    parser.add_argument('--source', help='只包含来源文件名匹配该模式的运行，如 "LineB%%"')
+    parser.add_argument('-o', '--output', help='同时把结果写入CSV文件')
+    parser.set_defaults(handler=_cmd_trend)
+
+def _cmd_trend(args) -> int:
+    from .results_store import ResultsStore
+    db_path = args.db or _default_results_db()
+    if not os.path.isfile(db_path):
+        print(f"结果数据库不存在: {db_path}", file=sys.stderr)
+        return EXIT_USAGE
+    with ResultsStore(db_path) as store:
+        if not args.item:
+            print("数据列: " + ", ".join(store.items()))
+            print("分组: " + ", ".join(store.groups()))
+            return EXIT_OK
+        trend = store.trend(args.item, args.metric, args.group, args.since, args.until, args.source)
+    if trend.empty:
+        print(f"没有找到 {args.item} 的记录", file=sys.stderr)
+        return EXIT_FAILED
+    print(trend.to_string(index=False))
+    if args.output:
+        trend.to_csv(args.output, index=False, encoding='utf-8-sig')
+    return EXIT_OK
+
+def _add_trace_parser(subparsers) -> None:
+    parser = subparsers.add_parser('trace', help='从结果数据库查询某个单元（SN 或 Camera_S）的历次测量')
+    parser.add_argument('key', help='SN 或 Camera_S')
+    parser.add_argument('--db', help='结果数据库路径（默认: 配置的 results_db 或输出子文件夹下的 results.sqlite）')
+    parser.add_argument('-i', '--item', action='append', help='只显示该数据列，可重复指定')
+    parser.add_argument('-o', '--output', help='同时把全部测量值（长表）写入CSV文件')
+    parser.set_defaults(handler=_cmd_trace)
+
+def _cmd_trace(args) -> int:
+    from .results_store import ResultsStore
+    db_path = args.db or _default_results_db()
+    if not os.path.isfile(db_path):
+        print(f"结果数据库不存在: {db_path}", file=sys.stderr)
+        return EXIT_USAGE
+    with ResultsStore(db_path) as store:
+        tests = store.unit_tests(args.key)
+        history = store.unit_history(args.key)
+    if tests.empty:
+        print(f"没有找到 {args.key} 的记录", file=sys.stderr)
+        return EXIT_FAILED
+    print(tests.to_string(index=False))
+    values = history[history['item'].isin(args.item)] if args.item else history
+    # 每个数据列一行，每次测试一列；(run_id, row) 区分同一时间的重复测试
+    test_label = (values['run_id'].astype(str) + ':' + values['row'].astype(str) + ' '
+                  + values['time'].fillna(''))
+    table = values.assign(test=test_label).pivot_table(index='item', columns='test', values='value',
+                                                      aggfunc='first', dropna=False, sort=False)
+    print()
+    print(table.to_string())
+    if args.output:
+        history.to_csv(args.output, index=False, encoding='utf-8-sig')
+    return EXIT_OK
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='cli.py', description='数据分析工具命令行')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    _add_batch_parser(subparsers)
+    _add_watch_parser(subparsers)
+    _add_bench_parser(subparsers)
+    _add_bench_compare_parser(subparsers)
+    _add_trend_parser(subparsers)
+    _add_trace_parser(subparsers)
+    return parser
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """命令行主函数，返回退出码"""
+    args = build_parser().parse_args(argv)
+    try:
+        return args.handler(args)
+    except KeyboardInterrupt:
+        print("已中断", file=sys.stderr)
+        return EXIT_INTERRUPTED
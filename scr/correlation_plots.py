@@ -7,6 +7,7 @@ from typing import Tuple
 from matplotlib.figure import Figure
 from matplotlib.axes import Axes
 from .plot_base import PlotStyle
+from .instrument import TRACER
 from .data_processing import get_data_columns, preprocess_data
 
 class CorrelationPlot:
@@ -61,7 +62,8 @@ class CorrelationPlot:
             ax.set_title('相关性矩阵')
         
         # 调整布局
-        plt.tight_layout()
+        with TRACER.span('tight_layout', 'layout'):
+            plt.tight_layout()
         return fig, ax
 
     def plot_item_correlations(self, df: pd.DataFrame, target_item: str, 
@@ -91,8 +93,9 @@ class CorrelationPlot:
             corr_value = correlations[other_item]
             
             # 绘制散点图和趋势线
-            sns.regplot(data=data_df, x=target_item, y=other_item, 
-                       scatter_kws={'alpha':0.5}, ax=ax)
+            with TRACER.span('sns.regplot', 'plot'):
+                sns.regplot(data=data_df, x=target_item, y=other_item, 
+                           scatter_kws={'alpha':0.5}, ax=ax)
             
             # 添加相关系数
             ax.text(0.05, 0.95, f'r = {corr_value:.3f}',
@@ -103,18 +106,31 @@ class CorrelationPlot:
             # 设置标题
             ax.set_title(f'{target_item} vs {other_item}')
         
-        plt.tight_layout()
+        with TRACER.span('tight_layout', 'layout'):
+            plt.tight_layout()
         return fig, fig.axes
 
-def plot_correlations(df: pd.DataFrame, config: object) -> None:
-    """绘制相关性分析图"""
+def _save(fig: Figure, output_path: str, writer=None) -> None:
+    if writer is not None:
+        writer.submit_figure(fig, output_path, dpi=300, bbox_inches='tight')
+        return
+    with TRACER.span('savefig', 'io'):
+        fig.savefig(output_path, dpi=300, bbox_inches='tight')
+
+def plot_correlations(df: pd.DataFrame, config: object, writer=None, output_dir: str = None) -> None:
+    """绘制相关性分析图，提供 writer（OutputWriter）时在后台写盘
+    Args:
+        output_dir: 本次分析的输出目录，相关性分析图写入其下的 OUTPUT['correlation_dir'] 子目录；
+            为None时写入数据文件的输出子文件夹（不带时间戳，多次运行互相覆盖）
+    """
     try:
         plotter = CorrelationPlot()
         
         # 获取输出目录
-        from .utils import get_output_dir
-        base_output_dir = get_output_dir(config.DATA['path'])
-        correlation_dir = os.path.join(base_output_dir, 'correlation_analysis')
+        if output_dir is None:
+            from .utils import get_output_dir
+            output_dir = get_output_dir(config.DATA['path'])
+        correlation_dir = os.path.join(output_dir, config.OUTPUT.get('correlation_dir', 'correlation_analysis'))
         print(f"\n创建输出目录: {correlation_dir}")
         os.makedirs(correlation_dir, exist_ok=True)
         
@@ -123,8 +139,10 @@ def plot_correlations(df: pd.DataFrame, config: object) -> None:
         fig_matrix, _ = plotter.plot_correlation_matrix(df, config)
         output_path = os.path.join(correlation_dir, '相关性矩阵.png')
         print(f"保存相关性矩阵图到: {output_path}")
-        fig_matrix.savefig(output_path, dpi=300, bbox_inches='tight')
-        plt.close(fig_matrix)
+        try:
+            _save(fig_matrix, output_path, writer)
+        finally:
+            plt.close(fig_matrix)
         
         # 为每个数据列创建相关性分析图
         print("\n开始生成各项相关性散点图...")
@@ -133,8 +151,10 @@ def plot_correlations(df: pd.DataFrame, config: object) -> None:
             print(f"处理 {target_item}...")
             fig_corr, _ = plotter.plot_item_correlations(df, target_item, config)
             output_path = os.path.join(correlation_dir, f'{target_item}_相关性分析.png')
-            fig_corr.savefig(output_path, dpi=300, bbox_inches='tight')
-            plt.close(fig_corr)
+            try:
+                _save(fig_corr, output_path, writer)
+            finally:
+                plt.close(fig_corr)
             
     except Exception as e:
         print(f"\n生成相关性分析图时出错: {str(e)}")
@@ -0,0 +1,216 @@
+"""
+# data_generator.py
+数据表，
+它的列包含SN,Time,Line,Camera_S这些基本信息，
+以及若干列数据（默认20列），SN生成序列号，Camera_S是模组序列号，
+数据列符合正态分布，按 Center : 0.5 : 0.8 = 1 : 2 : 2 的比例命名，默认列名
+S_NearSfr_Center1-S_NearSfr_Center4，
+S_NearSfr_0.5-5-S_NearSfr_0.5-12，
+S_NearSfr_0.8-13-S_NearSfr_0.8-20，
+第一行和第二行是数据规格LSL和USL，
+S_NearSfr_Center的规格是50-150，生成的数据范围是49-100；
+S_NearSfr_0.5的规格是40-150，生成的数据范围是38-90；
+S_NearSfr_0.8的规格是30-150，生成的数据范围是27-100，
+数据默认有1%的空值，可选地加入-10001无效值
+
+行数、列数、分组数以及空值和无效值的比例都可以调整，用于性能基准测试
+（见 scr/benchmark.py）。所有列都按整列向量化生成，百万行级别也能在数秒内完成。
+"""
+
+import os
+import pandas as pd
+import numpy as np
+
+# 测量设备写入的无效值，clean_data 会把它替换为空值
+SENTINEL_VALUE = -10001
+
+def _format_codes(prefix, *fields):
+    """按列拼接定长的编码字符串，例如 _format_codes('P', (months, 2), (index, 4))
+
+    逐行格式化字符串在百万行级别需要数秒，这里直接用整数运算生成ASCII数字。
+    Args:
+        prefix: 固定前缀
+        fields: (整数数组, 位数) 元组
+    Returns:
+        np.ndarray: 字符串数组
+    """
+    rows = len(fields[0][0])
+    parts = [np.full((rows, len(prefix)), np.frombuffer(prefix.encode(), dtype=np.uint8))]
+    for values, width in fields:
+        powers = 10 ** np.arange(width - 1, -1, -1, dtype=np.int64)
+        parts.append((np.asarray(values, dtype=np.int64)[:, None] // powers % 10
+                      + ord('0')).astype(np.uint8))
+    chars = np.ascontiguousarray(np.hstack(parts))
+    return chars.view(f'S{chars.shape[1]}').ravel().astype(str)
+
+class DataGenerator:
+    """测试数据生成器
+
+    Args:
+        num_rows: 数据行数（不含规格行）
+        seed: 随机种子
+        num_columns: 数据列数
+        num_groups: Line列的分组数
+        nan_rate: 每列空值的比例
+        sentinel_rate: 每列-10001无效值的比例
+        repeat_rate: 重复测试（SN重复出现）的比例
+        time_freq: Time列的时间间隔，行数很多时可用 's' 等更小的间隔
+    """
+    def __init__(self, num_rows=500, seed=42, num_columns=20, num_groups=3,
+                 nan_rate=0.01, sentinel_rate=0.0, repeat_rate=0.05, time_freq='h'):
+        self.num_rows = num_rows
+        self.num_columns = num_columns
+        self.num_groups = num_groups
+        self.nan_rate = nan_rate
+        self.sentinel_rate = sentinel_rate
+        self.repeat_rate = repeat_rate
+        self.time_freq = time_freq
+        self.rng = np.random.default_rng(seed)
+
+        # 定义数据规格和范围
+        self.specs = {
+            'Center': {'LSL': 50, 'USL': 150, 'range': (49, 100), 'mean': 75, 'std': 10},
+            '0.5': {'LSL': 40, 'USL': 150, 'range': (38, 90), 'mean': 65, 'std': 10},
+            '0.8': {'LSL': 30, 'USL': 150, 'range': (27, 100), 'mean': 65, 'std': 15}
+        }
+
+        # 定义列名，序号在三类列之间连续编号
+        center_count = max(1, round(num_columns / 5))
+        half_count = (num_columns - center_count + 1) // 2
+        self.columns = {
+            'Center': [f'S_NearSfr_Center{i}' for i in range(1, center_count + 1)],
+            '0.5': [f'S_NearSfr_0.5-{i}'
+                    for i in range(center_count + 1, center_count + half_count + 1)],
+            '0.8': [f'S_NearSfr_0.8-{i}'
+                    for i in range(center_count + half_count + 1, num_columns + 1)]
+        }
+
+    @property
+    def _index_width(self):
+        """序号位数：至少4位，行数超过10000时按最大序号补齐"""
+        return max(4, len(str(max(self.num_rows - 1, 0))))
+
+    def generate_times(self):
+        """生成测试时间"""
+        return pd.date_range(start="2024-01-01", periods=self.num_rows, freq=self.time_freq)
+
+    def generate_sn(self, times=None):
+        """生成产品序列号: PXXYYYY (XX:月份, YYYY:序号)，部分SN重复1-3次"""
+        if times is None:
+            times = self.generate_times()
+
+        # 首先生成基础SN列表
+        base_sn = _format_codes('P', (times.month, 2), (np.arange(self.num_rows), self._index_width))
+
+        # 随机选择一些SN进行1-3次重复，插入到随机位置
+        repeat_count = int(self.num_rows * self.repeat_rate)
+        repeat_indices = self.rng.choice(self.num_rows, size=repeat_count, replace=False)
+        repeated = np.repeat(repeat_indices, self.rng.integers(1, 4, size=repeat_count))
+        positions = self.rng.integers(0, self.num_rows, size=len(repeated))
+        order = np.insert(np.arange(self.num_rows), positions, repeated)
+
+        # 确保总数量正确
+        return base_sn[order[:self.num_rows]]
+
+    def generate_camera_s(self):
+        """生成相机模组序列号: CAM24XXYYYY"""
+        batches = self.rng.integers(10, 13, size=self.num_rows)
+        return _format_codes('CAM24', (batches, 2), (np.arange(self.num_rows), self._index_width))
+
+    def generate_lines(self):
+        """生成产线名称: LineA, LineB, ...（超过26组时为Line001, Line002, ...）"""
+        if self.num_groups <= 26:
+            names = [f"Line{chr(ord('A') + i)}" for i in range(self.num_groups)]
+        else:
+            names = [f"Line{i:03d}" for i in range(1, self.num_groups + 1)]
+        return self.rng.choice(names, size=self.num_rows)
+
+    def _mark_values(self, data, rate, value):
+        """把每列中指定比例的数据替换为 value"""
+        count = int(self.num_rows * rate)
+        if count <= 0:
+            return
+        for j in range(data.shape[1]):
+            data[self.rng.choice(self.num_rows, size=count, replace=False), j] = value
+
+    def generate_normal_data(self, spec_type, num_columns=1):
+        """生成符合正态分布的数据
+        Args:
+            spec_type: 规格类型（'Center', '0.5' 或 '0.8'）
+            num_columns: 列数
+        Returns:
+            np.ndarray: 形状为 (num_rows, num_columns) 的数据
+        """
+        spec = self.specs[spec_type]
+        data = self.rng.normal(
+            loc=spec['mean'],
+            scale=spec['std'],
+            size=(self.num_rows, num_columns)
+        )
+        np.clip(data, spec['range'][0], spec['range'][1], out=data)
+
+        # 添加空值和无效值
+        self._mark_values(data, self.nan_rate, np.nan)
+        self._mark_values(data, self.sentinel_rate, SENTINEL_VALUE)
+        return data
+
+    def generate_dataset(self):
+        """生成完整数据集"""
+        times = self.generate_times()
+        # 基本信息列
+        frames = [pd.DataFrame({
+            "SN": self.generate_sn(times),
+            "Time": times,
+            "Line": self.generate_lines(),
+            "Camera_S": self.generate_camera_s()
+        })]
+
+        # 生成测量数据列，每类规格一次生成整块数据
+        for spec_type, cols in self.columns.items():
+            if cols:
+                frames.append(pd.DataFrame(self.generate_normal_data(spec_type, len(cols)),
+                                           columns=cols))
+
+        return pd.concat(frames, axis=1)
+
+    def generate_specs_df(self):
+        """生成规格数据框"""
+        # 创建规格数据
+        # 基本信息列为空，类型与 generate_dataset 相同（合并时不依赖空列的类型推断）
+        specs_data = {
+            "SN": ["LSL", "USL"],  # 在SN列添加LSL和USL
+            "Time": pd.Series([pd.NaT, pd.NaT], dtype="datetime64[ns]"),
+            "Line": pd.Series([None, None], dtype=object),
+            "Camera_S": pd.Series([None, None], dtype=object)
+        }
+
+        # 添加测量数据的规格
+        for spec_type, cols in self.columns.items():
+            spec = self.specs[spec_type]
+            for col in cols:
+                specs_data[col] = [spec['LSL'], spec['USL']]
+
+        return pd.DataFrame(specs_data)
+
+    def generate_table(self):
+        """生成与Excel数据文件结构相同的数据表（前两行为LSL/USL规格行）"""
+        return pd.concat([self.generate_specs_df(), self.generate_dataset()], ignore_index=True)
+
+    def save_to_excel(self, filename="data/input.xlsx"):
+        """保存数据到Excel文件"""
+        # 生成数据并合并规格行
+        final_df = self.generate_table()
+
+        # 确保输出目录存在
+        os.makedirs(os.path.dirname(filename) or '.', exist_ok=True)
+
+        # 保存到Excel
+        final_df.to_excel(filename, index=False)
+        print(f"数据已保存到 {filename}")
+
+def main():
+    generator = DataGenerator(num_rows=500)
+    generator.save_to_excel()
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,7 @@ from typing import Tuple, Optional, List, Union
 import pandas as pd
 import numpy as np
 import config
+from .instrument import traced
 
 def get_data_columns(df: pd.DataFrame, config: object) -> List[str]:
     """获取所有符合条件的数据列
@@ -57,6 +58,7 @@ def get_data_columns(df: pd.DataFrame, config: object) -> List[str]:
     
     return sorted_columns
 
+@traced('clean_data', 'data')
 def clean_data(df: pd.DataFrame, config: object) -> pd.DataFrame:
     """清理数据：移除无效值和重复值
     
@@ -93,17 +95,25 @@ def clean_data(df: pd.DataFrame, config: object) -> pd.DataFrame:
     
     # 处理重复值（如果配置了移除重复值）
     if config.DATA_PROCESSING['remove_duplicates']:
-        # 如果存在Time列，转换为datetime类型
+        # 根据SN列去重，保留最后一次测试的记录
         if 'Time' in actual_data.columns:
-            actual_data.loc[:, 'Time'] = pd.to_datetime(actual_data['Time'])
-        # 根据SN列去重，保留最后一条记录
-        actual_data = actual_data.drop_duplicates(subset=['SN'], keep='last')
+            # 整列替换为datetime类型（.loc赋值会保留原来的object类型），按时间稳定排序后
+            # keep='last' 才是最后一次测试；无法解析的时间视为最早，再恢复原来的行顺序
+            actual_data = actual_data.assign(Time=pd.to_datetime(actual_data['Time'], errors='coerce'))
+            spec_data = spec_data.assign(Time=pd.to_datetime(spec_data['Time'], errors='coerce'))
+            actual_data = (actual_data.sort_values('Time', kind='stable', na_position='first')
+                           .drop_duplicates(subset=['SN'], keep='last')
+                           .sort_index())
+        else:
+            actual_data = actual_data.drop_duplicates(subset=['SN'], keep='last')
+        print(f"删除重复SN后的行数: {len(actual_data)}")
     
     # 将处理后的规格数据和实际数据重新合并
     cleaned_df = pd.concat([spec_data, actual_data], ignore_index=True)
     
     return cleaned_df
 
+@traced('preprocess_data', 'data')
 def preprocess_data(df: pd.DataFrame) -> Tuple[pd.DataFrame, Optional[pd.Series], Optional[pd.Series]]:
     """预处理数据，分离测量数据和规格限
     
@@ -131,6 +141,47 @@ def preprocess_data(df: pd.DataFrame) -> Tuple[pd.DataFrame, Optional[pd.Series]
 
     return data_df, lsl_values, usl_values
 
+def get_spec_limits(data_columns: List[str], lsl_values: Optional[pd.Series],
+                    usl_values: Optional[pd.Series]) -> Tuple[np.ndarray, np.ndarray]:
+    """获取各数据列的规格限数组
+    
+    参数:
+        data_columns: 数据列列表
+        lsl_values: 下限值，可选
+        usl_values: 上限值，可选
+        
+    返回:
+        lsl: 下限数组，没有下限时为NaN
+        usl: 上限数组，没有上限时为NaN
+    """
+    lsl = (np.array([float(lsl_values[col]) for col in data_columns]) if lsl_values is not None
+           else np.full(len(data_columns), np.nan))
+    usl = (np.array([float(usl_values[col]) for col in data_columns]) if usl_values is not None
+           else np.full(len(data_columns), np.nan))
+    return lsl, usl
+
+@traced('calculate_fail_matrix', 'stats')
+def calculate_fail_matrix(data_df: pd.DataFrame, data_columns: List[str],
+                          lsl_values: Optional[pd.Series],
+                          usl_values: Optional[pd.Series]) -> np.ndarray:
+    """计算超限矩阵：测量数据（行 x 列）与规格限数组一次广播比较
+    
+    参数:
+        data_df: 包含测量数据的数据框
+        data_columns: 需要检查的数据列列表
+        lsl_values: 下限值，可选
+        usl_values: 上限值，可选
+        
+    返回:
+        布尔矩阵，形状为 (行数, 列数)，True 表示该值超限（空值不算超限）
+    """
+    values = data_df[list(data_columns)].to_numpy(dtype=float)
+    lsl, usl = get_spec_limits(data_columns, lsl_values, usl_values)
+    # 与NaN比较均为False：没有规格限的一侧、空值都不会被判为超限
+    with np.errstate(invalid='ignore'):
+        return (values < lsl) | (values > usl)
+
+@traced('calculate_out_of_spec', 'stats')
 def calculate_out_of_spec(data_df: pd.DataFrame, data_columns: List[str], 
                          lsl_values: Optional[pd.Series], 
                          usl_values: Optional[pd.Series]) -> Tuple[int, int]:
@@ -144,31 +195,10 @@ def calculate_out_of_spec(data_df: pd.DataFrame, data_columns: List[str],
         
     返回:
         total_count: 总数据点数
-        out_of_spec_count: 超限数据点数
+        out_of_spec_count: 超限数据点数（一个单元有多项超限时计多次，单元良率见 unit_yield 模块）
     """
-    total_count = len(data_df)
-    out_of_spec_count = 0
-    
-    for col in data_columns:
-        # 将数据转换为浮点型
-        data = data_df[col].astype(float)
-        # 初始化超限标记数组
-        out_of_spec = pd.Series([False] * len(data))
-        
-        # 检查下限超限
-        if lsl_values is not None:
-            lsl = float(lsl_values[col])
-            out_of_spec |= (data < lsl)
-            
-        # 检查上限超限
-        if usl_values is not None:
-            usl = float(usl_values[col])
-            out_of_spec |= (data > usl)
-            
-        # 累加超限数量
-        out_of_spec_count += out_of_spec.sum()
-    
-    return total_count, out_of_spec_count
+    fails = calculate_fail_matrix(data_df, data_columns, lsl_values, usl_values)
+    return len(data_df), int(fails.sum())
 
 def calculate_cpk(data: Union[pd.Series, np.ndarray], 
                  usl: Optional[float] = None, 
@@ -218,8 +248,12 @@ def calculate_out_of_spec_column(data, lsl=None, usl=None):
     返回:
         超出规格限的数据点数量
     """
-    # 创建一个与数据等长的布尔型Series，初始值全为False
-    out_of_spec = pd.Series([False] * len(data))
+    # 创建一个与数据索引相同的布尔型Series，初始值全为False
+    # （过滤或分组后的数据索引不连续，若使用默认索引，按索引对齐时会漏计）
+    if isinstance(data, pd.Series):
+        out_of_spec = pd.Series(False, index=data.index)
+    else:
+        out_of_spec = np.zeros(len(data), dtype=bool)
     
     # 如果存在下限值，检查小于下限的数据点
     # 使用 |= 运算符将结果与现有的out_of_spec合并
@@ -232,4 +266,53 @@ def calculate_out_of_spec_column(data, lsl=None, usl=None):
         out_of_spec |= (data > usl)
     
     # 返回超限的数据点总数（True值的数量）
-    return out_of_spec.sum() 
\ No newline at end of file
+    return out_of_spec.sum() 
+
+# 多个分组列组合时，组合分组名中各列取值之间的分隔符
+GROUP_KEY_SEPARATOR = '+'
+
+def get_group_columns(config: object) -> List[str]:
+    """获取分组列
+    
+    参数:
+        config: 配置对象，group_analysis['group_by'] 可以是单个列名或列名列表
+        
+    返回:
+        分组列名列表，未配置时为空列表
+    """
+    group_by = config.DATA_PROCESSING.get('group_analysis', {}).get('group_by')
+    if not group_by:
+        return []
+    if isinstance(group_by, str):
+        return [group_by]
+    return list(group_by)
+
+def add_group_key(df: pd.DataFrame, group_columns: List[str], key: str) -> pd.DataFrame:
+    """添加组合分组列，如 Line=LineA、Fixture=F1 -> 'LineA+F1'
+    
+    参数:
+        df: 数据框
+        group_columns: 分组列
+        key: 组合分组列的列名
+        
+    返回:
+        添加了组合分组列的数据框（任一分组列为空的行，组合分组列也为空）
+    """
+    values = df[group_columns]
+    combined = values[group_columns[0]].astype(str)
+    for col in group_columns[1:]:
+        combined = combined + GROUP_KEY_SEPARATOR + values[col].astype(str)
+    return df.assign(**{key: combined.where(values.notna().all(axis=1))})
+
+def group_label(values) -> str:
+    """组合分组名，与 add_group_key 生成的一致
+    
+    参数:
+        values: 各分组列的取值（单个值或元组）
+        
+    返回:
+        组合分组名，如 'LineA+F1'
+    """
+    if not isinstance(values, tuple):
+        values = (values,)
+    return GROUP_KEY_SEPARATOR.join(str(value) for value in values)
@@ -0,0 +1,178 @@
+"""清理后数据集的导出
+
+clean_data 和 preprocess_data 之后的测量数据（已去除 -10001、空值和重复值，
+数据列已转换为数值）导出为 Parquet 或 Feather（Arrow IPC）文件，规格限和清理
+规则保存在文件的 schema 元数据中。下游工具直接读取该文件即可，不需要重新解析
+Excel，也不需要重新实现清理规则。
+
+数据按 chunk_rows 行分块写出（Parquet 的 row group / Arrow 的 record batch），
+写出时不需要把整个表转换为 Arrow 格式。Feather 文件不压缩，读取时可以内存映射，
+实现零拷贝加载。
+
+需要安装 pyarrow（可选依赖），未安装时跳过导出。
+"""
+import os
+import json
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+from .instrument import TRACER
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow 为可选依赖，未安装时不能导出数据集
+    pa = None
+    pq = None
+
+# 导出格式 -> 文件扩展名
+DATASET_FORMATS = {'parquet': '.parquet', 'feather': '.feather'}
+
+DATASET_NAME = 'cleaned_data'
+
+# 保存规格限等信息的 schema 元数据键
+METADATA_KEY = b'data_analysis'
+
+def build_dataset(df: pd.DataFrame, data_columns: Sequence[str], prepared: tuple) -> pd.DataFrame:
+    """组装要导出的数据：清理后的测量行（不含LSL/USL行），数据列为数值类型
+    Args:
+        df: clean_data 的结果
+        data_columns: 数据列
+        prepared: preprocess_data 的结果
+    Returns:
+        pd.DataFrame: 保留原有的非数据列（SN、Time、Line等）
+    """
+    data_df = prepared[0]
+    dataset = df.loc[data_df.index].copy()
+    dataset[list(data_columns)] = data_df[list(data_columns)].astype(float)
+    return dataset.reset_index(drop=True)
+
+def dataset_metadata(data_columns: Sequence[str], lsl_values: Optional[pd.Series],
+                     usl_values: Optional[pd.Series], config: object,
+                     source: str = '') -> Dict[str, object]:
+    """写入 schema 元数据的内容：数据列、规格限、清理规则和数据来源"""
+    def limits(values):
+        if values is None:
+            return None
+        return {col: None if pd.isna(values[col]) else float(values[col]) for col in data_columns}
+
+    processing = config.DATA_PROCESSING
+    return {
+        'source': os.path.basename(source),
+        'data_columns': list(data_columns),
+        'lsl': limits(lsl_values),
+        'usl': limits(usl_values),
+        'cleaning': {
+            'remove_invalid': processing.get('remove_invalid', True),
+            'remove_null': processing.get('remove_null', True),
+            'remove_duplicates': processing.get('remove_duplicates', False),
+        },
+    }
+
+def _arrow_schema(dataset: pd.DataFrame, metadata: Dict[str, object]) -> 'pa.Schema':
+    # 按整个表推断类型，保证每个分块的类型一致（如某块中全为空的文本列）
+    schema = pa.Schema.from_pandas(dataset, preserve_index=False)
+    return schema.with_metadata({
+        **(schema.metadata or {}),
+        METADATA_KEY: json.dumps(metadata, ensure_ascii=False).encode('utf-8'),
+    })
+
+def write_dataset(dataset: pd.DataFrame, path: str, metadata: Dict[str, object],
+                  fmt: str = 'parquet', chunk_rows: int = 100000) -> str:
+    """分块写出数据集
+    Args:
+        dataset: build_dataset 的结果
+        path: 输出文件路径
+        metadata: 写入 schema 元数据的内容
+        fmt: 'parquet' 或 'feather'
+        chunk_rows: 每块的行数
+    Returns:
+        str: 输出文件路径
+    Raises:
+        ImportError: 未安装 pyarrow 时
+        ValueError: 格式不支持时
+    """
+    if pa is None:
+        raise ImportError("导出数据集需要安装 pyarrow")
+    if fmt not in DATASET_FORMATS:
+        raise ValueError(f"不支持的数据集格式: {fmt}")
+    schema = _arrow_schema(dataset, metadata)
+    chunk_rows = max(int(chunk_rows), 1)
+
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    try:
+        with TRACER.span('write_dataset', 'io') as sp:
+            if fmt == 'parquet':
+                writer = pq.ParquetWriter(tmp_path, schema)
+            else:
+                # Feather v2 即 Arrow IPC 文件格式；不压缩，读取时可内存映射
+                writer = pa.ipc.new_file(tmp_path, schema)
+            with writer:
+                for start in range(0, len(dataset), chunk_rows):
+                    chunk = pa.Table.from_pandas(dataset.iloc[start:start + chunk_rows],
+                                                 schema=schema, preserve_index=False)
+                    writer.write_table(chunk)
+            sp.set_items(len(dataset))
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return path
+
+def export_dataset(df: pd.DataFrame, data_columns: Sequence[str], prepared: tuple,
+                   output_dir: str, config: object, source: str = '') -> Optional[str]:
+    """按 OUTPUT['dataset_export'] 导出清理后的数据集
+    Args:
+        df: clean_data 的结果
+        data_columns: 数据列
+        prepared: preprocess_data 的结果
+        output_dir: 输出目录
+        config: 配置对象
+        source: 原始数据文件路径，记录在元数据中
+    Returns:
+        Optional[str]: 输出文件路径，未启用或未安装 pyarrow 时返回None
+    """
+    output_config = config.OUTPUT
+    fmt = output_config.get('dataset_export', '')
+    if not fmt:
+        return None
+    if pa is None:
+        print("警告: 未安装 pyarrow，跳过清理后数据集的导出")
+        return None
+    _, lsl_values, usl_values = prepared
+    dataset = build_dataset(df, data_columns, prepared)
+    metadata = dataset_metadata(data_columns, lsl_values, usl_values, config, source)
+    path = os.path.join(output_dir, DATASET_NAME + DATASET_FORMATS.get(fmt, f'.{fmt}'))
+    print(f"\n导出清理后的数据集: {path}")
+    return write_dataset(dataset, path, metadata, fmt, output_config.get('dataset_chunk_rows', 100000))
+
+def read_dataset(path: str, columns: Optional[List[str]] = None) -> Tuple[pd.DataFrame, Dict[str, object]]:
+    """读取导出的数据集
+    Args:
+        path: .parquet 或 .feather 文件路径
+        columns: 只读取这些列，为None时读取全部
+    Returns:
+        (数据, 元数据)：元数据包含 data_columns、lsl、usl、cleaning 和 source
+    """
+    if pa is None:
+        raise ImportError("读取数据集需要安装 pyarrow")
+    if path.lower().endswith('.feather'):
+        # 内存映射读取，数据列不经过复制
+        with pa.memory_map(path, 'r') as source:
+            table = pa.ipc.open_file(source).read_all()
+        if columns is not None:
+            table = table.select(columns)
+    else:
+        table = pq.read_table(path, columns=columns)
+    raw = (table.schema.metadata or {}).get(METADATA_KEY)
+    metadata = json.loads(raw.decode('utf-8')) if raw else {}
+    return table.to_pandas(), metadata
+
+def spec_limits(metadata: Dict[str, object]) -> Tuple[Optional[pd.Series], Optional[pd.Series]]:
+    """把元数据中的规格限转换为与 preprocess_data 相同形式的 (lsl_values, usl_values)"""
+    def series(values):
+        if values is None:
+            return None
+        return pd.Series({col: np.nan if v is None else v for col, v in values.items()}, dtype=float)
+    return series(metadata.get('lsl')), series(metadata.get('usl'))
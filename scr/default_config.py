@@ -16,16 +16,35 @@ PLOT = {
     'enable_group_boxplot': False, # 启用分组箱线图
     'enable_all_columns_compare': False,  # 启用整体分组对比图
     'enable_correlation': False,    # 启用相关性分析图
+    'enable_spc': False,            # 启用SPC控制图
+    'enable_pareto': False,         # 启用NG柏拉图
     
     # 分布图配置
     'distribution': {
         'figsize': (25, 15),  # 图表大小
+        'subplot_layout': (5, 4),  # 分页总览时每页的网格（行数, 列数）
+        'paginate': False,  # 是否分页输出总览图
+        'page_format': 'pdf',  # 分页格式：'pdf' 或 'png'
     },
     
     # 箱线图配置
     'boxplot': {
         'figsize': (20, 10),
     },
+    
+    # SPC控制图配置
+    'spc': {
+        'chart': 'auto',  # 'auto'、'xbar_r'、'xbar_s' 或 'imr'
+        'subgroup_size': 5,  # 子组大小，为1时绘制单值-移动极差图
+        'rules': [1, 2, 3, 4],  # 启用的 Western Electric 判异规则
+        'figsize': (15, 8),
+    },
+    
+    # NG柏拉图配置
+    'pareto': {
+        'top_n': 20,  # 图中最多显示的数据列数，0 表示全部显示
+        'figsize': (12, 6),
+    },
 }
 
 # 数据处理配置
@@ -35,8 +54,47 @@ DATA_PROCESSING = {
     'remove_invalid': True,      # 是否移除无效值
     
     # 分组分析配置
+    'time_windows': {
+        'enabled': False,  # 是否按时间窗口（班次、天、ISO周）分析，输出到 time_windows 子目录
+        'rules': ['day'],  # 窗口规则：'shift'、'day'、'week'
+        'shifts': [  # 班次日历（开始时间），跨午夜的班次归属开始的那一天
+            {'name': '白班', 'start': '08:00'},
+            {'name': '夜班', 'start': '20:00'},
+        ],
+        'min_rows': 2,  # 行数少于该值的窗口被跳过
+    },
+    'retest': {
+        'enabled': False,  # 是否分析复测（同一SN多次测试）的直通率和最终良率，需要关闭 remove_duplicates
+    },
+    'repeatability': {
+        'enabled': False,  # 是否由复测估计每列的测量重复性（重复性σ、占整体方差的比例、公差占比）
+        'sigma_multiplier': 6.0,  # 公差占比使用的σ倍数
+    },
+    'outliers': {
+        'enabled': False,  # 是否检测异常值，结果导出到 outliers.xlsx（每列的阈值汇总和每个异常值的明细）
+        'rules': ['iqr', 'mad', 'zscore'],  # 检测规则：'iqr'、'mad'、'zscore'、'grubbs'
+        'iqr_k': 1.5,  # IQR规则：超出 [Q1 - k*IQR, Q3 + k*IQR]（1.5 与箱线图的离群点一致）
+        'mad_k': 3.5,  # MAD规则：修正Z分数超过该值
+        'z_k': 3.0,  # Z分数规则：偏离均值超过 k 倍标准差
+        'grubbs_alpha': 0.05,  # Grubbs 检验的显著性水平
+        'exclude': False,  # 排除模式：被标记的值不参与统计表（Test、Mean、Std、CPK、NG）的计算和统计导出，单元良率等 PASS/FAIL 判定仍使用原始测量值
+    },
     'group_analysis': {
         'enabled': False,        # 是否启用分组分析
-        'group_by': 'Line',      # 默认分组列名
+        'group_by': 'Line',      # 默认分组列名，多级分组时为列名列表
+        'max_combinations': 1000,  # 分组组合数上限
+        'cube': False,           # 是否计算并导出统计立方体
     },
-}
\ No newline at end of file
+}
+
+# 分析流程配置
+PIPELINE = {
+    'max_workers': 4,  # 任务图执行器的线程数，相互独立的数据处理和导出任务并发执行
+}
+
+# 诊断配置
+DIAGNOSTICS = {
+    'trace': False,  # 记录各阶段耗时，并在输出目录写入 trace.json（Chrome trace / Perfetto）和 timing_summary.csv
+    'memory': False,  # 记录各阶段的内存峰值（tracemalloc/RSS）和打开的图表数，并在输出目录写入 memory_profile.csv
+    'max_open_figures': 0,  # 内存诊断时每个任务结束后允许保持打开的图表数，超过时报错（FigureLeakError）
+}
@@ -1,14 +1,18 @@
 import pandas as pd
 import matplotlib.pyplot as plt
+from matplotlib.backends.backend_pdf import PdfPages
 from matplotlib.figure import Figure
 from matplotlib.axes import Axes
-from typing import List, Optional
+from typing import Iterator, List, Optional
 from scr.plot_base import PlotStyle, PlotHelper
 from scr.data_processing import (get_data_columns, preprocess_data,
-                               calculate_out_of_spec, calculate_cpk,
-                               calculate_out_of_spec_column)
+                               calculate_fail_matrix, calculate_cpk,
+                               calculate_out_of_spec_column, get_group_columns)
 from scr.utils import format_number
+from scr.statistics_export import compute_statistics
+from scr.instrument import TRACER
 import numpy as np
+import io
 import os
 
 class DistributionPlot:
@@ -50,16 +54,43 @@ class DistributionPlot:
         
         return '\n'.join(stats)
 
-def plot_distributions(df: pd.DataFrame, config: object) -> Figure:
-    """绘制正态分布图"""
+def _draw_distribution_grid(fig: Figure, columns: List[str], data_df: pd.DataFrame,
+                            lsl_values: Optional[pd.Series],
+                            usl_values: Optional[pd.Series],
+                            n_rows: int, n_cols: int, config: object) -> None:
+    """在给定的图表上按网格绘制多个数据列的分布图"""
+    for i, col in enumerate(columns, 1):
+        ax = fig.add_subplot(n_rows, n_cols, i)
+        data = data_df[col].astype(float)
+        lsl = float(lsl_values[col]) if lsl_values is not None else None
+        usl = float(usl_values[col]) if usl_values is not None else None
+        
+        PlotHelper.setup_distribution_plot(ax, data, col, lsl, usl, config, PlotStyle())
+
+def _distribution_summary(prepared: tuple, data_columns: List[str]) -> str:
+    """生成分布图总标题中的良率信息：按单元计数，一个单元有多项超限时只计一次"""
+    data_df, lsl_values, usl_values = prepared
+    fails = calculate_fail_matrix(data_df, data_columns, lsl_values, usl_values)
+    total_count = len(fails)
+    failed_units = int(fails.any(axis=1).sum())
+    unit_yield = (total_count - failed_units) / total_count * 100 if total_count > 0 else 0
+    return f'Test: {total_count}  NG: {failed_units}   Yield: {unit_yield:.2f}%'
+
+def plot_distributions(df: pd.DataFrame, config: object, prepared: Optional[tuple] = None,
+                       summary_prepared: Optional[tuple] = None) -> Figure:
+    """绘制正态分布图
+
+    prepared 为 preprocess_data 的结果，已预处理过时传入以避免重复计算；
+    summary_prepared 为计算总标题良率信息的预处理结果，排除异常值时传入未排除的数据，
+    使 NG/Yield 与单元良率一致，默认与 prepared 相同
+    """
     data_columns = get_data_columns(df, config)
-    data_df, lsl_values, usl_values = preprocess_data(df)
+    if prepared is None:
+        prepared = preprocess_data(df)
+    data_df, lsl_values, usl_values = prepared
 
     # 计算总体良率信息
-    total_count, total_out_of_spec_count = calculate_out_of_spec(
-        data_df, data_columns, lsl_values, usl_values
-    )
-    total_yield = (total_out_of_spec_count / total_count) * 100 if total_out_of_spec_count > 0 else 0
+    summary = _distribution_summary(summary_prepared or prepared, data_columns)
     
     # 计算需要的行数和列数
     n_cols = 4  # 保持每行4列
@@ -72,22 +103,18 @@ def plot_distributions(df: pd.DataFrame, config: object) -> Figure:
     ))
     
     # 绘制每个数据列的分布图
-    for i, col in enumerate(data_columns, 1):
-        ax = fig.add_subplot(n_rows, n_cols, i)
-        data = data_df[col].astype(float)
-        lsl = float(lsl_values[col]) if lsl_values is not None else None
-        usl = float(usl_values[col]) if usl_values is not None else None
-        
-        PlotHelper.setup_distribution_plot(ax, data, col, lsl, usl, config, PlotStyle())
+    _draw_distribution_grid(fig, data_columns, data_df, lsl_values, usl_values,
+                            n_rows, n_cols, config)
      
      # 添加总标题
-    fig.suptitle(f'Test: {total_count}  NG: {total_out_of_spec_count}   Rate: {total_yield:.2f}%',
+    fig.suptitle(summary,
                  y=0.995,
                  fontsize='large',
                  bbox=dict(facecolor='white', alpha=0.8, edgecolor='none'))
     
     # 调整子图之间的间距
-    plt.tight_layout()
+    with TRACER.span('tight_layout', 'layout'):
+        plt.tight_layout()
     plt.subplots_adjust(top=0.95)  # 为suptitle留出空间
     return fig
 
@@ -118,6 +145,94 @@ def plot_distributions(df: pd.DataFrame, config: object) -> Figure:
     # plt.subplots_adjust(top=0.95)
     # return fig
 
+def iter_distribution_pages(df: pd.DataFrame, config: object, prepared: Optional[tuple] = None,
+                            summary_prepared: Optional[tuple] = None) -> Iterator[Figure]:
+    """按固定网格分页绘制分布图，每次只生成一页
+    
+    每页的网格由 config.PLOT['distribution']['subplot_layout'] 指定（行数, 列数），
+    调用方应在处理完每一页后关闭该页图表，从而使峰值内存只与单页大小相关。
+    
+    参数:
+        df: 包含规格行的数据框
+        config: 配置对象
+        prepared: preprocess_data 的结果，可选
+        summary_prepared: 计算总标题良率信息的预处理结果，可选，默认与 prepared 相同
+        
+    返回:
+        逐页生成的 Figure 对象
+    """
+    data_columns = get_data_columns(df, config)
+    if prepared is None:
+        prepared = preprocess_data(df)
+    data_df, lsl_values, usl_values = prepared
+    summary = _distribution_summary(summary_prepared or prepared, data_columns)
+    
+    dist_config = config.PLOT['distribution']
+    n_rows, n_cols = dist_config.get('subplot_layout', (5, 4))
+    per_page = n_rows * n_cols
+    n_pages = max(1, (len(data_columns) + per_page - 1) // per_page)
+    
+    for page in range(n_pages):
+        page_columns = data_columns[page * per_page:(page + 1) * per_page]
+        fig = plt.figure(figsize=(
+            dist_config['figsize'][0],
+            dist_config['figsize'][1] * (n_rows / 5)
+        ))
+        _draw_distribution_grid(fig, page_columns, data_df, lsl_values, usl_values,
+                                n_rows, n_cols, config)
+        fig.suptitle(f'{summary}   Page: {page + 1}/{n_pages}',
+                     y=0.995,
+                     fontsize='large',
+                     bbox=dict(facecolor='white', alpha=0.8, edgecolor='none'))
+        with TRACER.span('tight_layout', 'layout'):
+            fig.tight_layout()
+        fig.subplots_adjust(top=0.95)
+        yield fig
+
+def save_distribution_pages(df: pd.DataFrame, config: object, output_dir: str,
+                            prepared: Optional[tuple] = None, writer=None,
+                            summary_prepared: Optional[tuple] = None) -> List[str]:
+    """将分页的分布总览图逐页写入多页PDF或带编号的PNG文件
+    
+    参数:
+        df: 包含规格行的数据框
+        config: 配置对象，config.PLOT['distribution']['page_format'] 为 'pdf' 或 'png'
+        output_dir: 输出目录
+        prepared: preprocess_data 的结果，可选
+        writer: OutputWriter，提供时PNG页面在后台编码和写出（多页PDF只能顺序写入）
+        summary_prepared: 计算总标题良率信息的预处理结果，可选，默认与 prepared 相同
+        
+    返回:
+        写入的文件路径列表
+    """
+    page_format = config.PLOT['distribution'].get('page_format', 'pdf')
+    saved_paths = []
+    
+    if page_format == 'pdf':
+        pdf_path = os.path.join(output_dir, 'distribution_plots.pdf')
+        with PdfPages(pdf_path) as pdf:
+            for fig in iter_distribution_pages(df, config, prepared, summary_prepared):
+                try:
+                    with TRACER.span('savefig', 'io'):
+                        pdf.savefig(fig)
+                finally:
+                    plt.close(fig)
+        saved_paths.append(pdf_path)
+    else:
+        for page, fig in enumerate(iter_distribution_pages(df, config, prepared, summary_prepared), 1):
+            png_path = os.path.join(output_dir, f'distribution_plots_{page:03d}.png')
+            try:
+                if writer is not None:
+                    writer.submit_figure(fig, png_path)
+                else:
+                    with TRACER.span('savefig', 'io'):
+                        fig.savefig(png_path)
+            finally:
+                plt.close(fig)
+            saved_paths.append(png_path)
+    
+    return saved_paths
+
 def plot_single_distribution(data_df: pd.DataFrame, col: str,
                            lsl_values: Optional[pd.Series],
                            usl_values: Optional[pd.Series],
@@ -132,78 +247,54 @@ def plot_single_distribution(data_df: pd.DataFrame, col: str,
     
     plotter.plot_common(ax, data, col, lsl, usl, config)
     
-    plt.tight_layout()
+    with TRACER.span('tight_layout', 'layout'):
+        plt.tight_layout()
     return fig
 
-def export_statistics_to_excel(df: pd.DataFrame, config: object, output_dir: str, is_group_data: bool = False) -> None:
-    """导出统计数据到Excel"""
+def export_statistics_to_excel(df: pd.DataFrame, config: object, output_dir: str, is_group_data: bool = False,
+                               prepared: Optional[tuple] = None, writer=None,
+                               stats: Optional[pd.DataFrame] = None) -> None:
+    """导出统计数据到Excel（数值格式化为文本），提供 writer（OutputWriter）时在后台写盘
+    Args:
+        stats: 已计算的统计表（compute_statistics 的结果），为None时重新计算
+    """
     # 获取数据列和分组配置
     data_columns = get_data_columns(df, config)
-    data_df, lsl_values, usl_values = preprocess_data(df)
+    data_df, lsl_values, usl_values = prepared if prepared is not None else preprocess_data(df)
     group_config = config.DATA_PROCESSING.get('group_analysis', {})
-    group_by = group_config.get('group_by') if group_config.get('enabled', False) else None
+    group_columns = get_group_columns(config) if group_config.get('enabled', False) else []
+    if stats is None:
+        stats = compute_statistics((data_df, lsl_values, usl_values), data_columns)
     
     # 准备统计数据
-    stats_data = []
+    stats_df = pd.DataFrame({
+        'Items': stats['Items'],
+        'Test': stats['Test'],
+        'NG': stats['NG'],
+        'Rate': [f'{(ng / count * 100):.2f}%' if count > 0 else '0%'
+                 for ng, count in zip(stats['NG'], stats['Test'])],
+        'LSL': stats['LSL'] if lsl_values is not None else '',
+        'USL': stats['USL'] if usl_values is not None else '',
+        'Mean': [f'{mean:.3f}' for mean in stats['Mean']],
+        'Std': [f'{std:.3f}' for std in stats['Std']],
+        'CPK': [f'{cpk:.3f}' if not np.isnan(cpk) else '' for cpk in stats['CPK']],
+    })
     
     # 检查是否为分组数据
-    if is_group_data and group_by:
+    if is_group_data and group_columns:
         # 获取当前组的数据（排除LSL/USL行）
         actual_data = df[~df['SN'].isin(['LSL', 'USL'])]
-        # 获取组名（应该只有一个唯一值）
-        group_name = actual_data[group_by].unique()[0]
-        for col in data_columns:
-            data = data_df[col].astype(float)
-            lsl = float(lsl_values[col]) if lsl_values is not None else None
-            usl = float(usl_values[col]) if usl_values is not None else None
-            
-            # 计算统计量
-            count = len(data)
-            mean = np.mean(data)
-            std = np.std(data)
-            cpk = calculate_cpk(data, usl, lsl)
-            out_of_spec = calculate_out_of_spec_column(data, lsl, usl)
-            rate = f'{(out_of_spec / count * 100):.2f}%' if count > 0 else '0%'
-            
-            stats_data.append({
-                group_by: group_name,  # 添加分组列
-                'Items': col,
-                'Test': count,
-                'NG': out_of_spec,
-                'Rate': rate,
-                'LSL': lsl if lsl is not None else '',
-                'USL': usl if usl is not None else '',
-                'Mean': f'{mean:.3f}',
-                'Std': f'{std:.3f}',
-                'CPK': f'{cpk:.3f}' if cpk is not None else ''
-            })
-    else:
-        # 非分组情况的处理
-        for col in data_columns:
-            data = data_df[col].astype(float)
-            lsl = float(lsl_values[col]) if lsl_values is not None else None
-            usl = float(usl_values[col]) if usl_values is not None else None
-            
-            count = len(data)
-            mean = np.mean(data)
-            std = np.std(data)
-            cpk = calculate_cpk(data, usl, lsl)
-            out_of_spec = calculate_out_of_spec_column(data, lsl, usl)
-            rate = f'{(out_of_spec / count * 100):.2f}%' if count > 0 else '0%'
-            
-            stats_data.append({
-                'Items': col,
-                'Test': count,
-                'NG': out_of_spec,
-                'Rate': rate,
-                'LSL': lsl if lsl is not None else '',
-                'USL': usl if usl is not None else '',
-                'Mean': f'{mean:.3f}',
-                'Std': f'{std:.3f}',
-                'CPK': f'{cpk:.3f}' if cpk is not None else ''
-            })
-    
-    # 创建DataFrame并导出到Excel
-    stats_df = pd.DataFrame(stats_data)
+        # 获取组名（每个分组列应该只有一个唯一值），按顺序添加各分组列
+        for i, group_by in enumerate(group_columns):
+            stats_df.insert(i, group_by, actual_data[group_by].unique()[0])
+    
+    # 导出到Excel
     excel_path = os.path.join(output_dir, 'statistics_summary.xlsx')
-    stats_df.to_excel(excel_path, index=False)
\ No newline at end of file
+    if writer is not None:
+        buffer = io.BytesIO()
+        with TRACER.span('to_excel', 'io'):
+            stats_df.to_excel(buffer, index=False)
+        writer.submit_bytes(excel_path, buffer.getvalue())
+        return
+    with TRACER.span('to_excel', 'io'):
+        stats_df.to_excel(excel_path, index=False)
\ No newline at end of file
@@ -0,0 +1,186 @@
+"""轻量级的分阶段计时工具
+
+用法:
+    from .instrument import TRACER, traced
+
+    with TRACER.span('read_excel', cat='io') as sp:
+        df = pd.read_excel(path)
+        sp.set_items(len(df))
+
+    @traced('clean_data')
+    def clean_data(...): ...
+
+未启用时 span() 直接返回一个共享的空上下文，开销只有一次属性判断。
+启用后记录每个区间的墙钟时间、线程CPU时间和处理条目数，可导出为
+Chrome trace / Perfetto 可直接打开的JSON，以及按名称汇总的表格。
+"""
+import os
+import csv
+import json
+import time
+import threading
+import functools
+from typing import Callable, Dict, List, Optional
+
+class _NullSpan:
+    """未启用计时时使用的空区间"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set_items(self, items: int) -> None:
+        pass
+
+_NULL_SPAN = _NullSpan()
+
+class _Span:
+    """一个计时区间"""
+    __slots__ = ('tracer', 'name', 'cat', 'args', 'items', '_start', '_cpu_start')
+
+    def __init__(self, tracer, name, cat, args):
+        self.tracer = tracer
+        self.name = name
+        self.cat = cat
+        self.args = args
+        self.items = None
+
+    def set_items(self, items: int) -> None:
+        """记录本区间处理的条目数（行数、列数、图表数等）"""
+        self.items = int(items)
+
+    def __enter__(self):
+        self._cpu_start = time.thread_time()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter()
+        cpu = time.thread_time() - self._cpu_start
+        self.tracer._record(self, self._start, end, cpu)
+        return False
+
+class Tracer:
+    """收集计时区间的记录器，默认不启用"""
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._events: List[dict] = []
+        self._origin = time.perf_counter()
+
+    def start(self) -> None:
+        """清空已有记录并开始计时"""
+        with self._lock:
+            self._events = []
+            self._origin = time.perf_counter()
+        self.enabled = True
+
+    def stop(self) -> None:
+        self.enabled = False
+
+    def span(self, name: str, cat: str = '', **args):
+        """返回一个计时区间上下文，未启用时返回空区间"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, cat, args)
+
+    def _record(self, span: _Span, start: float, end: float, cpu: float) -> None:
+        thread = threading.current_thread()
+        event = {
+            'name': span.name,
+            'cat': span.cat,
+            'start': start - self._origin,
+            'wall': end - start,
+            'cpu': cpu,
+            'items': span.items,
+            'tid': thread.ident,
+            'thread': thread.name,
+            'args': span.args,
+        }
+        with self._lock:
+            self._events.append(event)
+
+    @property
+    def events(self) -> List[dict]:
+        with self._lock:
+            return list(self._events)
+
+    def export_chrome_trace(self, path: str) -> str:
+        """导出为 Chrome trace / Perfetto JSON
+        Args:
+            path: 输出文件路径
+        Returns:
+            str: 输出文件路径
+        """
+        events = self.events
+        pid = os.getpid()
+        trace = []
+        for tid, thread_name in {e['tid']: e['thread'] for e in events}.items():
+            trace.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid,
+                          'args': {'name': thread_name}})
+        for e in events:
+            args = {str(k): str(v) for k, v in e['args'].items()}
+            args['cpu_ms'] = round(e['cpu'] * 1000, 3)
+            if e['items'] is not None:
+                args['items'] = e['items']
+            trace.append({
+                'name': e['name'],
+                'cat': e['cat'] or 'default',
+                'ph': 'X',
+                'ts': round(e['start'] * 1e6, 1),
+                'dur': round(e['wall'] * 1e6, 1),
+                'pid': pid,
+                'tid': e['tid'],
+                'args': args,
+            })
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': trace, 'displayTimeUnit': 'ms'}, f, ensure_ascii=False)
+        return path
+
+    def summary(self) -> List[Dict]:
+        """按区间名称汇总，按总耗时降序排列"""
+        rows: Dict[str, dict] = {}
+        for e in self.events:
+            row = rows.setdefault(e['name'], {
+                'name': e['name'], 'cat': e['cat'], 'count': 0, 'wall_total': 0.0,
+                'wall_max': 0.0, 'cpu_total': 0.0, 'items': 0
+            })
+            row['count'] += 1
+            row['wall_total'] += e['wall']
+            row['wall_max'] = max(row['wall_max'], e['wall'])
+            row['cpu_total'] += e['cpu']
+            row['items'] += e['items'] or 0
+        for row in rows.values():
+            row['wall_mean'] = row['wall_total'] / row['count']
+        return sorted(rows.values(), key=lambda row: row['wall_total'], reverse=True)
+
+    def write_summary(self, path: str) -> str:
+        """把汇总表写入CSV文件"""
+        fields = ['name', 'cat', 'count', 'wall_total', 'wall_mean', 'wall_max', 'cpu_total', 'items']
+        with open(path, 'w', newline='', encoding='utf-8-sig') as f:
+            writer = csv.DictWriter(f, fieldnames=fields)
+            writer.writeheader()
+            for row in self.summary():
+                writer.writerow({k: (round(v, 6) if isinstance(v, float) else v)
+                                 for k, v in row.items() if k in fields})
+        return path
+
+# 全局记录器，各模块共享
+TRACER = Tracer()
+
+def traced(name: Optional[str] = None, cat: str = '') -> Callable:
+    """函数计时装饰器，未启用时直接调用原函数"""
+    def decorator(func):
+        span_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not TRACER.enabled:
+                return func(*args, **kwargs)
+            with TRACER.span(span_name, cat):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
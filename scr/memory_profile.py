@@ -0,0 +1,134 @@
+"""内存诊断：按阶段记录内存峰值和未关闭的图表
+
+开启 DIAGNOSTICS['memory'] 后，分析流程中的每个任务结束时记录:
+    - tracemalloc 统计的Python对象内存峰值（相对任务开始时的增量）
+    - 进程常驻内存（RSS）
+    - pyplot 中仍然打开的图表数量
+
+pyplot 会一直持有未关闭的图表，长时间的批量运行中内存会不断增长。任务结束后
+打开的图表数超过 DIAGNOSTICS['max_open_figures'] 时抛出 FigureLeakError，
+立即暴露泄漏的位置，而不是等到内存耗尽。
+"""
+import os
+import csv
+import threading
+import tracemalloc
+from typing import Any, Dict, List, Optional
+import matplotlib.pyplot as plt
+from matplotlib._pylab_helpers import Gcf
+from .pipeline import Task, TaskListener
+
+try:
+    import psutil
+except ImportError:  # psutil 为可选依赖，未安装时在Linux上读取 /proc
+    psutil = None
+
+class FigureLeakError(RuntimeError):
+    """任务结束后仍有未关闭的图表"""
+    pass
+
+def current_rss() -> Optional[int]:
+    """当前进程的常驻内存（字节），无法获取时返回None"""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def open_figures() -> List[str]:
+    """pyplot 中仍然打开的图表（编号和标题）"""
+    labels = []
+    for manager in Gcf.get_all_fig_managers():
+        suptitle = getattr(manager.canvas.figure, '_suptitle', None)
+        title = suptitle.get_text() if suptitle is not None else ''
+        labels.append(f"#{manager.num} {title}".strip())
+    return labels
+
+def _mb(value: Optional[int]) -> str:
+    return '-' if value is None else f"{value / 1024 / 1024:.1f}MB"
+
+class MemoryProfiler(TaskListener):
+    """按阶段记录内存峰值和打开的图表数
+
+    tracemalloc 的峰值是进程全局的，因此开启内存诊断时任务应串行执行
+    （max_workers=1），峰值才能准确归属到各个阶段。
+
+    Args:
+        max_open_figures: 任务结束后允许保持打开的图表数（不含开始前已打开的）
+    """
+    def __init__(self, max_open_figures: int = 0):
+        self.max_open_figures = max_open_figures
+        self.stages: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._task_base: Dict[str, int] = {}
+        self._baseline_figures = 0
+        self._owns_tracemalloc = False
+
+    def start(self) -> None:
+        """开始记录（启用 tracemalloc）"""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._owns_tracemalloc = True
+        self._baseline_figures = len(plt.get_fignums())
+
+    def stop(self) -> None:
+        if self._owns_tracemalloc:
+            tracemalloc.stop()
+            self._owns_tracemalloc = False
+
+    def _stage(self, task: Task) -> dict:
+        return self.stages.setdefault(task.stage or task.name, {
+            'tasks': 0, 'tracemalloc_peak': 0, 'rss_peak': None, 'open_figures': 0
+        })
+
+    def _sample_rss(self, stage: dict) -> None:
+        rss = current_rss()
+        if rss is not None and (stage['rss_peak'] is None or rss > stage['rss_peak']):
+            stage['rss_peak'] = rss
+
+    def on_task_start(self, task: Task) -> None:
+        with self._lock:
+            tracemalloc.reset_peak()
+            self._task_base[task.name] = tracemalloc.get_traced_memory()[0]
+            self._sample_rss(self._stage(task))
+
+    def on_task_end(self, task: Task, elapsed: float, result: Any = None) -> None:
+        with self._lock:
+            peak = tracemalloc.get_traced_memory()[1] - self._task_base.pop(task.name, 0)
+            figures = len(plt.get_fignums()) - self._baseline_figures
+            stage = self._stage(task)
+            stage['tasks'] += 1
+            stage['tracemalloc_peak'] = max(stage['tracemalloc_peak'], peak)
+            stage['open_figures'] = max(stage['open_figures'], figures)
+            self._sample_rss(stage)
+        if figures > self.max_open_figures:
+            raise FigureLeakError(
+                f"任务 {task.name}（{task.stage}）结束后仍有 {figures} 个图表未关闭"
+                f"（允许 {self.max_open_figures} 个）: {', '.join(open_figures())}"
+            )
+
+    def summary(self) -> Dict[str, dict]:
+        """各阶段的内存统计（字节）"""
+        with self._lock:
+            return {name: dict(values) for name, values in self.stages.items()}
+
+    def report(self) -> None:
+        """按内存峰值降序输出各阶段的统计"""
+        print("\n=== 内存统计（按阶段） ===")
+        rows = sorted(self.summary().items(),
+                      key=lambda item: item[1]['tracemalloc_peak'], reverse=True)
+        for name, values in rows:
+            print(f"{name}: 峰值 {_mb(values['tracemalloc_peak'])} "
+                  f"RSS {_mb(values['rss_peak'])} 打开的图表 {values['open_figures']}")
+
+    def write_csv(self, path: str) -> str:
+        """把各阶段的统计写入CSV文件"""
+        fields = ['stage', 'tasks', 'tracemalloc_peak', 'rss_peak', 'open_figures']
+        with open(path, 'w', newline='', encoding='utf-8-sig') as f:
+            writer = csv.DictWriter(f, fieldnames=fields)
+            writer.writeheader()
+            for name, values in self.summary().items():
+                writer.writerow({'stage': name, **values})
+        return path
@@ -0,0 +1,251 @@
+"""异常值检测
+
+对每个数据列按以下规则标记异常值（可同时启用多条）：
+    iqr:    超出 [Q1 - k*IQR, Q3 + k*IQR]，k=1.5 时与箱线图的离群点一致
+    mad:    修正Z分数 0.6745*|x - 中位数|/MAD 超过 k（Iglewicz-Hoaglin，默认3.5）
+    zscore: |x - 均值|/标准差 超过 k（默认3）
+    grubbs: Grubbs 检验，每列最多标记偏离均值最远的一个点
+
+四分位数和中位数每列只计算一次（nanpercentile 一次取 Q1、中位数、Q3），MAD 复用
+该中位数。数据按列分块转置为（列 x 行）的矩阵，各规则的上下限按列向量广播比较，
+一次得到整块的标记；标记只保存命中位置（行、列），内存与异常值数量成正比，
+百万行、数百列的数据也不需要保存与数据同样大小的标记矩阵。
+
+可选的排除模式把被标记的值视为空值（不参与 Mean、Std、CPK 和 NG 的计算），
+在统计计算和统计导出之前应用。
+"""
+import os
+import warnings
+from dataclasses import dataclass
+from statistics import NormalDist
+from typing import Dict, List, Sequence, Tuple
+import numpy as np
+import pandas as pd
+from .statistics_export import save_statistics_workbook, add_sheet_or_csv
+from .instrument import TRACER, traced
+
+# 规则 -> 显示名称
+OUTLIER_RULES = {'iqr': 'IQR', 'mad': 'MAD', 'zscore': 'Z分数', 'grubbs': 'Grubbs'}
+
+OUTLIER_WORKBOOK_NAME = 'outliers.xlsx'
+
+# 每块数据的大致元素数（约256MB的float64）
+_CHUNK_ELEMENTS = 2 ** 25
+
+# MAD 与标准差的换算系数（正态分布下 MAD ≈ 0.6745σ）
+_MAD_SCALE = 0.6745
+
+@dataclass
+class OutlierResult:
+    """异常值检测结果
+
+    hits 的键为规则，值为 (行位置, 列位置, 值)，行位置对应 index（preprocess_data 结果
+    的行顺序），列位置对应 data_columns。
+    """
+    index: pd.Index
+    sn: np.ndarray
+    data_columns: List[str]
+    summary: pd.DataFrame
+    hits: Dict[str, Tuple[np.ndarray, np.ndarray, np.ndarray]]
+
+    def table(self) -> pd.DataFrame:
+        """异常值明细：SN、Items、Value、Rule，每个被标记的值、每条规则一行"""
+        columns = np.asarray(self.data_columns, dtype=object)
+        frames = [pd.DataFrame({'SN': self.sn[rows], 'Items': columns[cols], 'Value': values, 'Rule': rule})
+                  for rule, (rows, cols, values) in self.hits.items()]
+        if not frames:
+            return pd.DataFrame(columns=['SN', 'Items', 'Value', 'Rule'])
+        return pd.concat(frames, ignore_index=True)
+
+    def positions(self) -> Tuple[np.ndarray, np.ndarray]:
+        """被任一规则标记的 (行位置, 列位置)，已去重"""
+        if not self.hits:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        rows = np.concatenate([hit[0] for hit in self.hits.values()])
+        cols = np.concatenate([hit[1] for hit in self.hits.values()])
+        flat = np.unique(rows * len(self.data_columns) + cols)
+        return np.divmod(flat, len(self.data_columns))
+
+def _t_quantile(p: np.ndarray, df: np.ndarray) -> np.ndarray:
+    """t分布的分位数（Cornish-Fisher 展开，Abramowitz & Stegun 26.7.5），不依赖 scipy"""
+    z = np.array([NormalDist().inv_cdf(float(value)) for value in np.ravel(p)]).reshape(np.shape(p))
+    g1 = (z ** 3 + z) / 4
+    g2 = (5 * z ** 5 + 16 * z ** 3 + 3 * z) / 96
+    g3 = (3 * z ** 7 + 19 * z ** 5 + 17 * z ** 3 - 15 * z) / 384
+    g4 = (79 * z ** 9 + 776 * z ** 7 + 1482 * z ** 5 - 1920 * z ** 3 - 945 * z) / 92160
+    return z + g1 / df + g2 / df ** 2 + g3 / df ** 3 + g4 / df ** 4
+
+def grubbs_critical(n: np.ndarray, alpha: float = 0.05) -> np.ndarray:
+    """双侧 Grubbs 检验的临界值，n 小于3时为NaN"""
+    n = np.asarray(n, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        df = np.where(n > 2, n - 2, np.nan)
+        p = np.where(n > 2, 1 - alpha / (2 * np.maximum(n, 1)), 0.5)
+        t = _t_quantile(p, df)
+        return (n - 1) / np.sqrt(n) * np.sqrt(t ** 2 / (df + t ** 2))
+
+def _bounds(rule: str, stats: Dict[str, np.ndarray], config: dict) -> Tuple[np.ndarray, np.ndarray]:
+    """各列的上下限，无法计算的列为 (-inf, inf)"""
+    if rule == 'iqr':
+        k = config.get('iqr_k', 1.5)
+        iqr = stats['Q3'] - stats['Q1']
+        low, high = stats['Q1'] - k * iqr, stats['Q3'] + k * iqr
+    elif rule == 'mad':
+        spread = config.get('mad_k', 3.5) * stats['MAD'] / _MAD_SCALE
+        spread = np.where(stats['MAD'] > 0, spread, np.nan)
+        low, high = stats['Median'] - spread, stats['Median'] + spread
+    elif rule == 'zscore':
+        spread = config.get('z_k', 3.0) * stats['Std']
+        spread = np.where(stats['Std'] > 0, spread, np.nan)
+        low, high = stats['Mean'] - spread, stats['Mean'] + spread
+    else:
+        raise ValueError(f"不支持的异常值规则: {rule}（可选: {', '.join(OUTLIER_RULES)}）")
+    return np.nan_to_num(low, nan=-np.inf), np.nan_to_num(high, nan=np.inf)
+
+@traced('detect_outliers', 'stats')
+def detect_outliers(prepared: tuple, data_columns: Sequence[str], config: dict) -> OutlierResult:
+    """按配置的规则检测所有数据列的异常值
+    Args:
+        prepared: preprocess_data 的结果
+        data_columns: 数据列
+        config: DATA_PROCESSING['outliers'] 配置（rules、iqr_k、mad_k、z_k、grubbs_alpha）
+    Returns:
+        OutlierResult
+    Raises:
+        ValueError: 规则不支持时
+    """
+    data_df = prepared[0]
+    data_columns = list(data_columns)
+    rules = list(config.get('rules', ['iqr']))
+    for rule in rules:
+        if rule not in OUTLIER_RULES:
+            raise ValueError(f"不支持的异常值规则: {rule}（可选: {', '.join(OUTLIER_RULES)}）")
+    n, m = len(data_df), len(data_columns)
+    chunk = max(1, _CHUNK_ELEMENTS // max(n, 1))
+
+    names = ['Count', 'Mean', 'Std', 'Q1', 'Median', 'Q3', 'MAD']
+    stats = {name: np.full(m, np.nan) for name in names}
+    stats['Count'] = np.zeros(m, dtype=np.int64)
+    limits = {rule: (np.full(m, -np.inf), np.full(m, np.inf)) for rule in rules if rule != 'grubbs'}
+    grubbs = {'G': np.full(m, np.nan), 'GCrit': np.full(m, np.nan)}
+    found = {rule: ([], [], []) for rule in rules}
+
+    for start in range(0, m, chunk):
+        columns = data_columns[start:start + chunk]
+        # 转置为（列 x 行），每列的数据在内存中连续
+        block = np.empty((len(columns), n))
+        for j, col in enumerate(columns):
+            block[j] = data_df[col].to_numpy(dtype=float)
+        part = slice(start, start + len(columns))
+        missing = np.isnan(block)
+        counts = n - missing.sum(axis=1)
+        stats['Count'][part] = counts
+        if n == 0:
+            continue
+        with np.errstate(invalid='ignore', divide='ignore'), warnings.catch_warnings(), \
+                TRACER.span('outlier_stats', 'stats'):
+            # 全为空值的列：nanpercentile/nanmedian 给出NaN，忽略其警告
+            warnings.simplefilter('ignore', RuntimeWarning)
+            # 四分位数和中位数一次求出，MAD 复用中位数
+            q1, median, q3 = np.nanpercentile(block, [25, 50, 75], axis=1)
+            deviation = np.abs(block - median[:, None])
+            mad = np.nanmedian(deviation, axis=1)
+            filled = np.where(missing, 0.0, block) if missing.any() else block
+            mean = filled.sum(axis=1) / counts
+            del filled
+            # 复用同一块内存保存 |x - 均值|，Z分数和 Grubbs 规则直接使用
+            np.subtract(block, mean[:, None], out=deviation)
+            np.abs(deviation, out=deviation)
+            deviation[missing] = 0.0
+            std = np.sqrt(np.einsum('ij,ij->i', deviation, deviation) / (counts - 1))
+            std[counts < 2] = np.nan
+        del missing
+        chunk_stats = {'Mean': mean, 'Std': std, 'Q1': q1, 'Median': median, 'Q3': q3, 'MAD': mad}
+        for name, values in chunk_stats.items():
+            stats[name][part] = values
+
+        for rule in rules:
+            with TRACER.span(f'outlier_{rule}', 'stats'), np.errstate(invalid='ignore', divide='ignore'):
+                if rule == 'grubbs':
+                    # 每列偏离均值最远的点，G 超过临界值时标记
+                    far = deviation.argmax(axis=1)
+                    g = deviation[np.arange(len(columns)), far] / std
+                    critical = grubbs_critical(counts, config.get('grubbs_alpha', 0.05))
+                    grubbs['G'][part], grubbs['GCrit'][part] = g, critical
+                    cols = np.flatnonzero(g > critical)
+                    rows_hit = far[cols]
+                else:
+                    low, high = _bounds(rule, chunk_stats, config)
+                    limits[rule][0][part], limits[rule][1][part] = low, high
+                    if rule == 'zscore':
+                        flags = deviation > (config.get('z_k', 3.0) * std)[:, None]
+                    else:
+                        # NaN 与上下限比较均为False，空值不会被标记
+                        flags = (block < low[:, None]) | (block > high[:, None])
+                    cols, rows_hit = np.nonzero(flags)
+                    del flags
+                found[rule][0].append(rows_hit)
+                found[rule][1].append(cols + start)
+                found[rule][2].append(block[cols, rows_hit])
+        del deviation
+        del block
+
+    hits = {}
+    for rule, (rows_parts, cols_parts, value_parts) in found.items():
+        rows = np.concatenate(rows_parts) if rows_parts else np.zeros(0, dtype=np.int64)
+        cols = np.concatenate(cols_parts) if cols_parts else np.zeros(0, dtype=np.int64)
+        values = np.concatenate(value_parts) if value_parts else np.zeros(0)
+        # 按行、列排序，明细表中同一SN的记录相邻
+        order = np.lexsort((cols, rows))
+        hits[rule] = (rows[order], cols[order], values[order])
+
+    summary = pd.DataFrame({'Items': data_columns, **stats})
+    for rule, (low, high) in limits.items():
+        summary[f'{OUTLIER_RULES[rule]}_Low'] = np.where(np.isfinite(low), low, np.nan)
+        summary[f'{OUTLIER_RULES[rule]}_High'] = np.where(np.isfinite(high), high, np.nan)
+    if 'grubbs' in rules:
+        summary['Grubbs_G'] = grubbs['G']
+        summary['Grubbs_Crit'] = grubbs['GCrit']
+    for rule in rules:
+        summary[f'{OUTLIER_RULES[rule]}_Count'] = np.bincount(hits[rule][1], minlength=m)
+    sn = data_df['SN'].to_numpy() if 'SN' in data_df.columns else np.asarray(data_df.index)
+    return OutlierResult(data_df.index, sn, data_columns, summary, hits)
+
+def exclude_outliers(prepared: tuple, result: OutlierResult) -> tuple:
+    """把被标记的值替换为空值
+    Args:
+        prepared: preprocess_data 的结果（整体数据或某个分组的数据）
+        result: detect_outliers 的结果（基于整体数据）
+    Returns:
+        与 prepared 形式相同的元组，测量数据为替换后的副本
+    """
+    data_df, lsl_values, usl_values = prepared
+    rows, cols = result.positions()
+    if not len(rows):
+        return prepared
+    if not data_df.index.equals(result.index):
+        # 分组数据：按行标签把整体数据中的行位置映射到该组的行位置
+        mapping = np.full(len(result.index), -1, dtype=np.int64)
+        positions = result.index.get_indexer(data_df.index)
+        mapping[positions[positions >= 0]] = np.flatnonzero(positions >= 0)
+        rows = mapping[rows]
+        keep = rows >= 0
+        rows, cols = rows[keep], cols[keep]
+    values = data_df[result.data_columns].to_numpy(dtype=float, copy=True)
+    values[rows, cols] = np.nan
+    excluded = data_df.copy()
+    excluded[result.data_columns] = values
+    return excluded, lsl_values, usl_values
+
+def export_outliers(result: OutlierResult, output_dir: str, writer=None) -> List[str]:
+    """导出异常值：outliers.xlsx（工作表“汇总”每列一行，“明细”每个异常值一行）
+
+    明细超过Excel的行数上限时，明细改为写入 outliers.csv。
+    Returns:
+        List[str]: 写出的文件路径
+    """
+    table = result.table()
+    sheets = [('汇总', result.summary)]
+    csv_path = add_sheet_or_csv(sheets, '明细', table, os.path.join(output_dir, 'outliers.csv'), writer)
+    path = save_statistics_workbook(sheets, os.path.join(output_dir, OUTLIER_WORKBOOK_NAME), writer)
+    return [path] + ([csv_path] if csv_path else [])
@@ -0,0 +1,322 @@
+"""异步输出写入
+
+绘图线程只负责把图表渲染为RGBA像素（或把Excel序列化为字节），PNG编码和写盘
+在后台线程池中完成，渲染下一张图表与写出上一张图表同时进行。网络共享上写盘
+很慢时效果尤其明显。
+
+待写出的任务数有上限：队列满时提交方阻塞等待（背压），已渲染但尚未写出的
+像素缓冲不会无限累积。每个文件先写入临时文件再重命名，读取方不会看到写了
+一半的文件。
+
+ArchiveWriter 把所有输出写入同一个ZIP文件（PNG等已压缩的格式不再压缩），
+并附带 manifest.json 索引，适合大量小文件写入很慢的网络共享和杀毒扫描的磁盘。
+ZIP的中央目录支持随机访问，查看其中一张图表不需要解压全部内容。
+"""
+import io
+import os
+import time
+import json
+import shutil
+import zipfile
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future, wait
+from typing import Callable, List, Optional
+import numpy as np
+import matplotlib
+import matplotlib.image as mimage
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from .instrument import TRACER
+from .utils import copy_file
+
+def _can_render_rgba(path: str, savefig_kwargs: dict) -> bool:
+    """是否可以先渲染为RGBA再在后台编码（结果与 savefig 逐字节相同）
+
+    只处理PNG和默认的保存参数；bbox_inches='tight'、透明背景等情况由 savefig
+    在当前线程序列化，后台只负责写盘。
+    """
+    rc = matplotlib.rcParams
+    return (os.path.splitext(path)[1].lower() == '.png'
+            and set(savefig_kwargs) <= {'dpi'}
+            and rc['savefig.facecolor'] == 'auto'
+            and rc['savefig.edgecolor'] == 'auto'
+            and not rc['savefig.transparent']
+            and rc['savefig.bbox'] != 'tight')
+
+class OutputWriter:
+    """后台写出图表和文件的线程池
+
+    Args:
+        max_workers: 后台编码/写盘的线程数
+        max_pending: 同时排队和写出中的文件数上限，达到上限时提交方阻塞
+    """
+    # 归档文件路径，只有 ArchiveWriter 才有
+    archive_path: Optional[str] = None
+
+    def __init__(self, max_workers: int = 2, max_pending: int = 8):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers,
+                                        thread_name_prefix='output-writer')
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._futures: List[Future] = []
+        self._errors: List[BaseException] = []
+        self.files_written = 0
+        self.bytes_written = 0
+
+    def begin(self, output_dir: str) -> str:
+        """确定本次分析的输出目录，返回实际写入的目录"""
+        return output_dir
+
+    def submit_figure(self, fig: Figure, path: str, callback: Optional[Callable[[bytes], None]] = None,
+                      **savefig_kwargs) -> None:
+        """渲染图表并交给后台写出，返回后即可关闭图表
+        Args:
+            fig: 要保存的图表
+            path: 输出文件路径
+            callback: 文件写出后在后台线程中以文件内容（bytes）为参数调用（如加入渲染缓存）
+            savefig_kwargs: 传给 savefig 的参数
+        """
+        if _can_render_rgba(path, savefig_kwargs):
+            dpi = savefig_kwargs.get('dpi', matplotlib.rcParams['savefig.dpi'])
+            if dpi != 'figure' and dpi != fig.dpi:
+                fig.set_dpi(dpi)
+            with TRACER.span('render', 'plot'):
+                canvas = FigureCanvasAgg(fig)
+                canvas.draw()
+                rgba = np.asarray(canvas.buffer_rgba()).copy()
+            fig_dpi = fig.dpi
+
+            def job():
+                # 与Agg后端的 print_png 相同的编码方式
+                buffer = io.BytesIO()
+                mimage.imsave(buffer, rgba, format='png', origin='upper', dpi=fig_dpi)
+                return buffer.getvalue()
+            self._submit(path, job, callback)
+        else:
+            buffer = io.BytesIO()
+            fmt = os.path.splitext(path)[1][1:].lower() or None
+            with TRACER.span('savefig', 'io'):
+                fig.savefig(buffer, format=fmt, **savefig_kwargs)
+            self.submit_bytes(path, buffer.getvalue(), callback)
+
+    def submit_bytes(self, path: str, data: bytes,
+                     callback: Optional[Callable[[bytes], None]] = None) -> None:
+        """把已序列化的内容交给后台写出"""
+        self._submit(path, lambda: data, callback)
+
+    def submit_file(self, path: str, src_path: str) -> None:
+        """把已有的文件（如渲染缓存中的图表）复制到输出位置"""
+        copy_file(src_path, path)
+
+    def _submit(self, path: str, job: Callable[[], bytes],
+                callback: Optional[Callable[[bytes], None]]) -> None:
+        # 队列满时阻塞，直到有文件写完
+        with TRACER.span('write_queue_wait', 'io'):
+            self._slots.acquire()
+        try:
+            future = self._pool.submit(self._write, path, job, callback)
+        except BaseException:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._futures.append(future)
+
+    def _write(self, path: str, job: Callable[[], bytes],
+               callback: Optional[Callable[[bytes], None]]) -> None:
+        try:
+            with TRACER.span('async_write', 'io', file=os.path.basename(path)):
+                data = job()
+                self._commit(path, data)
+            with self._lock:
+                self.files_written += 1
+                self.bytes_written += len(data)
+            if callback is not None:
+                callback(data)
+        except BaseException as e:
+            with self._lock:
+                self._errors.append(e)
+            raise
+        finally:
+            self._slots.release()
+
+    def _commit(self, path: str, data: bytes) -> None:
+        """写出一个文件：先写临时文件再重命名（在后台线程中调用）"""
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def flush(self) -> None:
+        """等待已提交的文件全部写完
+        Raises:
+            第一个写出失败的异常
+        """
+        with self._lock:
+            futures, self._futures = self._futures, []
+        with TRACER.span('flush_writes', 'io'):
+            wait(futures)
+        with self._lock:
+            errors, self._errors = self._errors, []
+        if errors:
+            raise errors[0]
+
+    def close(self, discard: bool = False, failed: bool = False) -> None:
+        """关闭线程池
+        Args:
+            discard: 为True时丢弃尚未开始写出的文件（用于取消分析）
+            failed: 分析失败时为True，已提交的文件照常写完
+        """
+        self._pool.shutdown(wait=True, cancel_futures=discard)
+
+# 已经压缩过的格式直接存储，不再压缩
+STORED_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.pdf', '.xlsx', '.zip', '.parquet', '.feather')
+
+MANIFEST_NAME = 'manifest.json'
+
+class ArchiveWriter(OutputWriter):
+    """把全部输出写入一个ZIP文件
+
+    分析过程中输出目录位于本地临时目录，只有ZIP文件写到最终位置（输出目录同名的
+    .zip）。通过本写入器提交的文件直接写入ZIP；其它代码直接写入输出目录的文件
+    （trace.json、分页PDF等）在关闭时一并收入。ZIP先以 .partial 后缀写出，完成后
+    再重命名，监视文件夹等读取方不会看到写了一半的归档；分析失败时归档不写入
+    manifest.json，保留为 .partial，不会被当作完整的结果。
+    """
+    def __init__(self, max_workers: int = 2, max_pending: int = 8):
+        super().__init__(max_workers, max_pending)
+        self.root_dir: Optional[str] = None
+        self._staging_dir: Optional[str] = None
+        self._partial_path: Optional[str] = None
+        self._zip: Optional[zipfile.ZipFile] = None
+        self._zip_lock = threading.Lock()
+
+    def begin(self, output_dir: str) -> str:
+        self.archive_path = f'{os.path.abspath(output_dir)}.zip'
+        self._partial_path = f'{self.archive_path}.partial'
+        os.makedirs(os.path.dirname(self.archive_path), exist_ok=True)
+        self._staging_dir = tempfile.mkdtemp(prefix='dac_archive_')
+        self.root_dir = os.path.join(self._staging_dir, os.path.basename(output_dir))
+        os.makedirs(self.root_dir, exist_ok=True)
+        self._zip = zipfile.ZipFile(self._partial_path, 'w', allowZip64=True)
+        return self.root_dir
+
+    def _arcname(self, path: str) -> Optional[str]:
+        """文件在归档中的名称，不在输出目录下时返回None"""
+        if self._zip is None:
+            return None
+        rel_path = os.path.relpath(os.path.abspath(path), self.root_dir)
+        if rel_path == os.pardir or rel_path.startswith(os.pardir + os.sep):
+            return None
+        return rel_path.replace(os.sep, '/')
+
+    def _add(self, arcname: str, data: bytes) -> None:
+        info = zipfile.ZipInfo(arcname, date_time=time.localtime()[:6])
+        info.compress_type = (zipfile.ZIP_STORED if arcname.lower().endswith(STORED_EXTENSIONS)
+                              else zipfile.ZIP_DEFLATED)
+        with self._zip_lock:
+            self._zip.writestr(info, data)
+
+    def _commit(self, path: str, data: bytes) -> None:
+        arcname = self._arcname(path)
+        if arcname is None:
+            # 输出目录以外的文件照常写盘
+            super()._commit(path, data)
+        else:
+            self._add(arcname, data)
+
+    def submit_file(self, path: str, src_path: str) -> None:
+        if self._arcname(path) is None:
+            super().submit_file(path, src_path)
+            return
+        with open(src_path, 'rb') as f:
+            self.submit_bytes(path, f.read())
+
+    def _write_manifest(self) -> None:
+        entries = [{
+            'name': info.filename,
+            'size': info.file_size,
+            'compressed_size': info.compress_size,
+            'stored': info.compress_type == zipfile.ZIP_STORED,
+            'crc32': f'{info.CRC:08x}',
+        } for info in self._zip.infolist()]
+        manifest = {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'output': os.path.basename(self.root_dir),
+            'files': len(entries),
+            'entries': entries,
+        }
+        self._add(MANIFEST_NAME, json.dumps(manifest, ensure_ascii=False, indent=2).encode('utf-8'))
+
+    def close(self, discard: bool = False, failed: bool = False) -> None:
+        """关闭线程池并完成归档
+        Args:
+            discard: 为True时丢弃归档（用于取消分析）
+            failed: 分析失败时为True，归档保留为 .partial（不写入 manifest.json、不重命名）
+        """
+        super().close(discard, failed)
+        if self._zip is None:
+            return
+        try:
+            if not (discard or failed):
+                with TRACER.span('archive_finalize', 'io'):
+                    # 收入直接写入输出目录的文件
+                    existing = set(self._zip.namelist())
+                    for root, _, names in os.walk(self.root_dir):
+                        for name in sorted(names):
+                            path = os.path.join(root, name)
+                            arcname = self._arcname(path)
+                            if arcname not in existing:
+                                with open(path, 'rb') as f:
+                                    self._add(arcname, f.read())
+                    self._write_manifest()
+            self._zip.close()
+            self._zip = None
+            if discard:
+                os.remove(self._partial_path)
+            elif failed:
+                print(f"警告: 分析失败，未完成的归档保留为 {self._partial_path}")
+            else:
+                os.replace(self._partial_path, self.archive_path)
+        finally:
+            shutil.rmtree(self._staging_dir, ignore_errors=True)
+
+def list_archive(archive_path: str) -> List[dict]:
+    """读取归档的索引（只读取 manifest.json，不解压其它内容）
+    Args:
+        archive_path: 归档文件路径
+    Returns:
+        List[dict]: 每个文件的名称、大小、压缩后大小、是否直接存储和CRC
+    """
+    with zipfile.ZipFile(archive_path) as archive:
+        return json.loads(archive.read(MANIFEST_NAME).decode('utf-8'))['entries']
+
+def read_archive_entry(archive_path: str, name: str) -> bytes:
+    """从归档中读取单个文件，例如 read_archive_entry(path, 'single_distributions/A.png')"""
+    with zipfile.ZipFile(archive_path) as archive:
+        return archive.read(name)
+
+def write_output_bytes(path: str, data: bytes, writer: Optional[OutputWriter] = None) -> None:
+    """写出已序列化的文件内容：提供 writer 时交给后台写出（或写入归档），否则直接写入 path"""
+    if writer is not None:
+        writer.submit_bytes(path, data)
+    else:
+        with open(path, 'wb') as f:
+            f.write(data)
+
+def get_output_writer(config: object) -> Optional[OutputWriter]:
+    """根据配置创建输出写入器：归档输出时为 ArchiveWriter，
+    异步写出时为 OutputWriter，都未启用时返回None"""
+    output_config = getattr(config, 'OUTPUT', {})
+    options = dict(max_workers=output_config.get('write_workers', 2),
+                   max_pending=output_config.get('write_queue_size', 8))
+    if output_config.get('archive', False):
+        return ArchiveWriter(**options)
+    if not output_config.get('async_write', False):
+        return None
+    return OutputWriter(**options)
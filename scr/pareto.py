@@ -0,0 +1,93 @@
+"""NG 柏拉图
+
+按数据列统计超限单元数，从多到少排序并计算累计占比，整体和每个分组各一张表和
+一张柏拉图。计数来自单元良率的超限矩阵（compute_unit_yield：与 preprocess_data
+的规格限一次广播比较，判定规则与 calculate_out_of_spec_column 相同），各分组的计数
+在同一次计算中得到，不需要按分组重新比较。
+"""
+import os
+from typing import List, Tuple
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+from .statistics_export import save_statistics_workbook
+from .instrument import TRACER
+
+PARETO_WORKBOOK_NAME = 'pareto.xlsx'
+
+# 整体数据的范围名
+OVERALL_SCOPE = '整体'
+
+PARETO_COLUMNS = ['Items', 'NG', 'Rate', 'Share', 'CumShare']
+
+def pareto_table(item_ng: np.ndarray, data_columns: List[str], units: int) -> pd.DataFrame:
+    """一个范围的柏拉图表，只包含有超限的数据列
+    Args:
+        item_ng: 每个数据列的超限单元数
+        data_columns: 数据列
+        units: 该范围的单元数
+    Returns:
+        pd.DataFrame: Items、NG、Rate（NG / 单元数）、Share（占全部超限次数的比例）、
+            CumShare（累计占比），按 NG 从多到少排序，相同时保持数据列顺序
+    """
+    item_ng = np.asarray(item_ng, dtype=np.int64)
+    order = np.argsort(-item_ng, kind='stable')
+    order = order[item_ng[order] > 0]
+    counts = item_ng[order]
+    total = counts.sum()
+    return pd.DataFrame({
+        'Items': np.asarray(data_columns, dtype=object)[order],
+        'NG': counts,
+        'Rate': counts / units if units else np.zeros(len(counts)),
+        'Share': counts / total if total else np.zeros(len(counts)),
+        'CumShare': np.cumsum(counts) / total if total else np.zeros(len(counts)),
+    }, columns=PARETO_COLUMNS)
+
+def pareto_tables(unit_yield) -> List[Tuple[str, pd.DataFrame]]:
+    """整体和各分组的柏拉图表
+    Args:
+        unit_yield: compute_unit_yield 的结果
+    Returns:
+        List[(范围名, 柏拉图表)]，第一个为整体
+    """
+    tables = [(OVERALL_SCOPE, pareto_table(unit_yield.item_ng, unit_yield.data_columns, unit_yield.units))]
+    if unit_yield.groups is not None:
+        for i, (group, units) in enumerate(zip(unit_yield.groups['Group'], unit_yield.groups['Units'])):
+            tables.append((str(group), pareto_table(unit_yield.group_item_ng[i],
+                                                    unit_yield.data_columns, int(units))))
+    return tables
+
+def plot_pareto(table: pd.DataFrame, scope: str, config: object) -> Figure:
+    """绘制柏拉图：超限单元数柱状图（左轴）和累计占比折线（右轴）"""
+    pareto_config = config.PLOT.get('pareto', {})
+    top_n = pareto_config.get('top_n', 20)
+    shown = table.head(top_n) if top_n else table
+    fig, ax = plt.subplots(figsize=pareto_config.get('figsize', (12, 6)))
+    x = np.arange(len(shown))
+    with TRACER.span('plot', 'plot'):
+        ax.bar(x, shown['NG'], color='tab:blue')
+        ax_cum = ax.twinx()
+        ax_cum.plot(x, shown['CumShare'] * 100, color='tab:red', marker='o')
+    ax_cum.axhline(80, color='gray', linestyle='--', linewidth=1)
+    ax_cum.set_ylim(0, 105)
+    ax_cum.set_ylabel('累计占比 (%)')
+    ax.set_ylabel('NG')
+    ax.set_xticks(x)
+    ax.set_xticklabels(shown['Items'], rotation=45, ha='right')
+    for i, count in enumerate(shown['NG']):
+        ax.text(i, count, str(count), ha='center', va='bottom', fontsize='small')
+
+    title = 'NG柏拉图' if scope == OVERALL_SCOPE else f'NG柏拉图 {scope}'
+    if config.PLOT.get('title_prefix'):
+        title = f"{config.PLOT['title_prefix']} {title}"
+    if len(shown) < len(table):
+        title += f'（前{len(shown)}项，共{len(table)}项）'
+    ax.set_title(title)
+    with TRACER.span('tight_layout', 'layout'):
+        fig.tight_layout()
+    return fig
+
+def export_pareto(tables: List[Tuple[str, pd.DataFrame]], output_dir: str, writer=None) -> str:
+    """导出柏拉图表：pareto.xlsx，每个范围一个工作表"""
+    return save_statistics_workbook(tables, os.path.join(output_dir, PARETO_WORKBOOK_NAME), writer)
@@ -0,0 +1,167 @@
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from .instrument import TRACER
+
+# pyplot的“当前图表”是全局状态，绘图任务必须串行执行
+PYPLOT_LOCK = threading.RLock()
+
+@dataclass
+class Task:
+    """任务图中的一个节点
+
+    func 以依赖任务的结果作为位置参数被调用，返回值作为本任务的结果。
+    """
+    name: str
+    func: Callable
+    deps: Tuple[str, ...] = ()
+    kind: str = 'data'   # 'data' 数据处理, 'plot' 绘图, 'export' 导出
+    stage: str = ''      # 所属阶段，用于日志和统计
+
+class TaskListener:
+    """任务执行事件的监听器基类，子类按需覆盖（在工作线程中调用）"""
+    def on_task_added(self, task: Task) -> None:
+        pass
+
+    def on_task_start(self, task: Task) -> None:
+        pass
+
+    def on_task_end(self, task: Task, elapsed: float, result: Any = None) -> None:
+        pass
+
+class TaskGraph:
+    """声明式任务图
+
+    节点之间通过名称声明依赖，同名节点只会添加一次，因此多个阶段共用的中间结果
+    （例如某个分组的预处理数据）只计算一次。任务执行过程中也可以继续添加节点，
+    用于在数据加载后才能确定的按列、按分组的任务。
+    """
+    def __init__(self):
+        self.tasks: Dict[str, Task] = OrderedDict()
+        self._lock = threading.Lock()
+        self._new_tasks: List[Task] = []
+
+    def add(self, name: str, func: Callable, deps: Iterable[str] = (),
+            kind: str = 'data', stage: str = '') -> str:
+        """添加任务节点
+        Args:
+            name: 节点名称，同名节点已存在时忽略本次添加
+            func: 任务函数
+            deps: 依赖的节点名称
+            kind: 任务类型
+            stage: 所属阶段
+        Returns:
+            str: 节点名称，便于作为其它节点的依赖
+        Raises:
+            ValueError: 依赖的节点不存在时
+        """
+        with self._lock:
+            if name in self.tasks:
+                return name
+            deps = tuple(deps)
+            missing = [dep for dep in deps if dep not in self.tasks]
+            if missing:
+                raise ValueError(f"任务 {name} 依赖的任务不存在: {missing}")
+            task = Task(name, func, deps, kind, stage)
+            self.tasks[name] = task
+            self._new_tasks.append(task)
+            return name
+
+    def _take_new_tasks(self) -> List[Task]:
+        with self._lock:
+            new_tasks, self._new_tasks = self._new_tasks, []
+            return new_tasks
+
+    @staticmethod
+    def _execute(task: Task, args: list, listeners: List[TaskListener], cancel=None) -> Any:
+        # 在两个工作单元之间检查取消请求
+        if cancel is not None:
+            cancel.check()
+        for listener in listeners:
+            listener.on_task_start(task)
+        # 计时区间按阶段命名，便于汇总；具体的任务名记录在参数中
+        span_name = task.stage or task.name
+        # 绘图任务在取得锁之后才开始计时，等待锁的时间不计入阶段耗时
+        with PYPLOT_LOCK if task.kind == 'plot' else nullcontext():
+            start = time.perf_counter()
+            with TRACER.span(span_name, task.kind, task=task.name):
+                result = task.func(*args)
+            elapsed = time.perf_counter() - start
+        for listener in listeners:
+            listener.on_task_end(task, elapsed, result)
+        return result
+
+    def run(self, max_workers: Optional[int] = None,
+            listeners: Iterable[TaskListener] = (), cancel=None) -> Dict[str, Any]:
+        """执行任务图，相互独立的节点在线程池中并发执行
+        Args:
+            max_workers: 线程池大小
+            listeners: 任务事件监听器
+            cancel: 取消标记（提供 check() 方法），每个任务开始前检查
+        Returns:
+            Dict[str, Any]: 各节点的执行结果
+        Raises:
+            任一任务抛出的第一个异常；出错后不再启动新的任务
+        """
+        listeners = list(listeners)
+        results: Dict[str, Any] = {}
+        waiting: Dict[str, set] = {}
+        dependents = defaultdict(list)
+        ready: List[Task] = []
+
+        def register(new_tasks):
+            for task in new_tasks:
+                for listener in listeners:
+                    listener.on_task_added(task)
+                unfinished = {dep for dep in task.deps if dep not in results}
+                if unfinished:
+                    waiting[task.name] = unfinished
+                    for dep in unfinished:
+                        dependents[dep].append(task.name)
+                else:
+                    ready.append(task)
+
+        register(self._take_new_tasks())
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            running = {}
+            while ready or running:
+                while ready:
+                    task = ready.pop(0)
+                    args = [results[dep] for dep in task.deps]
+                    running[pool.submit(self._execute, task, args, listeners, cancel)] = task
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    task = running.pop(future)
+                    error = future.exception()
+                    if error is not None:
+                        for pending in running:
+                            pending.cancel()
+                        raise error
+                    results[task.name] = future.result()
+                    for name in dependents.pop(task.name, []):
+                        waiting[name].discard(task.name)
+                        if not waiting[name]:
+                            del waiting[name]
+                            ready.append(self.tasks[name])
+                # 任务执行过程中新增的节点
+                register(self._take_new_tasks())
+
+        if waiting:
+            raise ValueError(f"任务图中存在无法执行的任务: {sorted(waiting)}")
+        return results
+
+class StageTimer(TaskListener):
+    """按阶段累计任务耗时（秒）"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stage_seconds: Dict[str, float] = {}
+
+    def on_task_end(self, task: Task, elapsed: float, result: Any = None) -> None:
+        stage = task.stage or task.name
+        with self._lock:
+            self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + elapsed
@@ -6,6 +6,7 @@ from matplotlib.axes import Axes
 from typing import List, Dict, Optional
 from dataclasses import dataclass, field
 from scr.utils import format_number
+from scr.instrument import TRACER
 from scr.data_processing import calculate_cpk, calculate_out_of_spec_column
 
 @dataclass
@@ -92,8 +93,10 @@ class PlotHelper:
                               config: object, style: PlotStyle) -> List:
         """设置分布图的通用元素"""
         # 绘制直方图和密度曲线
-        sns.histplot(data=data, stat='density', ax=ax)
-        sns.kdeplot(data=data, ax=ax, color='red', ls='--')
+        with TRACER.span('sns.histplot', 'plot'):
+            sns.histplot(data=data, stat='density', ax=ax)
+        with TRACER.span('sns.kdeplot', 'plot'):
+            sns.kdeplot(data=data, ax=ax, color='red', ls='--')
         
         # 获取y轴限制
         ymin, ymax = ax.get_ylim()
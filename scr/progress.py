@@ -0,0 +1,156 @@
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional
+from .pipeline import Task, TaskListener
+
+class AnalysisCancelled(Exception):
+    """分析被用户取消"""
+    pass
+
+class CancelToken:
+    """协作式取消标记，任务在两个工作单元之间检查"""
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self) -> None:
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def check(self) -> None:
+        """已取消时抛出 AnalysisCancelled"""
+        if self._event.is_set():
+            raise AnalysisCancelled("分析已取消")
+
+@dataclass
+class ProgressEvent:
+    """分析进度事件"""
+    kind: str                 # 'stage_start', 'stage_end' 或 'item'
+    stage: str                # 阶段名称
+    done: int                 # 已完成的工作单元数
+    total: int                # 已知的工作单元总数
+    bytes_written: int        # 已写入的字节数
+    elapsed: float            # 已用时间（秒）
+    percent: float            # 完成百分比（0-100），不会减小
+    eta: Optional[float]      # 预计剩余时间（秒），尚无法估计时为None
+    item: str = ''            # 刚完成的工作单元名称
+
+def format_duration(seconds: float) -> str:
+    """将秒数格式化为 mm:ss 或 hh:mm:ss"""
+    seconds = int(round(seconds))
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes:02d}:{seconds:02d}"
+
+def format_progress(event: ProgressEvent) -> str:
+    """生成进度的文字描述"""
+    text = (f"{event.stage} {event.done}/{event.total} "
+            f"已写入 {event.bytes_written / 1024 / 1024:.1f}MB "
+            f"用时 {format_duration(event.elapsed)}")
+    if event.eta is not None:
+        text += f" 剩余约 {format_duration(event.eta)}"
+    return text
+
+def _output_size(result) -> int:
+    """统计任务返回的输出文件大小"""
+    if isinstance(result, str):
+        paths = [result]
+    elif isinstance(result, (list, tuple)):
+        paths = [path for path in result if isinstance(path, str)]
+    else:
+        return 0
+    return sum(os.path.getsize(path) for path in paths if os.path.isfile(path))
+
+class ProgressTracker(TaskListener):
+    """把任务图的执行事件转换为进度事件
+
+    每个任务节点是一个工作单元；剩余时间按已测得的工作单元吞吐量估计。
+    绘图和导出节点返回其写入的文件路径，用于统计写入的字节数。
+
+    指定 planning_task 时，该节点在运行时追加大部分节点，结束前总数还不确定：
+    它开始之前已有的节点占固定的 planning_share，之后追加的节点占其余部分，
+    规划节点结束前不估计剩余时间，百分比不会因为追加节点而减小。
+    """
+    planning_share = 0.2
+
+    def __init__(self, callback: Callable[[ProgressEvent], None],
+                 planning_task: Optional[str] = None):
+        self.callback = callback
+        self.planning_task = planning_task
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+        self._total = 0
+        self._done = 0
+        self._bytes = 0
+        # 规划节点开始前已有的节点
+        self._early_tasks = set()
+        self._early_done = 0
+        self._planning_started = planning_task is None
+        self._planned = planning_task is None
+        self._percent = 0.0
+        self._stage_total: Dict[str, int] = {}
+        self._stage_done: Dict[str, int] = {}
+        self._active_stages = set()
+
+    def _update_percent(self) -> None:
+        if self.planning_task is None:
+            percent = self._done / self._total * 100 if self._total else 0.0
+        else:
+            early_total = len(self._early_tasks)
+            percent = self.planning_share * self._early_done / early_total * 100
+            late_total = self._total - early_total
+            if self._planned and late_total:
+                late_done = self._done - self._early_done
+                percent += (1 - self.planning_share) * late_done / late_total * 100
+        self._percent = max(self._percent, percent)
+
+    def _event(self, kind: str, stage: str, item: str = '') -> ProgressEvent:
+        elapsed = time.perf_counter() - self._start
+        eta = None
+        if self._planned and self._done:
+            # 按实测吞吐量（工作单元/秒）估计剩余时间
+            eta = elapsed / self._done * (self._total - self._done)
+        return ProgressEvent(kind, stage, self._done, self._total, self._bytes,
+                             elapsed, self._percent, eta, item)
+
+    def on_task_added(self, task: Task) -> None:
+        with self._lock:
+            self._total += 1
+            if not self._planning_started:
+                self._early_tasks.add(task.name)
+            self._stage_total[task.stage] = self._stage_total.get(task.stage, 0) + 1
+
+    def on_task_start(self, task: Task) -> None:
+        with self._lock:
+            if task.name == self.planning_task:
+                self._planning_started = True
+            if task.stage in self._active_stages:
+                return
+            # 阶段中的节点可能在运行时追加，阶段结束后可以再次开始
+            self._active_stages.add(task.stage)
+            event = self._event('stage_start', task.stage, task.name)
+        self.callback(event)
+
+    def on_task_end(self, task: Task, elapsed: float, result=None) -> None:
+        size = _output_size(result) if task.kind in ('plot', 'export') else 0
+        with self._lock:
+            self._done += 1
+            self._bytes += size
+            if task.name in self._early_tasks:
+                self._early_done += 1
+            if task.name == self.planning_task:
+                self._planned = True
+            self._update_percent()
+            self._stage_done[task.stage] = self._stage_done.get(task.stage, 0) + 1
+            events = [self._event('item', task.stage, task.name)]
+            if self._stage_done[task.stage] == self._stage_total[task.stage]:
+                self._active_stages.discard(task.stage)
+                events.append(self._event('stage_end', task.stage, task.name))
+        for event in events:
+            self.callback(event)
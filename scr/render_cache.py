@@ -0,0 +1,192 @@
+import os
+import hashlib
+import threading
+import pandas as pd
+import matplotlib
+import matplotlib.pyplot as plt
+import seaborn as sns
+from typing import Callable, Optional
+from matplotlib.figure import Figure
+from .utils import get_output_dir, copy_file
+from .instrument import TRACER
+
+# 影响图表渲染结果的源码文件，任何一个改动都会使缓存失效
+_RENDER_SOURCES = ('plot_base.py', 'distribution_plots.py', 'box_plots.py',
+                   'data_processing.py', 'utils.py', 'render_cache.py', 'spc.py',
+                   'time_windows.py', 'pareto.py')
+
+# 影响图表外观的PLOT配置项
+_PLOT_KEYS = ('show_lsl', 'show_usl', 'title_prefix', 'distribution', 'boxplot', 'spc', 'pareto')
+
+_code_version = None
+
+def get_code_version() -> str:
+    """计算绘图代码的版本指纹
+    Returns:
+        str: 绘图相关源码及matplotlib/seaborn版本的哈希值
+    """
+    global _code_version
+    if _code_version is None:
+        digest = hashlib.sha1()
+        digest.update(matplotlib.__version__.encode())
+        digest.update(sns.__version__.encode())
+        src_dir = os.path.dirname(os.path.abspath(__file__))
+        for name in _RENDER_SOURCES:
+            with open(os.path.join(src_dir, name), 'rb') as f:
+                digest.update(f.read())
+        _code_version = digest.hexdigest()
+    return _code_version
+
+def data_digest(data) -> str:
+    """计算数据切片的内容哈希
+    Args:
+        data: Series或DataFrame
+    Returns:
+        str: 数据内容（含列名）的哈希值
+    """
+    digest = hashlib.sha1()
+    if isinstance(data, pd.DataFrame):
+        digest.update(repr(list(data.columns)).encode())
+    else:
+        digest.update(repr(data.name).encode())
+    digest.update(pd.util.hash_pandas_object(data, index=False).values.tobytes())
+    return digest.hexdigest()
+
+def plot_config_digest(config: object) -> str:
+    """计算与渲染相关的PLOT配置的哈希值"""
+    relevant = {key: config.PLOT.get(key) for key in _PLOT_KEYS}
+    relevant['font'] = list(plt.rcParams['font.sans-serif'])
+    return hashlib.sha1(repr(sorted(relevant.items())).encode()).hexdigest()
+
+class RenderCache:
+    """按内容寻址的图表渲染缓存
+
+    缓存键由数据哈希、规格限、相关PLOT配置和代码版本组成。命中时直接把上一次
+    生成的PNG复制到新的输出目录，而不重新绘图。输出文件与缓存条目互不共享数据，
+    修改或删除输出的图表不会影响缓存。
+    任务图的多个绘图线程共用一个缓存，命中/未命中计数在锁内更新。
+    """
+    def __init__(self, cache_dir: str, config: object):
+        self.cache_dir = cache_dir
+        self.config_digest = plot_config_digest(config)
+        self.hits = 0
+        self.misses = 0
+        self._count_lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def make_key(self, *parts) -> str:
+        """根据给定的组成部分生成缓存键"""
+        digest = hashlib.sha1()
+        digest.update(get_code_version().encode())
+        digest.update(self.config_digest.encode())
+        for part in parts:
+            digest.update(repr(part).encode())
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    def _count(self, hit: bool) -> None:
+        with self._count_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f'{key}.png')
+
+    def fetch(self, key: str, dest: str) -> bool:
+        """尝试从缓存中取出图表
+        Args:
+            key: 缓存键
+            dest: 目标文件路径
+        Returns:
+            bool: 是否命中缓存
+        """
+        entry = self._entry_path(key)
+        if not os.path.exists(entry):
+            self._count(hit=False)
+            return False
+        copy_file(entry, dest)
+        self._count(hit=True)
+        return True
+
+    def lookup(self, key: str) -> Optional[str]:
+        """查找缓存条目，返回其路径，未命中时返回None"""
+        entry = self._entry_path(key)
+        if not os.path.exists(entry):
+            self._count(hit=False)
+            return None
+        self._count(hit=True)
+        return entry
+
+    def store_bytes(self, key: str, data: bytes) -> None:
+        """把已编码的图表内容加入缓存"""
+        entry = self._entry_path(key)
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+        tmp_path = f'{entry}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, entry)
+
+    def store(self, key: str, src: str) -> None:
+        """把新生成的图表加入缓存"""
+        entry = self._entry_path(key)
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+        copy_file(src, entry)
+
+def get_render_cache(data_path: str, config: object) -> Optional[RenderCache]:
+    """根据配置创建渲染缓存，未启用时返回None
+    Args:
+        data_path: 数据文件路径
+        config: 配置对象
+    Returns:
+        RenderCache或None
+    """
+    if not config.OUTPUT.get('render_cache', False):
+        return None
+    cache_dir = config.OUTPUT.get('render_cache_dir')
+    if not cache_dir:
+        # 默认放在输出子文件夹下，同一数据目录的多次运行共享
+        cache_dir = os.path.join(os.path.dirname(get_output_dir(data_path)), '.render_cache')
+    return RenderCache(cache_dir, config)
+
+def save_figure_cached(output_path: str, draw: Callable[[], Figure],
+                       cache: Optional[RenderCache], *key_parts, writer=None,
+                       **savefig_kwargs) -> bool:
+    """保存图表，命中缓存时跳过绘制
+    Args:
+        output_path: 输出文件路径
+        draw: 绘制并返回Figure的函数，只在未命中缓存时调用
+        cache: 渲染缓存，为None时总是重新绘制
+        key_parts: 组成缓存键的数据哈希、规格限等
+        writer: OutputWriter，提供时图表在后台编码和写出，写完后再加入缓存
+        savefig_kwargs: 传给savefig的参数
+    Returns:
+        bool: 是否命中缓存
+    """
+    key = None
+    if cache is not None:
+        key = cache.make_key(os.path.basename(output_path), savefig_kwargs, *key_parts)
+        if writer is not None:
+            entry = cache.lookup(key)
+            if entry is not None:
+                writer.submit_file(output_path, entry)
+                return True
+        elif cache.fetch(key, output_path):
+            return True
+
+    fig = draw()
+    try:
+        if writer is not None:
+            store = (lambda data: cache.store_bytes(key, data)) if cache is not None else None
+            writer.submit_figure(fig, output_path, store, **savefig_kwargs)
+            return False
+        with TRACER.span('savefig', 'io'):
+            fig.savefig(output_path, **savefig_kwargs)
+    finally:
+        # 保存失败时也要关闭图表，否则pyplot会一直持有它
+        plt.close(fig)
+
+    if cache is not None:
+        cache.store(key, output_path)
+    return False
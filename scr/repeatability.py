@@ -0,0 +1,100 @@
+"""测量重复性分析
+
+复测的单元被同一测量系统多次测量，同一 SN 各次测量之间的差异反映测量系统的重复性（设备变差）。
+与复测分析使用同一个段索引（按 (SN, Time) 排序一次，每个 SN 为一段连续行），只保留有多次测量的段，
+所有数据列一次计算段内平方和（reduceat），合并的段内方差即重复性方差：
+    σ²_r = Σ段 Σ(x - 段均值)² / Σ段 (n段 - 1)
+并与整体方差、公差（USL - LSL）比较。不需要按 SN 循环。
+"""
+import os
+from typing import Sequence
+import numpy as np
+import pandas as pd
+from .data_processing import get_spec_limits
+from .retest import segment_index
+from .statistics_export import save_statistics_workbook
+from .instrument import traced
+
+REPEATABILITY_WORKBOOK_NAME = 'repeatability.xlsx'
+
+REPEATABILITY_COLUMNS = ['Items', 'Units', 'Repeats', 'DOF', 'RepeatSigma', 'TotalSigma',
+                         'VarShare', 'PctTolerance']
+
+@traced('compute_repeatability', 'stats')
+def compute_repeatability(df: pd.DataFrame, prepared: tuple, data_columns: Sequence[str],
+                          sigma_multiplier: float = 6.0) -> pd.DataFrame:
+    """计算每个数据列的测量重复性
+    Args:
+        df: 清理后的数据（含 Time 列时同一SN按时间排序）
+        prepared: preprocess_data 的结果
+        data_columns: 数据列
+        sigma_multiplier: 计算公差占比时的σ倍数（6 对应 99.73% 的测量散布，也常用 5.15）
+    Returns:
+        pd.DataFrame: 列为 REPEATABILITY_COLUMNS：
+            Units 为该列有至少两次有效测量的单元数，Repeats 为这些单元的测量次数，DOF 为自由度，
+            RepeatSigma 为重复性标准差，TotalSigma 为全部测量的标准差（与统计表的 Std 相同），
+            VarShare 为重复性方差占整体方差的比例，PctTolerance 为 sigma_multiplier*RepeatSigma / (USL - LSL)；
+            没有复测或缺少规格限时为NaN
+    """
+    data_df, lsl_values, usl_values = prepared
+    data_columns = list(data_columns)
+    times = None
+    if 'Time' in df.columns:
+        times = pd.to_datetime(df.loc[data_df.index, 'Time'], errors='coerce').to_numpy()
+    order, starts, ends = segment_index(data_df['SN'].to_numpy(), times)
+
+    # 只保留有多次测量的段，通常只占很少的行
+    lengths = ends - starts
+    repeated = lengths >= 2
+    rows = order[np.repeat(repeated, lengths)]
+    lengths = lengths[repeated]
+    seg_starts = np.r_[0, np.cumsum(lengths)[:-1]].astype(np.intp)
+
+    # 转置为（列数 x 行数）的连续块：沿行方向的 reduceat 对大量短段比沿列方向快得多
+    values = np.ascontiguousarray(data_df.iloc[rows][data_columns].to_numpy(dtype=float).T)
+    valid = ~np.isnan(values)
+    m = len(data_columns)
+    if len(lengths):
+        counts = np.add.reduceat(valid, seg_starts, axis=1, dtype=np.int64)
+        np.copyto(values, 0.0, where=~valid)
+        sums = np.add.reduceat(values, seg_starts, axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = sums / counts
+        # 两遍法：先减去段均值再平方，避免大均值时 sumsq - sum²/n 的相消误差
+        values -= np.repeat(means, lengths, axis=1)
+        np.square(values, out=values)
+        np.copyto(values, 0.0, where=~valid)
+        ss = np.add.reduceat(values, seg_starts, axis=1).sum(axis=1)
+        units = (counts >= 2).sum(axis=1)
+        repeats = np.where(counts >= 2, counts, 0).sum(axis=1)
+        dof = np.maximum(counts - 1, 0).sum(axis=1)
+    else:
+        ss = np.zeros(m)
+        units = repeats = dof = np.zeros(m, dtype=np.int64)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        repeat_var = np.where(dof > 0, ss / np.maximum(dof, 1), np.nan)
+
+    # 整体方差与 compute_statistics 的 Std 相同（全部测量，ddof=0），逐列计算避免整块转换
+    total_var = np.array([np.nanvar(data_df[col].to_numpy(dtype=float)) if len(data_df) else np.nan
+                          for col in data_columns])
+    lsl, usl = get_spec_limits(data_columns, lsl_values, usl_values)
+    repeat_sigma = np.sqrt(repeat_var)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        var_share = np.where(total_var > 0, repeat_var / total_var, np.nan)
+        tolerance = usl - lsl
+        pct_tolerance = np.where(tolerance > 0, sigma_multiplier * repeat_sigma / tolerance, np.nan)
+    return pd.DataFrame({
+        'Items': data_columns,
+        'Units': units,
+        'Repeats': repeats,
+        'DOF': dof,
+        'RepeatSigma': repeat_sigma,
+        'TotalSigma': np.sqrt(total_var),
+        'VarShare': var_share,
+        'PctTolerance': pct_tolerance,
+    }, columns=REPEATABILITY_COLUMNS)
+
+def export_repeatability(table: pd.DataFrame, output_dir: str, writer=None) -> str:
+    """导出重复性分析：repeatability.xlsx（不导出合并的统计工作簿时使用）"""
+    return save_statistics_workbook([('重复性', table)], os.path.join(output_dir, REPEATABILITY_WORKBOOK_NAME),
+                                    writer)
@@ -0,0 +1,282 @@
+"""分析结果数据库
+
+每次分析的运行信息和每个数据列（整体及各分组）的统计量写入本地 SQLite 数据库，
+跨成百上千次运行查询某一列的趋势只需一次索引查询，不需要逐个打开输出目录中的
+工作簿。
+
+表结构:
+    runs: 每次分析一行（来源文件、输出目录、行数、超限数、数据时间范围等）
+    column_stats: 每次分析、每个范围（整体为空字符串，分组为组名）、每个数据列一行
+    run_items: 每次分析的数据列名和规格限
+    units: 每次分析、每个测量行一行（SN、Camera_S、时间、PASS/FAIL 和全部测量值），
+        按 SN 和 Camera_S 建索引，退回的单元只需一次索引查询即可找到历次运行中的全部测量
+
+批量运行时多个进程可能同时写入同一个数据库：使用 WAL 模式和等待超时，
+每次分析的所有统计行在一个事务中批量插入。
+"""
+import json
+import os
+import sqlite3
+import time
+from typing import Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+from .utils import get_output_dir
+from .data_processing import get_spec_limits
+
+# 可查询趋势的统计量
+METRICS = ('test', 'ng', 'rate', 'lsl', 'usl', 'mean', 'std', 'cpk')
+
+RESULTS_DB_NAME = 'results.sqlite'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created TEXT NOT NULL,
+    source TEXT NOT NULL,
+    source_name TEXT NOT NULL,
+    output_dir TEXT,
+    raw_rows INTEGER,
+    rows INTEGER,
+    columns INTEGER,
+    ng_total INTEGER,
+    elapsed REAL,
+    data_start TEXT,
+    data_end TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_runs_created ON runs (created);
+CREATE TABLE IF NOT EXISTS column_stats (
+    run_id INTEGER NOT NULL REFERENCES runs (id) ON DELETE CASCADE,
+    group_name TEXT NOT NULL,
+    item TEXT NOT NULL,
+    test INTEGER,
+    ng INTEGER,
+    rate REAL,
+    lsl REAL,
+    usl REAL,
+    mean REAL,
+    std REAL,
+    cpk REAL,
+    PRIMARY KEY (run_id, group_name, item)
+);
+CREATE INDEX IF NOT EXISTS idx_column_stats_item ON column_stats (item, group_name, run_id);
+CREATE TABLE IF NOT EXISTS run_items (
+    run_id INTEGER PRIMARY KEY REFERENCES runs (id) ON DELETE CASCADE,
+    items TEXT NOT NULL,
+    lsl BLOB,
+    usl BLOB
+);
+CREATE TABLE IF NOT EXISTS units (
+    run_id INTEGER NOT NULL REFERENCES runs (id) ON DELETE CASCADE,
+    row INTEGER NOT NULL,
+    sn TEXT NOT NULL,
+    camera_s TEXT,
+    time TEXT,
+    result TEXT,
+    fail_count INTEGER,
+    measurements BLOB,
+    PRIMARY KEY (run_id, row)
+);
+CREATE INDEX IF NOT EXISTS idx_units_sn ON units (sn);
+CREATE INDEX IF NOT EXISTS idx_units_camera_s ON units (camera_s);
+"""
+
+# 单元历史的列
+HISTORY_COLUMNS = ['run_id', 'row', 'created', 'source_name', 'time', 'sn', 'camera_s', 'result',
+                   'item', 'value', 'lsl', 'usl']
+
+def _float(value) -> Optional[float]:
+    return None if pd.isna(value) else float(value)
+
+def _text(values: pd.Series) -> List[Optional[str]]:
+    """转换为字符串列表，空值为None"""
+    return values.astype(str).where(values.notna(), None).tolist()
+
+def _unit_rows(run_id: int, df: pd.DataFrame, prepared: tuple, data_columns: Sequence[str], unit_yield):
+    """units 表的行：测量值按行存为 float64 的二进制块（列名和规格限每次运行只存一次）"""
+    data_df = prepared[0]
+    index = data_df.index
+    values = np.ascontiguousarray(data_df[list(data_columns)].to_numpy(dtype=np.float64))
+    camera_s = _text(df.loc[index, 'Camera_S']) if 'Camera_S' in df.columns else [None] * len(index)
+    if 'Time' in df.columns:
+        # datetime_as_string 是向量化的，比逐个 strftime 快一个数量级
+        times = pd.to_datetime(df.loc[index, 'Time'], errors='coerce').to_numpy()
+        times = np.where(np.isnat(times), None,
+                         np.datetime_as_string(times.astype('datetime64[s]'))).tolist()
+    else:
+        times = [None] * len(index)
+    fail_count = unit_yield.fail_count.tolist()
+    return zip([run_id] * len(index), range(len(index)), _text(data_df['SN']),
+               camera_s, times, ['FAIL' if count else 'PASS' for count in fail_count],
+               fail_count, [row.tobytes() for row in values])
+
+class ResultsStore:
+    """分析结果数据库
+
+    Args:
+        db_path: 数据库文件路径，不存在时自动创建
+    """
+    def __init__(self, db_path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.db_path = db_path
+        # 批量运行时其它进程可能正在写入，等待而不是立即报错
+        self.conn = sqlite3.connect(db_path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        self.conn.executescript(_SCHEMA)
+        self.conn.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def record_run(self, result, tables: Iterable[Tuple[Optional[str], pd.DataFrame]],
+                   data_range: Tuple[Optional[str], Optional[str]] = (None, None),
+                   units: Optional[tuple] = None) -> int:
+        """记录一次分析
+        Args:
+            result: AnalysisResult
+            tables: (分组名, 统计表) 列表，整体数据的分组名为None，
+                统计表为 compute_statistics 的结果
+            data_range: 数据中 Time 列的最早和最晚时间（ISO格式）
+            units: (清理后的数据, preprocess_data 的结果, 数据列, UnitYield)，提供时写入单元追溯索引
+        Returns:
+            int: 运行编号
+        """
+        with self.conn:
+            cursor = self.conn.execute(
+                "INSERT INTO runs (created, source, source_name, output_dir, raw_rows, rows,"
+                " columns, ng_total, elapsed, data_start, data_end)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (time.strftime('%Y-%m-%dT%H:%M:%S'), os.path.abspath(result.data_path),
+                 os.path.basename(result.data_path), result.output_dir, result.raw_rows,
+                 result.rows, result.columns, result.ng_total, result.elapsed, *data_range))
+            run_id = cursor.lastrowid
+            self.conn.executemany(
+                "INSERT INTO column_stats VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                ((run_id, group or '', item, int(test), int(ng), _float(rate), _float(lsl),
+                  _float(usl), _float(mean), _float(std), _float(cpk))
+                 for group, table in tables
+                 for item, test, ng, rate, lsl, usl, mean, std, cpk
+                 in table.itertuples(index=False, name=None)))
+            if units is not None:
+                df, prepared, data_columns, unit_yield = units
+                lsl, usl = get_spec_limits(list(data_columns), prepared[1], prepared[2])
+                self.conn.execute("INSERT INTO run_items VALUES (?, ?, ?, ?)",
+                                  (run_id, json.dumps(list(data_columns), ensure_ascii=False),
+                                   lsl.tobytes(), usl.tobytes()))
+                self.conn.executemany("INSERT INTO units VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                                      _unit_rows(run_id, df, prepared, data_columns, unit_yield))
+        return run_id
+
+    def unit_tests(self, key: str) -> pd.DataFrame:
+        """查询某个单元在历次运行中的测试记录（不含测量值）
+        Args:
+            key: SN 或 Camera_S
+        Returns:
+            pd.DataFrame: run_id、row、created、source_name、time、sn、camera_s、result、fail_count，按测试时间排序；
+                (run_id, row) 唯一确定一次测试
+        """
+        return pd.read_sql_query(
+            "SELECT u.run_id, u.row, r.created, r.source_name, u.time, u.sn, u.camera_s, u.result, u.fail_count"
+            " FROM units u JOIN runs r ON r.id = u.run_id WHERE u.sn = ? OR u.camera_s = ?"
+            " ORDER BY u.time, u.run_id, u.row", self.conn, params=(key, key))
+
+    def unit_history(self, key: str) -> pd.DataFrame:
+        """查询某个单元在历次运行中的全部测量值
+        Args:
+            key: SN 或 Camera_S
+        Returns:
+            pd.DataFrame: 列为 HISTORY_COLUMNS，每次测试、每个数据列一行，按测试时间和数据列顺序排列；
+                (run_id, row) 唯一确定一次测试（同一次运行中同一SN、同一时间的重复测试也能区分）
+        """
+        rows = self.conn.execute(
+            "SELECT u.run_id, u.row, r.created, r.source_name, u.time, u.sn, u.camera_s, u.result,"
+            " u.measurements, i.items, i.lsl, i.usl"
+            " FROM units u JOIN runs r ON r.id = u.run_id JOIN run_items i ON i.run_id = u.run_id"
+            " WHERE u.sn = ? OR u.camera_s = ? ORDER BY u.time, u.run_id, u.row", (key, key)).fetchall()
+        frames = []
+        for run_id, row, created, source_name, test_time, sn, camera_s, result, measurements, items, lsl, usl in rows:
+            items = json.loads(items)
+            frames.append(pd.DataFrame({
+                'run_id': run_id, 'row': row, 'created': created, 'source_name': source_name, 'time': test_time,
+                'sn': sn, 'camera_s': camera_s, 'result': result, 'item': items,
+                'value': np.frombuffer(measurements, dtype=np.float64),
+                'lsl': np.frombuffer(lsl, dtype=np.float64),
+                'usl': np.frombuffer(usl, dtype=np.float64),
+            }, columns=HISTORY_COLUMNS))
+        if not frames:
+            return pd.DataFrame(columns=HISTORY_COLUMNS)
+        return pd.concat(frames, ignore_index=True)
+
+    def trend(self, item: str, metric: str = 'cpk', group: Optional[str] = None,
+              since: Optional[str] = None, until: Optional[str] = None,
+              source: Optional[str] = None) -> pd.DataFrame:
+        """查询某个数据列的统计量随运行的变化
+        Args:
+            item: 数据列名
+            metric: 统计量（METRICS 之一）
+            group: 分组名，为None时查询整体数据
+            since: 只包含该时间（含）之后的运行，ISO格式，如 '2024-06-01'
+            until: 只包含该时间之前的运行
+            source: 只包含来源文件名匹配该模式的运行（SQL LIKE，如 'LineB%'）
+        Returns:
+            pd.DataFrame: run_id、created、source_name、data_start、data_end 和该统计量，按时间排序
+        Raises:
+            ValueError: 统计量不支持时
+        """
+        if metric not in METRICS:
+            raise ValueError(f"不支持的统计量: {metric}（可选: {', '.join(METRICS)}）")
+        sql = (f"SELECT r.id AS run_id, r.created, r.source_name, r.data_start, r.data_end,"
+               f" s.{metric} FROM column_stats s JOIN runs r ON r.id = s.run_id"
+               f" WHERE s.item = ? AND s.group_name = ?")
+        params: List[object] = [item, group or '']
+        if since:
+            sql += " AND r.created >= ?"
+            params.append(since)
+        if until:
+            sql += " AND r.created < ?"
+            params.append(until)
+        if source:
+            sql += " AND r.source_name LIKE ?"
+            params.append(source)
+        sql += " ORDER BY r.created, r.id"
+        return pd.read_sql_query(sql, self.conn, params=params)
+
+    def items(self) -> List[str]:
+        """数据库中出现过的全部数据列"""
+        return [row[0] for row in self.conn.execute(
+            "SELECT DISTINCT item FROM column_stats ORDER BY item")]
+
+    def groups(self, item: Optional[str] = None) -> List[str]:
+        """数据库中出现过的分组名（不含整体数据）"""
+        sql = "SELECT DISTINCT group_name FROM column_stats WHERE group_name != ''"
+        params: Sequence[object] = ()
+        if item:
+            sql += " AND item = ?"
+            params = (item,)
+        return [row[0] for row in self.conn.execute(sql + " ORDER BY group_name", params)]
+
+    def runs(self, limit: int = 50) -> pd.DataFrame:
+        """最近的运行记录"""
+        return pd.read_sql_query("SELECT * FROM runs ORDER BY created DESC, id DESC LIMIT ?",
+                                 self.conn, params=(limit,))
+
+    def close(self) -> None:
+        self.conn.close()
+
+def get_results_db_path(data_path: str, config: object) -> Optional[str]:
+    """根据配置确定结果数据库路径，未启用时返回None
+
+    OUTPUT['results_db'] 为True时使用输出子文件夹下的 results.sqlite，
+    为路径时使用该路径。
+    """
+    db_path = config.OUTPUT.get('results_db', False)
+    if not db_path:
+        return None
+    if db_path is True:
+        # 默认放在输出子文件夹下，同一数据目录的多次运行共享
+        return os.path.join(os.path.dirname(get_output_dir(data_path)), RESULTS_DB_NAME)
+    return db_path
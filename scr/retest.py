@@ -0,0 +1,177 @@
+"""复测分析
+
+同一个 SN 出现多次时为复测。按 (SN, Time) 排序一次后，每个 SN 是排序数据中的一段连续行
+（段索引：pd.factorize 哈希编码 SN，np.lexsort 排序，相邻编码变化处为段起点），
+段的第一行为首次测试、最后一行为最终测试，由此得到：
+    - 直通率（首次测试通过的单元数 / 单元数）和最终良率（最终测试通过的单元数 / 单元数）
+    - 复测次数分布（每种复测次数的单元数和其中最终通过的单元数）
+    - 每个数据列的复测挽回数（首次测试该项超限、最终测试该项通过的单元数）
+
+超限判定与单元良率相同（calculate_fail_matrix），全部为段起止行上的矩阵运算，不需要按 SN 循环。
+"""
+import os
+from dataclasses import dataclass
+from typing import List, Sequence
+import numpy as np
+import pandas as pd
+from .data_processing import calculate_fail_matrix
+from .statistics_export import save_statistics_workbook, add_sheet_or_csv
+from .instrument import traced
+
+RETEST_WORKBOOK_NAME = 'retest.xlsx'
+
+@dataclass
+class RetestResult:
+    """复测分析结果，每个单元（SN）一项，按SN的首次出现顺序
+
+    first_item_ng / final_item_ng 为首次、最终测试中每个数据列的超限单元数，
+    recovered 为每个数据列首次超限、最终通过的单元数。
+    """
+    sn: np.ndarray
+    data_columns: List[str]
+    tests: np.ndarray
+    first_failed: np.ndarray
+    final_failed: np.ndarray
+    first_item_ng: np.ndarray
+    final_item_ng: np.ndarray
+    recovered: np.ndarray
+
+    @property
+    def units(self) -> int:
+        return len(self.tests)
+
+    @property
+    def retested_units(self) -> int:
+        return int((self.tests > 1).sum())
+
+    @property
+    def first_pass_yield(self) -> float:
+        """直通率（0-1），没有单元时为0"""
+        return float((~self.first_failed).sum()) / self.units if self.units else 0.0
+
+    @property
+    def final_yield(self) -> float:
+        """最终良率（0-1），没有单元时为0"""
+        return float((~self.final_failed).sum()) / self.units if self.units else 0.0
+
+    def summary(self) -> pd.DataFrame:
+        """汇总表：测试数、单元数、复测单元数、直通率和最终良率"""
+        return pd.DataFrame({
+            'Tests': [int(self.tests.sum())],
+            'Units': [self.units],
+            'Retested': [self.retested_units],
+            'FirstPass': [int((~self.first_failed).sum())],
+            'FinalPass': [int((~self.final_failed).sum())],
+            'FPY': [self.first_pass_yield],
+            'FinalYield': [self.final_yield],
+        })
+
+    def distribution(self) -> pd.DataFrame:
+        """复测次数分布：每种复测次数（测试数 - 1）一行"""
+        retests = self.tests - 1
+        units = np.bincount(retests) if self.units else np.zeros(0, dtype=np.int64)
+        final_pass = np.bincount(retests, weights=~self.final_failed, minlength=len(units)).astype(np.int64)
+        present = np.flatnonzero(units)
+        return pd.DataFrame({
+            'Retests': present,
+            'Units': units[present],
+            'Share': units[present] / self.units if self.units else np.zeros(len(present)),
+            'FinalPass': final_pass[present],
+        })
+
+    def item_table(self) -> pd.DataFrame:
+        """每个数据列一行：首次、最终测试的超限单元数和复测挽回的单元数"""
+        return pd.DataFrame({
+            'Items': self.data_columns,
+            'FirstNG': self.first_item_ng,
+            'FinalNG': self.final_item_ng,
+            'Recovered': self.recovered,
+            'RecoveryRate': np.divide(self.recovered, self.first_item_ng,
+                                      out=np.zeros(len(self.data_columns)),
+                                      where=self.first_item_ng > 0),
+        })
+
+    def unit_table(self) -> pd.DataFrame:
+        """每个单元一行：SN、测试数、首次和最终测试结果"""
+        return pd.DataFrame({
+            'SN': self.sn,
+            'Tests': self.tests,
+            'FirstResult': np.where(self.first_failed, 'FAIL', 'PASS'),
+            'FinalResult': np.where(self.final_failed, 'FAIL', 'PASS'),
+        })
+
+def segment_index(sn: np.ndarray, times: np.ndarray = None):
+    """按 (SN, Time) 排序的段索引
+    Args:
+        sn: 每行的SN
+        times: 每行的时间（datetime64），为None时同一SN内按行顺序
+    Returns:
+        (order, starts, ends)：排序后的行位置，以及每个SN的段在 order 中的起止位置（ends 不含）；
+            各段按SN的首次出现顺序排列，时间相同时保持行顺序，无法解析的时间视为最早，
+            空SN的行不属于任何段
+    """
+    codes = pd.factorize(sn)[0]
+    if times is None:
+        order = np.argsort(codes, kind='stable')
+    else:
+        # NaT 的整数值最小，排在同一SN的最前面
+        order = np.lexsort((times.view(np.int64), codes))
+    # 空SN（编码为-1）排在最前面，不属于任何单元
+    order = order[np.searchsorted(codes[order], 0):]
+    sorted_codes = codes[order]
+    boundary = np.empty(len(order), dtype=bool)
+    boundary[:1] = True
+    np.not_equal(sorted_codes[1:], sorted_codes[:-1], out=boundary[1:])
+    starts = np.flatnonzero(boundary)
+    ends = np.r_[starts[1:], len(order)].astype(np.intp)
+    return order, starts, ends
+
+@traced('compute_retest', 'stats')
+def compute_retest(df: pd.DataFrame, prepared: tuple, data_columns: Sequence[str]) -> RetestResult:
+    """计算直通率、最终良率、复测次数分布和每列的复测挽回数
+    Args:
+        df: 清理后的数据（含 Time 列时同一SN按时间排序）
+        prepared: preprocess_data 的结果
+        data_columns: 数据列
+    Returns:
+        RetestResult
+    """
+    data_df, lsl_values, usl_values = prepared
+    data_columns = list(data_columns)
+    times = None
+    if 'Time' in df.columns:
+        times = pd.to_datetime(df.loc[data_df.index, 'Time'], errors='coerce').to_numpy()
+    else:
+        print("警告: 没有 Time 列，同一SN的测试按数据行的顺序排列")
+    sn = data_df['SN'].to_numpy()
+    order, starts, ends = segment_index(sn, times)
+    first_rows = order[starts]
+    final_rows = order[ends - 1]
+
+    fails = calculate_fail_matrix(data_df, data_columns, lsl_values, usl_values)
+    first_fails = fails[first_rows]
+    final_fails = fails[final_rows]
+    return RetestResult(
+        sn=sn[first_rows],
+        data_columns=data_columns,
+        tests=(ends - starts).astype(np.int64),
+        first_failed=first_fails.any(axis=1),
+        final_failed=final_fails.any(axis=1),
+        first_item_ng=first_fails.sum(axis=0),
+        final_item_ng=final_fails.sum(axis=0),
+        recovered=(first_fails & ~final_fails).sum(axis=0),
+    )
+
+def export_retest(result: RetestResult, output_dir: str, writer=None) -> List[str]:
+    """导出复测分析：retest.xlsx（工作表“汇总”、“复测次数”、“数据列”和“单元”）
+
+    单元数超过Excel的行数上限时，“单元”改为写入 retest_units.csv。
+    Returns:
+        List[str]: 写出的文件路径
+    """
+    units = result.unit_table()
+    sheets = [('汇总', result.summary()), ('复测次数', result.distribution()),
+              ('数据列', result.item_table())]
+    csv_path = add_sheet_or_csv(sheets, '单元', units, os.path.join(output_dir, 'retest_units.csv'), writer)
+    path = save_statistics_workbook(sheets, os.path.join(output_dir, RETEST_WORKBOOK_NAME), writer)
+    return [path] + ([csv_path] if csv_path else [])
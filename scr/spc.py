@@ -0,0 +1,299 @@
+"""SPC控制图
+
+按 Time 排序后为每个数据列计算控制图：
+    - X̄-R / X̄-S：连续 subgroup_size 行为一个子组
+    - I-MR：单值和移动极差（subgroup_size 为1时）
+
+所有数据列一次性计算：测量数据为 行数 x 列数 的矩阵，子组通过 reshape 得到
+（子组数, 子组大小, 列数）的视图，不复制数据；Western Electric 判异规则把错开的
+布尔矩阵累加得到滑动窗口内的点数，整体复杂度为 O(n)，没有按列或按点的Python循环。
+
+判异规则（σ 为控制图的标准差估计）:
+    1. 1个点超出 3σ
+    2. 连续3个点中有2个在中心线同一侧且超出 2σ
+    3. 连续5个点中有4个在中心线同一侧且超出 1σ
+    4. 连续8个点在中心线同一侧
+"""
+import io
+import os
+import math
+import warnings
+from dataclasses import dataclass, field
+from typing import Dict, List, Sequence, Tuple
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+from .instrument import TRACER, traced
+from .output_writer import write_output_bytes
+
+# 子组大小 n -> (d2, d3)，用于极差图的控制限
+_D2_D3 = {
+    2: (1.128, 0.853), 3: (1.693, 0.888), 4: (2.059, 0.880), 5: (2.326, 0.864),
+    6: (2.534, 0.848), 7: (2.704, 0.833), 8: (2.847, 0.820), 9: (2.970, 0.808),
+    10: (3.078, 0.797), 11: (3.173, 0.787), 12: (3.258, 0.778), 13: (3.336, 0.770),
+    14: (3.407, 0.763), 15: (3.472, 0.756), 16: (3.532, 0.750), 17: (3.588, 0.744),
+    18: (3.640, 0.739), 19: (3.689, 0.734), 20: (3.735, 0.729), 21: (3.778, 0.724),
+    22: (3.819, 0.720), 23: (3.858, 0.716), 24: (3.895, 0.712), 25: (3.931, 0.708),
+}
+
+CHART_NAMES = {'xbar_r': 'X̄-R', 'xbar_s': 'X̄-S', 'imr': 'I-MR'}
+
+# 规则编号 -> (窗口长度, 窗口内至少的点数, 阈值σ倍数)
+WESTERN_ELECTRIC_RULES = {1: (1, 1, 3.0), 2: (3, 2, 2.0), 3: (5, 4, 1.0), 4: (8, 8, 0.0)}
+
+def _c4(n: int) -> float:
+    return math.sqrt(2.0 / (n - 1)) * math.exp(math.lgamma(n / 2) - math.lgamma((n - 1) / 2))
+
+def resolve_chart(chart: str, subgroup_size: int) -> str:
+    """确定控制图类型：'auto' 时子组大小为1用 I-MR，不超过10用 X̄-R，否则用 X̄-S"""
+    if subgroup_size <= 1:
+        return 'imr'
+    if chart == 'auto':
+        return 'xbar_r' if subgroup_size <= 10 else 'xbar_s'
+    if chart not in CHART_NAMES:
+        raise ValueError(f"不支持的控制图类型: {chart}")
+    if chart == 'xbar_r' and subgroup_size not in _D2_D3:
+        raise ValueError(f"X̄-R 图的子组大小必须在2到25之间: {subgroup_size}")
+    return chart
+
+@dataclass
+class ControlCharts:
+    """所有数据列的控制图数据（列维度对应 columns）"""
+    columns: List[str]
+    chart: str
+    subgroup_size: int
+    x: np.ndarray               # 每个点的时间（子组的最后一个时间）或序号
+    center: np.ndarray          # (点数, 列数) X̄ 或单值
+    spread: np.ndarray          # (点数, 列数) R、S 或移动极差（第一个点为NaN）
+    cl: np.ndarray              # 以下为每列的控制限
+    ucl: np.ndarray
+    lcl: np.ndarray
+    spread_cl: np.ndarray
+    spread_ucl: np.ndarray
+    spread_lcl: np.ndarray
+    violations: Dict[int, np.ndarray] = field(default_factory=dict)  # 规则编号 -> (点数, 列数) 布尔矩阵
+
+    def column_index(self, col: str) -> int:
+        return self.columns.index(col)
+
+    def column_frame(self, col: str) -> pd.DataFrame:
+        """一个数据列的控制图点（时间、中心值、离散度），用于计算缓存键"""
+        j = self.column_index(col)
+        return pd.DataFrame({'x': self.x, 'center': self.center[:, j], 'spread': self.spread[:, j]})
+
+    def any_violation(self) -> np.ndarray:
+        """(点数, 列数) 任一规则判异的点"""
+        flags = np.zeros(self.center.shape, dtype=bool)
+        for mask in self.violations.values():
+            flags |= mask
+        return flags
+
+def _window_count(mask: np.ndarray, window: int) -> np.ndarray:
+    """每个点及其之前共 window 个点中为True的个数（沿第0维）
+
+    窗口很短（不超过8），把错开 1..window-1 行的布尔矩阵依次累加，每次都是连续
+    内存上的一次向量加法；比沿第0维做累积和再相减快一个数量级。
+    """
+    counts = mask.astype(np.uint8)
+    for shift in range(1, min(window, len(mask))):
+        counts[shift:] += mask[:-shift]
+    return counts
+
+def western_electric(points: np.ndarray, cl: np.ndarray, sigma: np.ndarray,
+                     rules: Sequence[int] = (1, 2, 3, 4)) -> Dict[int, np.ndarray]:
+    """对所有列同时应用 Western Electric 判异规则
+    Args:
+        points: (点数, 列数) 控制图上的点
+        cl: 每列的中心线
+        sigma: 每列的标准差估计（点的标准差，不是单个测量值的）
+        rules: 启用的规则编号
+    Returns:
+        Dict[int, np.ndarray]: 规则编号 -> (点数, 列数) 布尔矩阵，标记触发规则的点
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z = (points - cl) / sigma
+    flags = {}
+    for rule in rules:
+        window, required, limit = WESTERN_ELECTRIC_RULES[rule]
+        upper = z > limit
+        lower = z < -limit
+        if window == 1:
+            flags[rule] = upper | lower
+            continue
+        flags[rule] = ((upper & (_window_count(upper, window) >= required))
+                       | (lower & (_window_count(lower, window) >= required)))
+    return flags
+
+def compute_control_charts(values: np.ndarray, columns: Sequence[str], x: np.ndarray,
+                           chart: str = 'auto', subgroup_size: int = 5,
+                           rules: Sequence[int] = (1, 2, 3, 4)) -> ControlCharts:
+    """计算所有列的控制图
+    Args:
+        values: (行数, 列数) 按时间排序的测量数据
+        columns: 列名
+        x: 每行的时间或序号
+        chart: 'auto'、'xbar_r'、'xbar_s' 或 'imr'
+        subgroup_size: 子组大小（I-MR 图忽略）
+        rules: 启用的判异规则
+    Returns:
+        ControlCharts
+    """
+    chart = resolve_chart(chart, subgroup_size)
+    values = np.ascontiguousarray(values, dtype=float)
+    with warnings.catch_warnings():
+        # 全为空值的子组或列得到NaN，不需要警告
+        warnings.simplefilter('ignore', RuntimeWarning)
+        if chart == 'imr':
+            n = 1
+            center = values
+            spread = np.empty_like(values)
+            spread[:1] = np.nan
+            np.abs(np.diff(values, axis=0), out=spread[1:])
+            cl = np.nanmean(values, axis=0)
+            spread_cl = np.nanmean(spread, axis=0)
+            sigma = spread_cl / _D2_D3[2][0]
+            ucl, lcl = cl + 3 * sigma, cl - 3 * sigma
+            d2, d3 = _D2_D3[2]
+            spread_ucl = spread_cl * (1 + 3 * d3 / d2)
+            spread_lcl = spread_cl * max(0.0, 1 - 3 * d3 / d2)
+            point_sigma = sigma
+            points_x = x
+        else:
+            n = subgroup_size
+            groups = len(values) // n
+            if groups == 0:
+                raise ValueError(f"数据行数 {len(values)} 少于子组大小 {n}")
+            # 不足一个子组的尾部数据不参与计算
+            subgroups = values[:groups * n].reshape(groups, n, values.shape[1])
+            center = np.nanmean(subgroups, axis=1)
+            cl = np.nanmean(center, axis=0)
+            if chart == 'xbar_r':
+                d2, d3 = _D2_D3[n]
+                spread = np.nanmax(subgroups, axis=1) - np.nanmin(subgroups, axis=1)
+                spread_cl = np.nanmean(spread, axis=0)
+                point_sigma = spread_cl / d2 / math.sqrt(n)
+                spread_ucl = spread_cl * (1 + 3 * d3 / d2)
+                spread_lcl = spread_cl * max(0.0, 1 - 3 * d3 / d2)
+            else:
+                c4 = _c4(n)
+                spread = np.nanstd(subgroups, axis=1, ddof=1)
+                spread_cl = np.nanmean(spread, axis=0)
+                point_sigma = spread_cl / c4 / math.sqrt(n)
+                factor = 3 * math.sqrt(1 - c4 ** 2) / c4
+                spread_ucl = spread_cl * (1 + factor)
+                spread_lcl = spread_cl * max(0.0, 1 - factor)
+            ucl, lcl = cl + 3 * point_sigma, cl - 3 * point_sigma
+            points_x = x[n - 1:groups * n:n]
+
+    with TRACER.span('western_electric', 'stats'):
+        violations = western_electric(center, cl, point_sigma, rules)
+    return ControlCharts(list(columns), chart, n, np.asarray(points_x), center, spread,
+                         cl, ucl, lcl, spread_cl, spread_ucl, spread_lcl, violations)
+
+def sort_by_time(df: pd.DataFrame, data_df: pd.DataFrame,
+                 data_columns: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """按 Time 列排序测量数据
+    Args:
+        df: 清理后的数据（含 Time 列）
+        data_df: preprocess_data 得到的测量数据
+        data_columns: 数据列
+    Returns:
+        (values, x)：(行数, 列数) 的测量矩阵和每行的时间；没有可用的 Time 列时
+        保持原有顺序，x 为序号
+    """
+    values = data_df[list(data_columns)].to_numpy(dtype=float)
+    if 'Time' not in df.columns:
+        print("警告: 没有 Time 列，控制图按数据行的顺序绘制")
+        return values, np.arange(1, len(values) + 1)
+    times = pd.to_datetime(df.loc[data_df.index, 'Time'], errors='coerce').to_numpy()
+    valid = ~np.isnat(times)
+    if not valid.all():
+        print(f"警告: {int((~valid).sum())} 行的 Time 无法解析，不参与控制图")
+        values, times = values[valid], times[valid]
+    # 稳定排序：相同时间的行保持原有顺序
+    order = np.argsort(times, kind='stable')
+    return values[order], times[order]
+
+@traced('compute_spc', 'stats')
+def compute_spc(df: pd.DataFrame, data_columns: Sequence[str], prepared: tuple,
+                config: object) -> ControlCharts:
+    """按 PLOT['spc'] 配置计算整体数据的控制图"""
+    spc_config = config.PLOT.get('spc', {})
+    values, x = sort_by_time(df, prepared[0], data_columns)
+    return compute_control_charts(values, data_columns, x,
+                                  spc_config.get('chart', 'auto'),
+                                  spc_config.get('subgroup_size', 5),
+                                  spc_config.get('rules', (1, 2, 3, 4)))
+
+def spc_summary(charts: ControlCharts) -> pd.DataFrame:
+    """每列的控制限和各规则的判异点数"""
+    summary = pd.DataFrame({
+        'Items': charts.columns,
+        'Chart': CHART_NAMES[charts.chart],
+        'Points': np.sum(~np.isnan(charts.center), axis=0),
+        'CL': charts.cl,
+        'UCL': charts.ucl,
+        'LCL': charts.lcl,
+        'Spread_CL': charts.spread_cl,
+        'Spread_UCL': charts.spread_ucl,
+        'Spread_LCL': charts.spread_lcl,
+    })
+    for rule, mask in sorted(charts.violations.items()):
+        summary[f'Rule{rule}'] = mask.sum(axis=0)
+    summary['Violations'] = charts.any_violation().sum(axis=0)
+    return summary
+
+def export_spc_summary(charts: ControlCharts, output_dir: str, writer=None) -> str:
+    """导出控制图汇总表 spc_summary.xlsx"""
+    path = os.path.join(output_dir, 'spc_summary.xlsx')
+    buffer = io.BytesIO()
+    with TRACER.span('to_excel', 'io'):
+        spc_summary(charts).to_excel(buffer, index=False)
+    write_output_bytes(path, buffer.getvalue(), writer)
+    return path
+
+def plot_control_chart(charts: ControlCharts, col: str, config: object) -> Figure:
+    """绘制一个数据列的控制图（上：X̄/单值，下：R/S/移动极差）"""
+    j = charts.column_index(col)
+    spc_config = config.PLOT.get('spc', {})
+    fig, (ax_center, ax_spread) = plt.subplots(2, 1, sharex=True,
+                                               figsize=spc_config.get('figsize', (15, 8)),
+                                               gridspec_kw={'height_ratios': [2, 1]})
+    center_name, spread_name = {'xbar_r': ('X̄', 'R'), 'xbar_s': ('X̄', 'S'),
+                                'imr': ('I', 'MR')}[charts.chart]
+    flags = charts.any_violation()[:, j]
+    x = charts.x
+
+    panels = ((ax_center, charts.center[:, j], charts.cl[j], charts.ucl[j], charts.lcl[j], center_name),
+              (ax_spread, charts.spread[:, j], charts.spread_cl[j], charts.spread_ucl[j],
+               charts.spread_lcl[j], spread_name))
+    for ax, points, cl, ucl, lcl, name in panels:
+        with TRACER.span('plot', 'plot'):
+            ax.plot(x, points, color='tab:blue', linewidth=0.8, marker='.', markersize=3)
+        ax.axhline(cl, color='green', linewidth=1)
+        ax.axhline(ucl, color='red', linestyle='--', linewidth=1)
+        ax.axhline(lcl, color='red', linestyle='--', linewidth=1)
+        ax.set_ylabel(name)
+        ax.text(1.002, ucl, f'UCL={ucl:.3f}', transform=ax.get_yaxis_transform(),
+                va='center', fontsize='small', color='red')
+        ax.text(1.002, cl, f'CL={cl:.3f}', transform=ax.get_yaxis_transform(),
+                va='center', fontsize='small', color='green')
+        ax.text(1.002, lcl, f'LCL={lcl:.3f}', transform=ax.get_yaxis_transform(),
+                va='center', fontsize='small', color='red')
+    if flags.any():
+        ax_center.scatter(x[flags], charts.center[flags, j], color='red', zorder=3, s=20,
+                          label='判异点')
+        ax_center.legend(loc='upper left')
+
+    title = f'{col} {CHART_NAMES[charts.chart]}'
+    if charts.chart != 'imr':
+        title += f' (n={charts.subgroup_size})'
+    if config.PLOT.get('title_prefix'):
+        title = f"{config.PLOT['title_prefix']} {title}"
+    rule_counts = '  '.join(f'R{rule}:{int(mask[:, j].sum())}'
+                            for rule, mask in sorted(charts.violations.items()))
+    ax_center.set_title(f'{title}    判异 {int(flags.sum())}  {rule_counts}')
+    with TRACER.span('tight_layout', 'layout'):
+        fig.tight_layout()
+    return fig
@@ -0,0 +1,167 @@
+"""规格限假设分析
+
+“如果把某列的 LSL 改为 32，良率和 CPK 会是多少？”不需要修改规格行重新运行分析：
+每个数据列的测量值按分组排列后在组内排序一次，之后任意候选 LSL/USL 的超限数由
+searchsorted 在每个分组的有序段上得到（O(log n)），均值和标准差与规格限无关，也只计算一次，
+CPK 由它们直接算出。
+
+超限判定与 calculate_out_of_spec_column 相同（小于 LSL 或大于 USL，空值不算超限），
+Test 为行数、Rate 为 NG / Test，与统计导出一致；CPK 与 calculate_cpk 相同，
+因此 Std 为样本标准差（统计导出的 Std 为总体标准差）。
+这里的 Yield 为单列的合格比例（1 - Rate）：单元良率取决于每个单元在所有列上的结果，不能由排序后的单列得到。
+"""
+import math
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+from .data_processing import add_group_key, GROUP_KEY_SEPARATOR
+from .instrument import traced
+
+# 整体数据的范围名
+OVERALL_SCOPE = '整体'
+
+WHATIF_COLUMNS = ['Items', 'Group', 'Test', 'NG', 'Rate', 'Yield', 'LSL', 'USL', 'Mean', 'Std', 'CPK']
+
+def _limit(value) -> Optional[float]:
+    """规格限转换为 float，空值为None（没有该侧规格限）"""
+    if value is None:
+        return None
+    value = float(value)
+    return None if math.isnan(value) else value
+
+def _cpk(mean: np.ndarray, std: np.ndarray, lsl: Optional[float], usl: Optional[float]) -> np.ndarray:
+    """与 calculate_cpk 相同：没有规格限或标准差为0时为NaN，只有一侧规格限时为单侧能力指数"""
+    if lsl is None and usl is None:
+        return np.full(len(mean), np.nan)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cpu = (usl - mean) / (3 * std) if usl is not None else np.full(len(mean), np.inf)
+        cpl = (mean - lsl) / (3 * std) if lsl is not None else np.full(len(mean), np.inf)
+        cpk = np.minimum(cpu, cpl)
+    return np.where(std > 0, cpk, np.nan)
+
+class SpecWhatIf:
+    """预排序的规格限假设分析
+
+    Args:
+        df: 清理后的数据（含分组列）
+        prepared: preprocess_data 的结果
+        data_columns: 数据列
+        group_columns: 分组列，为空时只计算整体
+    """
+    @traced('SpecWhatIf', 'stats')
+    def __init__(self, df: pd.DataFrame, prepared: tuple, data_columns: Sequence[str],
+                 group_columns: Optional[Sequence[str]] = None):
+        data_df, lsl_values, usl_values = prepared
+        self.data_columns = list(data_columns)
+        self._position = {col: j for j, col in enumerate(self.data_columns)}
+        self.lsl_values = lsl_values
+        self.usl_values = usl_values
+        n, m = len(data_df), len(self.data_columns)
+
+        # 分组编码：没有分组（或分组值为空）的行放在最后一段，只计入整体
+        codes = np.zeros(n, dtype=np.int64)
+        self.groups: List[str] = []
+        if group_columns and all(col in df.columns for col in group_columns):
+            key = GROUP_KEY_SEPARATOR.join(group_columns)
+            labels = add_group_key(df.loc[data_df.index, list(group_columns)], list(group_columns), key)[key]
+            codes, names = pd.factorize(labels, sort=True)
+            self.groups = [str(name) for name in names]
+            codes = np.where(codes < 0, len(names), codes)
+        segments = max(len(self.groups), 1) + (1 if self.groups and (codes == len(self.groups)).any() else 0)
+        order = np.argsort(codes, kind='stable')
+        self._rows = np.bincount(codes, minlength=segments)
+        self._starts = np.r_[0, np.cumsum(self._rows)[:-1]].astype(np.intp)
+
+        # （列数 x 行数）：每列按分组排列，组内升序，空值排在每段的末尾
+        self._sorted = np.empty((m, n), dtype=np.float64)
+        self._valid = np.zeros((m, segments), dtype=np.int64)
+        sums = np.zeros((m, segments))
+        squares = np.zeros((m, segments))
+        for j, col in enumerate(self.data_columns):
+            row = self._sorted[j]
+            row[:] = data_df[col].to_numpy(dtype=np.float64)[order]
+            for g, (start, rows) in enumerate(zip(self._starts, self._rows)):
+                segment = row[start:start + rows]
+                segment.sort()
+                # 排序时空值视为最大，第一个空值的位置即有效值的个数
+                valid = int(np.searchsorted(segment, np.nan))
+                values = segment[:valid]
+                self._valid[j, g] = valid
+                if valid:
+                    sums[j, g] = values.sum()
+                    squares[j, g] = np.square(values - sums[j, g] / valid).sum()
+
+        # 分组和整体的均值、样本标准差（整体由各段合并：段内平方和 + 段均值的离差平方和）
+        with np.errstate(invalid='ignore', divide='ignore'):
+            self._mean = sums / self._valid
+            self._std = np.sqrt(squares / (self._valid - 1))
+            total = self._valid.sum(axis=1)
+            overall_mean = sums.sum(axis=1) / total
+            between = (self._valid * np.square(np.nan_to_num(self._mean) - overall_mean[:, None])).sum(axis=1)
+            self._overall_mean = overall_mean
+            self._overall_std = np.sqrt((squares.sum(axis=1) + between) / (total - 1))
+
+    def limits(self, col: str) -> Tuple[Optional[float], Optional[float]]:
+        """数据中的原始规格限 (LSL, USL)，没有时为None"""
+        lsl = _limit(self.lsl_values[col]) if self.lsl_values is not None else None
+        usl = _limit(self.usl_values[col]) if self.usl_values is not None else None
+        return lsl, usl
+
+    def ng_counts(self, col: str, lsl=None, usl=None) -> np.ndarray:
+        """每个分组段在候选规格限下的超限数（每段两次 searchsorted）"""
+        j = self._position[col]
+        lsl, usl = _limit(lsl), _limit(usl)
+        row = self._sorted[j]
+        counts = np.zeros(len(self._rows), dtype=np.int64)
+        for g, start in enumerate(self._starts):
+            segment = row[start:start + self._valid[j, g]]
+            if lsl is not None:
+                counts[g] += np.searchsorted(segment, lsl, side='left')
+            if usl is not None:
+                counts[g] += len(segment) - np.searchsorted(segment, usl, side='right')
+        return counts
+
+    def evaluate(self, col: str, lsl=None, usl=None) -> pd.DataFrame:
+        """候选规格限下某列的整体和各分组结果
+        Args:
+            col: 数据列
+            lsl: 候选下限，None 或 NaN 表示没有下限
+            usl: 候选上限，None 或 NaN 表示没有上限
+        Returns:
+            pd.DataFrame: 列为 WHATIF_COLUMNS，第一行为整体，其后为各分组
+        """
+        j = self._position[col]
+        lsl, usl = _limit(lsl), _limit(usl)
+        counts = self.ng_counts(col, lsl, usl)
+        groups = len(self.groups)
+        test = np.r_[self._rows.sum(), self._rows[:groups]]
+        ng = np.r_[counts.sum(), counts[:groups]]
+        mean = np.r_[self._overall_mean[j], self._mean[j, :groups]]
+        std = np.r_[self._overall_std[j], self._std[j, :groups]]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            rate = np.where(test > 0, ng / np.maximum(test, 1), 0.0)
+        return pd.DataFrame({
+            'Items': col,
+            'Group': [OVERALL_SCOPE] + self.groups,
+            'Test': test,
+            'NG': ng,
+            'Rate': rate,
+            'Yield': 1 - rate,
+            'LSL': np.full(len(test), np.nan if lsl is None else lsl),
+            'USL': np.full(len(test), np.nan if usl is None else usl),
+            'Mean': mean,
+            'Std': std,
+            'CPK': _cpk(mean, std, lsl, usl),
+        }, columns=WHATIF_COLUMNS)
+
+    def evaluate_all(self, limits: Optional[Dict[str, Tuple[Optional[float], Optional[float]]]] = None
+                     ) -> pd.DataFrame:
+        """所有数据列的结果
+        Args:
+            limits: {列名: (LSL, USL)}，未列出的列使用原始规格限
+        Returns:
+            pd.DataFrame: 列为 WHATIF_COLUMNS，每列、每个范围（整体和各分组）一行
+        """
+        limits = limits or {}
+        return pd.concat([self.evaluate(col, *limits.get(col, self.limits(col)))
+                          for col in self.data_columns], ignore_index=True)
@@ -0,0 +1,244 @@
+"""类型化的统计数据导出
+
+统计量以数值类型保存（Mean、Std、CPK 为浮点数，Rate 为比例），写入Excel时通过
+单元格的数字格式控制显示位数，下游工具不需要再解析字符串。
+
+整体和各分组的统计写入同一个工作簿（每个范围一个工作表），使用 openpyxl 的
+只写模式逐行写出：已写出的行暂存在临时文件中，不保留单元格对象。同步写出时
+工作簿直接保存到目标文件；异步写出时需要先把整个工作簿序列化为字节再交给后台
+写盘，内存占用与文件大小相当。可选地同时导出一个长表格式的CSV或Parquet文件
+（Group 列为分组名，整体数据为空），便于程序读取。
+"""
+import io
+import os
+import re
+from typing import List, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+from .data_processing import calculate_cpk, calculate_out_of_spec_column
+from .instrument import TRACER
+from .output_writer import write_output_bytes
+
+# 统计表的列
+STAT_COLUMNS = ['Items', 'Test', 'NG', 'Rate', 'LSL', 'USL', 'Mean', 'Std', 'CPK']
+
+# 各列在Excel中的数字格式
+NUMBER_FORMATS = {
+    'Test': '0',
+    'NG': '0',
+    'Rate': '0.00%',
+    'LSL': 'General',
+    'USL': 'General',
+    'Mean': '0.000',
+    'Std': '0.000',
+    'CPK': '0.000',
+    'MinCPK': '0.000',
+    'MedianCPK': '0.000',
+    'Units': '0',
+    'Pass': '0',
+    'Fail': '0',
+    'Yield': '0.00%',
+    'Share': '0.00%',
+    'CumShare': '0.00%',
+    'Tests': '0',
+    'Retested': '0',
+    'FirstPass': '0',
+    'FinalPass': '0',
+    'FPY': '0.00%',
+    'FinalYield': '0.00%',
+    'RecoveryRate': '0.00%',
+    'Repeats': '0',
+    'DOF': '0',
+    'RepeatSigma': '0.0000',
+    'TotalSigma': '0.0000',
+    'VarShare': '0.00%',
+    'PctTolerance': '0.00%',
+}
+
+# 各列在Excel中的宽度
+COLUMN_WIDTHS = {'Items': 28, 'Group': 16, 'Bucket': 18, 'Start': 20, 'End': 20}
+
+WORKBOOK_NAME = 'statistics.xlsx'
+
+# Excel 单个工作表的最大数据行数（不含表头）
+EXCEL_MAX_ROWS = 1048575
+
+def compute_statistics(prepared: tuple, data_columns: Sequence[str],
+                       count_valid: bool = False) -> pd.DataFrame:
+    """计算每个数据列的统计量
+    Args:
+        prepared: preprocess_data 的结果 (data_df, lsl_values, usl_values)
+        data_columns: 数据列
+        count_valid: Test 只统计非空值（排除异常值时被排除的值为空，不计入测试数）；
+            默认统计全部行
+    Returns:
+        pd.DataFrame: 列为 STAT_COLUMNS，Test/NG 为整数，Rate 为比例（0-1），
+            缺少规格限或无法计算的值为NaN
+    """
+    data_df, lsl_values, usl_values = prepared
+    rows = []
+    for col in data_columns:
+        data = data_df[col].astype(float)
+        lsl = float(lsl_values[col]) if lsl_values is not None else None
+        usl = float(usl_values[col]) if usl_values is not None else None
+
+        count = int(data.count()) if count_valid else len(data)
+        out_of_spec = int(calculate_out_of_spec_column(data, lsl, usl))
+        cpk = calculate_cpk(data, usl, lsl)
+        rows.append((col, count, out_of_spec,
+                     out_of_spec / count if count > 0 else 0.0,
+                     np.nan if lsl is None else lsl,
+                     np.nan if usl is None else usl,
+                     np.mean(data), np.std(data),
+                     np.nan if cpk is None else cpk))
+    stats = pd.DataFrame(rows, columns=STAT_COLUMNS)
+    return stats.astype({'Test': 'int64', 'NG': 'int64', 'Rate': 'float64', 'LSL': 'float64',
+                         'USL': 'float64', 'Mean': 'float64', 'Std': 'float64', 'CPK': 'float64'})
+
+def _sheet_title(title: str, used: set) -> str:
+    """生成合法且不重复的工作表名（最长31个字符，不含 []:*?/\\）"""
+    base = re.sub(r'[\[\]:*?/\\]', '_', str(title)).strip("'")[:31] or 'Sheet'
+    name = base
+    index = 2
+    while name.lower() in used:
+        suffix = f'_{index}'
+        name = base[:31 - len(suffix)] + suffix
+        index += 1
+    used.add(name.lower())
+    return name
+
+def _cell_value(value):
+    """把NaN转换为空单元格，numpy标量转换为Python类型"""
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return None
+    if isinstance(value, np.generic):
+        value = value.item()
+        if isinstance(value, float) and np.isnan(value):
+            return None
+    return value
+
+def write_statistics_workbook(sheets: Sequence[Tuple[str, pd.DataFrame]], destination) -> None:
+    """把多个统计表写入同一个工作簿
+    Args:
+        sheets: (工作表名, 统计表) 列表
+        destination: 文件路径或可写的二进制文件对象
+    """
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font
+    from openpyxl.utils import get_column_letter
+
+    workbook = Workbook(write_only=True)
+    used = set()
+    header_font = Font(bold=True)
+    for title, table in sheets:
+        sheet = workbook.create_sheet(_sheet_title(title, used))
+        sheet.freeze_panes = 'A2'
+        columns = list(table.columns)
+        for i, name in enumerate(columns, 1):
+            sheet.column_dimensions[get_column_letter(i)].width = COLUMN_WIDTHS.get(name, 12)
+
+        header = []
+        for name in columns:
+            cell = WriteOnlyCell(sheet, value=name)
+            cell.font = header_font
+            header.append(cell)
+        sheet.append(header)
+
+        formats = [NUMBER_FORMATS.get(name) for name in columns]
+        for values in table.itertuples(index=False, name=None):
+            row = []
+            for value, number_format in zip(values, formats):
+                cell = WriteOnlyCell(sheet, value=_cell_value(value))
+                if number_format is not None:
+                    cell.number_format = number_format
+                row.append(cell)
+            sheet.append(row)
+
+    if not used:
+        workbook.create_sheet('Sheet')
+    with TRACER.span('to_excel', 'io'):
+        workbook.save(destination)
+
+def save_statistics_workbook(sheets: Sequence[Tuple[str, pd.DataFrame]], path: str, writer=None) -> str:
+    """用 write_statistics_workbook 写出工作簿
+    Args:
+        sheets: (工作表名, 表) 列表
+        path: 工作簿路径
+        writer: OutputWriter，提供时序列化为字节后在后台写盘，否则直接保存到 path
+    Returns:
+        str: 工作簿路径
+    """
+    if writer is not None:
+        # 后台写盘需要完整的文件内容
+        buffer = io.BytesIO()
+        write_statistics_workbook(sheets, buffer)
+        write_output_bytes(path, buffer.getvalue(), writer)
+    else:
+        write_statistics_workbook(sheets, path)
+    return path
+
+def add_sheet_or_csv(sheets: List[Tuple[str, pd.DataFrame]], title: str, table: pd.DataFrame,
+                     csv_path: str, writer=None) -> Optional[str]:
+    """表的行数不超过Excel上限时作为工作表加入 sheets，否则写入CSV（UTF-8 BOM，Excel可直接打开）
+    Args:
+        sheets: 工作表列表，原地追加
+        title: 工作表名
+        table: 表
+        csv_path: 超过上限时的CSV路径
+        writer: OutputWriter，可选
+    Returns:
+        Optional[str]: 写出的CSV路径，作为工作表加入时为None
+    """
+    if len(table) <= EXCEL_MAX_ROWS:
+        sheets.append((title, table))
+        return None
+    print(f"警告: “{title}” {len(table)} 行超过Excel上限，改为导出 {os.path.basename(csv_path)}")
+    write_output_bytes(csv_path, table.to_csv(index=False).encode('utf-8-sig'), writer)
+    return csv_path
+
+def combine_statistics(tables: Sequence[Tuple[Optional[str], pd.DataFrame]]) -> pd.DataFrame:
+    """合并为长表：Group 列为分组名，整体数据为空"""
+    frames = [table.assign(Group=group)[['Group'] + STAT_COLUMNS] for group, table in tables]
+    return pd.concat(frames, ignore_index=True)
+
+def statistics_sidecar(table: pd.DataFrame, fmt: str) -> Tuple[str, bytes]:
+    """把长表序列化为CSV或Parquet
+    Args:
+        table: combine_statistics 的结果
+        fmt: 'csv' 或 'parquet'（未安装 pyarrow/fastparquet 时改为CSV）
+    Returns:
+        (文件名, 文件内容)
+    """
+    if fmt == 'parquet':
+        buffer = io.BytesIO()
+        try:
+            table.to_parquet(buffer, index=False)
+            return 'statistics.parquet', buffer.getvalue()
+        except ImportError:
+            print("警告: 未安装 pyarrow 或 fastparquet，统计数据改为导出CSV")
+    return 'statistics.csv', table.to_csv(index=False).encode('utf-8')
+
+def export_statistics_workbook(tables: Sequence[Tuple[str, Optional[str], pd.DataFrame]],
+                               output_dir: str, sidecar: str = '', writer=None,
+                               extra_sheets: Sequence[Tuple[str, pd.DataFrame]] = ()) -> List[str]:
+    """把整体和各分组的统计写入 statistics.xlsx，并按需导出长表
+    Args:
+        tables: (工作表名, 分组名, 统计表) 列表，整体数据的分组名为None
+        output_dir: 输出目录
+        sidecar: 额外导出的长表格式：''（不导出）、'csv' 或 'parquet'
+        writer: OutputWriter，提供时在后台写盘
+        extra_sheets: 附加在统计表之后的 (工作表名, 表) 列表，如重复性分析，不写入长表
+    Returns:
+        List[str]: 写出的文件路径
+    """
+    sheets = [(title, table) for title, _, table in tables] + list(extra_sheets)
+    paths = [save_statistics_workbook(sheets, os.path.join(output_dir, WORKBOOK_NAME), writer)]
+
+    if sidecar:
+        name, data = statistics_sidecar(
+            combine_statistics([(group, table) for _, group, table in tables]), sidecar)
+        path = os.path.join(output_dir, name)
+        write_output_bytes(path, data, writer)
+        paths.append(path)
+    return paths
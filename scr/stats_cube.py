@@ -0,0 +1,250 @@
+"""多级分组的统计立方体
+
+分组列（如 Line、Camera批次、治具）的每一种组合都是立方体的一层：全部列的组合
+为最细的一层，任意子集为小计层，空集为整体。所有层一次算出，界面和导出可以直接
+取任意一层或其中的切片，不需要重新计算。
+
+计算只扫描一遍数据：
+    1. 每个分组列 factorize 一次，得到整数编码（空值单独编码）
+    2. 各列编码按混合进制合成一个整数键，得到最细一层的单元格
+    3. 按单元格排序后用 np.add.reduceat 一次算出所有数据列的计数、和、平方和与超限数
+    4. 小计层由最细一层的这些可加统计量汇总得到，不再访问原始数据
+
+均值、标准差和CPK由可加统计量导出，与 compute_statistics（calculate_cpk、
+calculate_out_of_spec_column）的定义一致：Std 为总体标准差，CPK 使用样本标准差。
+
+组合数过多（超过 max_combinations）时不计算立方体，避免组合爆炸。
+"""
+import itertools
+import os
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+from .data_processing import get_spec_limits
+from .statistics_export import STAT_COLUMNS, save_statistics_workbook
+from .instrument import traced
+
+# 小计层中被汇总的分组列的取值
+ALL_LABEL = '(全部)'
+
+CUBE_WORKBOOK_NAME = 'group_cube.xlsx'
+
+class CardinalityError(ValueError):
+    """分组组合数超过上限"""
+    pass
+
+@dataclass
+class StatsCube:
+    """统计立方体
+
+    levels 的键为该层的分组列（元组，整体为空元组），值为该层的统计表：
+    分组列 + STAT_COLUMNS，每个组合、每个数据列一行。
+    """
+    group_columns: List[str]
+    data_columns: List[str]
+    levels: Dict[Tuple[str, ...], pd.DataFrame]
+
+    def level(self, *columns: str) -> pd.DataFrame:
+        """取出一层，如 cube.level('Line') 或 cube.level('Line', 'Fixture')；不带参数时为整体"""
+        key = tuple(col for col in self.group_columns if col in columns)
+        if len(key) != len(columns):
+            raise KeyError(f"未知的分组列: {[col for col in columns if col not in self.group_columns]}")
+        return self.levels[key]
+
+    def slice(self, items: Optional[Sequence[str]] = None, **values) -> pd.DataFrame:
+        """按分组取值切片，如 cube.slice(Line='LineB')：取 Line 这一层中 LineB 的各列统计
+        Args:
+            items: 只保留这些数据列
+            values: 分组列 -> 取值，参与的分组列决定使用哪一层
+        """
+        table = self.level(*values)
+        mask = np.ones(len(table), dtype=bool)
+        for col, value in values.items():
+            mask &= (table[col] == value).to_numpy()
+        if items is not None:
+            mask &= table['Items'].isin(items).to_numpy()
+        return table[mask].reset_index(drop=True)
+
+    def long_table(self) -> pd.DataFrame:
+        """所有层合并为一个长表：Level 列为层名，汇总掉的分组列取值为 ALL_LABEL"""
+        frames = []
+        for key, table in self.levels.items():
+            frame = table.copy()
+            for col in self.group_columns:
+                if col not in key:
+                    frame[col] = ALL_LABEL
+            frame.insert(0, 'Level', level_name(key))
+            frames.append(frame[['Level'] + self.group_columns + STAT_COLUMNS])
+        return pd.concat(frames, ignore_index=True)
+
+def level_name(key: Tuple[str, ...]) -> str:
+    """层名，如 'Line×Fixture'，整体为 '整体'"""
+    return '×'.join(key) if key else '整体'
+
+def _combine_codes(codes: np.ndarray, sizes: Sequence[int]) -> Tuple[np.ndarray, np.ndarray]:
+    """把多列编码合成一个键，返回 (出现过的组合（行）, 每行所属组合的序号)"""
+    if not sizes:
+        return np.zeros((1, 0), dtype=np.int64), np.zeros(len(codes), dtype=np.int64)
+    if np.prod([float(size) for size in sizes]) < 2 ** 62:
+        # 混合进制：键 = c0 * s1 * s2 ... + c1 * s2 ... + c2
+        keys = np.zeros(len(codes), dtype=np.int64)
+        for j, size in enumerate(sizes):
+            keys = keys * size + codes[:, j]
+        unique_keys, inverse = np.unique(keys, return_inverse=True)
+        combos = np.empty((len(unique_keys), len(sizes)), dtype=np.int64)
+        remainder = unique_keys
+        for j in range(len(sizes) - 1, -1, -1):
+            remainder, combos[:, j] = np.divmod(remainder, sizes[j])
+        return combos, inverse
+    return np.unique(codes, axis=0, return_inverse=True)
+
+def _sum_by(inverse: np.ndarray, count: int, arrays: Sequence[np.ndarray]) -> List[np.ndarray]:
+    """按组合序号对各矩阵的行求和（用于由最细一层汇总各层，矩阵行数为组合数）"""
+    if not len(inverse):
+        return [np.zeros((count,) + array.shape[1:], dtype=array.dtype) for array in arrays]
+    order = np.argsort(inverse, kind='stable')
+    starts = np.flatnonzero(np.r_[True, np.diff(inverse[order]) != 0])
+    sums = []
+    for array in arrays:
+        reduced = np.add.reduceat(array[order], starts, axis=0)
+        if len(starts) != count:
+            full = np.zeros((count,) + array.shape[1:], dtype=reduced.dtype)
+            full[inverse[order][starts]] = reduced
+            reduced = full
+        sums.append(reduced)
+    return sums
+
+def _derive(rows, counts, sums, sumsq, ng, shift, lsl, usl, count_valid=False) -> Dict[str, np.ndarray]:
+    """由可加统计量计算 Test、NG、Rate、Mean、Std、CPK（每个单元格 x 每个数据列）"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        centered = sums / counts
+        mean = centered + shift
+        variance = np.maximum(sumsq / counts - centered ** 2, 0.0)
+        std = np.sqrt(variance)
+        sample_std = np.sqrt(variance * counts / (counts - 1))
+        sample_std = np.where(counts > 1, sample_std, np.nan)
+        cpu = (usl - mean) / (3 * sample_std)
+        cpl = (mean - lsl) / (3 * sample_std)
+        if np.isnan(lsl).all() and np.isnan(usl).all():
+            cpk = np.full_like(mean, np.nan)
+        else:
+            cpk = np.where(np.isnan(usl), cpl, np.where(np.isnan(lsl), cpu, np.minimum(cpu, cpl)))
+        # 与 calculate_cpk 一致：标准差为0时无法计算
+        cpk = np.where(sample_std == 0, np.nan, cpk)
+        test = counts if count_valid else np.broadcast_to(rows[:, None], ng.shape)
+        rate = np.where(test > 0, ng / test, 0.0)
+    return {'Test': test, 'NG': ng, 'Rate': rate, 'Mean': mean, 'Std': std, 'CPK': cpk}
+
+@traced('build_stats_cube', 'stats')
+def build_stats_cube(df: pd.DataFrame, prepared: tuple, data_columns: Sequence[str],
+                     group_columns: Sequence[str], max_combinations: int = 1000,
+                     count_valid: bool = False) -> StatsCube:
+    """计算所有分组层的统计量
+    Args:
+        df: 清理后的数据（含分组列）
+        prepared: preprocess_data 的结果
+        data_columns: 数据列
+        group_columns: 分组列
+        max_combinations: 最细一层实际出现的组合数上限
+        count_valid: Test 只统计非空值，与 compute_statistics 的同名参数相同
+    Returns:
+        StatsCube
+    Raises:
+        CardinalityError: 组合数超过上限时
+    """
+    data_df, lsl_values, usl_values = prepared
+    data_columns = list(data_columns)
+    group_columns = list(group_columns)
+    n, m = len(data_df), len(data_columns)
+    lsl, usl = get_spec_limits(data_columns, lsl_values, usl_values)
+
+    # 1. 每个分组列编码一次，空值编码为该列的最后一个值
+    labels = df.loc[data_df.index, group_columns]
+    codes = np.empty((n, len(group_columns)), dtype=np.int64)
+    uniques = []
+    for j, col in enumerate(group_columns):
+        column_codes, column_uniques = pd.factorize(labels[col], sort=True)
+        column_codes = column_codes.astype(np.int64)
+        column_codes[column_codes < 0] = len(column_uniques)
+        codes[:, j] = column_codes
+        uniques.append(column_uniques)
+    sizes = [len(u) + 1 for u in uniques]
+
+    # 2. 最细一层的单元格
+    combos, inverse = _combine_codes(codes, sizes)
+    if len(combos) > max_combinations:
+        cardinality = ', '.join(f'{col}: {len(u)}' for col, u in zip(group_columns, uniques))
+        raise CardinalityError(f"分组组合数 {len(combos)} 超过上限 {max_combinations}（{cardinality}）")
+
+    # 3. 一次扫描求可加统计量：数据按单元格排序后转置为（列 x 行），每个单元格在每一列中
+    #    都是连续的一段，reduceat 按内存顺序累加；各量原地计算，只占用一份数据大小的内存
+    order = np.argsort(inverse, kind='stable')
+    cells = inverse[order]
+    starts = np.flatnonzero(np.r_[True, cells[1:] != cells[:-1]]) if n else np.zeros(0, dtype=np.int64)
+    present = cells[starts]
+    block = np.empty((m, n))
+    for j, col in enumerate(data_columns):
+        block[j] = data_df[col].to_numpy(dtype=float)[order]
+    missing = np.isnan(block)
+    valid = ~missing
+    with np.errstate(invalid='ignore'):
+        fails = (block < lsl[:, None]) | (block > usl[:, None])
+    # 减去每列的整体均值再求和，减小平方和的舍入误差
+    block[missing] = 0.0
+    shift = block.sum(axis=1) / np.maximum(valid.sum(axis=1), 1)
+    block -= shift[:, None]
+    block[missing] = 0.0
+    del missing
+
+    def reduce(array, dtype):
+        full = np.zeros((len(combos), m), dtype=dtype)
+        if len(starts):
+            full[present] = np.add.reduceat(array, starts, axis=1, dtype=dtype).T
+        return full
+
+    rows = np.zeros(len(combos), dtype=np.int64)
+    rows[present] = np.diff(np.r_[starts, len(cells)])
+    counts = reduce(valid, np.int64)
+    ng = reduce(fails, np.int64)
+    del valid, fails
+    sums = reduce(block, float)
+    np.multiply(block, block, out=block)
+    sumsq = reduce(block, float)
+    del block
+
+    # 4. 各层由最细一层汇总
+    levels = {}
+    for size in range(len(group_columns), -1, -1):
+        for key in itertools.combinations(range(len(group_columns)), size):
+            key_codes = combos[:, list(key)]
+            # 该层的任一分组列为空的单元格不参与
+            keep = np.all(key_codes < np.array([sizes[j] - 1 for j in key], dtype=np.int64), axis=1)
+            level_combos, level_inverse = _combine_codes(key_codes[keep], [sizes[j] for j in key])
+            level_sums = _sum_by(level_inverse, len(level_combos),
+                                 [rows[keep], counts[keep], sums[keep], sumsq[keep], ng[keep]])
+            stats = _derive(*level_sums, shift, lsl, usl, count_valid)
+            levels[tuple(group_columns[j] for j in key)] = _level_table(
+                [group_columns[j] for j in key], [uniques[j] for j in key], level_combos,
+                data_columns, stats, lsl, usl)
+    return StatsCube(group_columns, data_columns, levels)
+
+def _level_table(columns, uniques, combos, data_columns, stats, lsl, usl) -> pd.DataFrame:
+    """把一层的统计矩阵展开为长表（每个组合、每个数据列一行）"""
+    cells, m = len(combos), len(data_columns)
+    table = {col: np.repeat(np.asarray(u)[combos[:, j]], m) for j, (col, u) in enumerate(zip(columns, uniques))}
+    table['Items'] = np.tile(np.asarray(data_columns, dtype=object), cells)
+    table['Test'] = stats['Test'].reshape(-1).astype(np.int64)
+    table['NG'] = stats['NG'].reshape(-1).astype(np.int64)
+    table['Rate'] = stats['Rate'].reshape(-1)
+    table['LSL'] = np.tile(lsl, cells)
+    table['USL'] = np.tile(usl, cells)
+    for name in ('Mean', 'Std', 'CPK'):
+        table[name] = stats[name].reshape(-1)
+    return pd.DataFrame(table, columns=list(columns) + STAT_COLUMNS)
+
+def export_stats_cube(cube: StatsCube, output_dir: str, writer=None) -> str:
+    """导出统计立方体：每层一个工作表（从整体到最细一层）"""
+    keys = sorted(cube.levels, key=len)
+    return save_statistics_workbook([(level_name(key), cube.levels[key]) for key in keys],
+                                    os.path.join(output_dir, CUBE_WORKBOOK_NAME), writer)
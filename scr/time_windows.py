@@ -0,0 +1,193 @@
+"""按时间窗口（班次、天、ISO周）分析
+
+数据按 Time 只排序一次。每种窗口规则先为每一行计算所属窗口的起始时间（排序后
+单调不减），再用 searchsorted 找出各窗口在排序数据中的起止位置；每个窗口是排序
+数据的一段连续切片（视图），不需要逐个窗口重新筛选数据或重新运行整个分析。
+
+每个窗口的统计量与整体统计相同（compute_statistics，即 calculate_cpk 和
+calculate_out_of_spec_column 的逻辑），结果汇总为每种规则一个工作簿和一张趋势图。
+"""
+import os
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+from .statistics_export import compute_statistics, save_statistics_workbook, STAT_COLUMNS
+from .instrument import TRACER, traced
+
+# 窗口规则 -> 显示名称
+WINDOW_RULES = {'shift': '班次', 'day': '天', 'week': 'ISO周'}
+
+# 默认班次：08:00-20:00 白班，20:00-次日08:00 夜班
+DEFAULT_SHIFTS = [{'name': '白班', 'start': '08:00'}, {'name': '夜班', 'start': '20:00'}]
+
+@dataclass
+class TimeIndex:
+    """按时间排序后的测量数据"""
+    data_df: pd.DataFrame       # 按 Time 排序的测量数据（SN和数据列）
+    times: np.ndarray           # 排序后的时间（datetime64[ns]）
+    lsl_values: Optional[pd.Series]
+    usl_values: Optional[pd.Series]
+
+@traced('build_time_index', 'data')
+def build_time_index(df: pd.DataFrame, prepared: tuple) -> Optional[TimeIndex]:
+    """按 Time 排序一次测量数据
+    Args:
+        df: 清理后的数据
+        prepared: preprocess_data 的结果
+    Returns:
+        TimeIndex，没有可用的 Time 列时返回None
+    """
+    data_df, lsl_values, usl_values = prepared
+    if 'Time' not in df.columns:
+        print("警告: 没有 Time 列，跳过时间窗口分析")
+        return None
+    times = pd.to_datetime(df.loc[data_df.index, 'Time'], errors='coerce').to_numpy()
+    valid = ~np.isnat(times)
+    if not valid.any():
+        print("警告: Time 列无法解析，跳过时间窗口分析")
+        return None
+    if not valid.all():
+        print(f"警告: {int((~valid).sum())} 行的 Time 无法解析，不参与时间窗口分析")
+    order = np.flatnonzero(valid)[np.argsort(times[valid], kind='stable')]
+    return TimeIndex(data_df.iloc[order], times[order], lsl_values, usl_values)
+
+def _parse_clock(text: str) -> np.timedelta64:
+    hours, minutes = (int(part) for part in str(text).split(':')[:2])
+    return np.timedelta64(hours * 60 + minutes, 'm').astype('timedelta64[ns]')
+
+def bucket_starts(times: np.ndarray, rule: str,
+                  shifts: Sequence[dict] = DEFAULT_SHIFTS) -> Tuple[np.ndarray, np.ndarray]:
+    """计算每个时间所属窗口的起始时间
+    Args:
+        times: 已排序的时间（datetime64[ns]）
+        rule: 'shift'、'day' 或 'week'
+        shifts: 班次日历，每项为 {'name': 名称, 'start': 'HH:MM'}，跨午夜的班次归属开始的那一天
+    Returns:
+        (starts, shift_ids)：每行所属窗口的起始时间；shift_ids 为班次序号（非班次规则时为None）
+    Raises:
+        ValueError: 规则不支持时
+    """
+    days = times.astype('datetime64[D]')
+    if rule == 'day':
+        return days.astype('datetime64[ns]'), None
+    if rule == 'week':
+        # ISO周从周一开始；1970-01-01 是周四
+        weekday = (days.astype(np.int64) + 3) % 7
+        return (days - weekday.astype('timedelta64[D]')).astype('datetime64[ns]'), None
+    if rule == 'shift':
+        ordered = sorted(shifts, key=lambda shift: _parse_clock(shift['start']))
+        offsets = np.array([_parse_clock(shift['start']) for shift in ordered], dtype='timedelta64[ns]')
+        midnight = days.astype('datetime64[ns]')
+        clock = times - midnight
+        ids = np.searchsorted(offsets, clock, side='right') - 1
+        # 早于第一个班次开始时间的属于前一天的最后一个班次
+        before_first = ids < 0
+        ids[before_first] = len(offsets) - 1
+        midnight = midnight - np.where(before_first, np.timedelta64(1, 'D'),
+                                       np.timedelta64(0, 'D')).astype('timedelta64[ns]')
+        return midnight + offsets[ids], ids
+    raise ValueError(f"不支持的时间窗口规则: {rule}（可选: {', '.join(WINDOW_RULES)}）")
+
+def _bucket_label(start: pd.Timestamp, rule: str, shift_name: str = '') -> str:
+    if rule == 'week':
+        year, week, _ = start.isocalendar()
+        return f'{year}-W{week:02d}'
+    if rule == 'shift':
+        return f"{start.strftime('%Y-%m-%d')} {shift_name}"
+    return start.strftime('%Y-%m-%d')
+
+def slice_buckets(index: TimeIndex, rule: str,
+                  shifts: Sequence[dict] = DEFAULT_SHIFTS) -> List[Tuple[str, pd.Timestamp, slice]]:
+    """把排序后的数据划分为时间窗口
+    Returns:
+        List[(标签, 起始时间, 行切片)]，按时间顺序
+    """
+    starts, shift_ids = bucket_starts(index.times, rule, shifts)
+    # starts 单调不减：每个不同的起始时间在排序数据中的第一次出现即窗口边界
+    edges = np.unique(starts)
+    positions = np.searchsorted(starts, edges, side='left')
+    bounds = np.append(positions, len(starts))
+    names = [shift['name'] for shift in sorted(shifts, key=lambda shift: _parse_clock(shift['start']))]
+    buckets = []
+    for i, edge in enumerate(edges):
+        start = pd.Timestamp(edge)
+        shift_name = names[shift_ids[positions[i]]] if shift_ids is not None else ''
+        buckets.append((_bucket_label(start, rule, shift_name), start, slice(bounds[i], bounds[i + 1])))
+    return buckets
+
+@traced('window_statistics', 'stats')
+def window_statistics(index: TimeIndex, data_columns: Sequence[str], rule: str,
+                      shifts: Sequence[dict] = DEFAULT_SHIFTS,
+                      min_rows: int = 2) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """计算每个时间窗口的统计量
+    Args:
+        index: build_time_index 的结果
+        data_columns: 数据列
+        rule: 'shift'、'day' 或 'week'
+        shifts: 班次日历
+        min_rows: 行数少于该值的窗口被跳过
+    Returns:
+        (summary, stats)：summary 每个窗口一行（Bucket、Start、End、Test、NG、Rate、MinCPK、MedianCPK），
+        stats 为长表（Bucket、Start 加上 STAT_COLUMNS）
+    """
+    summaries = []
+    frames = []
+    for label, start, rows in slice_buckets(index, rule, shifts):
+        if rows.stop - rows.start < min_rows:
+            continue
+        # 连续切片，不复制数据
+        window = index.data_df.iloc[rows]
+        stats = compute_statistics((window, index.lsl_values, index.usl_values), data_columns)
+        frames.append(stats.assign(Bucket=label, Start=start)[['Bucket', 'Start'] + STAT_COLUMNS])
+        test = rows.stop - rows.start
+        ng = int(stats['NG'].sum())
+        cpk = stats['CPK'].dropna()
+        summaries.append({
+            'Bucket': label,
+            'Start': start,
+            'End': pd.Timestamp(index.times[rows.stop - 1]),
+            'Test': test,
+            'NG': ng,
+            'Rate': ng / (test * len(data_columns)) if test and len(data_columns) else 0.0,
+            'MinCPK': cpk.min() if not cpk.empty else np.nan,
+            'MedianCPK': cpk.median() if not cpk.empty else np.nan,
+        })
+    summary = pd.DataFrame(summaries, columns=['Bucket', 'Start', 'End', 'Test', 'NG', 'Rate',
+                                               'MinCPK', 'MedianCPK'])
+    stats = (pd.concat(frames, ignore_index=True) if frames
+             else pd.DataFrame(columns=['Bucket', 'Start'] + STAT_COLUMNS))
+    return summary, stats
+
+def plot_window_trend(summary: pd.DataFrame, rule: str, config: object) -> Figure:
+    """绘制时间窗口趋势图：每个窗口的测试数、超限比例和CPK"""
+    fig, (ax_count, ax_rate, ax_cpk) = plt.subplots(
+        3, 1, sharex=True, figsize=config.DATA_PROCESSING.get('time_windows', {}).get('figsize', (15, 9)))
+    x = np.arange(len(summary))
+    ax_count.bar(x, summary['Test'], color='tab:blue')
+    ax_count.set_ylabel('Test')
+    ax_rate.plot(x, summary['Rate'] * 100, marker='o', color='tab:red')
+    ax_rate.set_ylabel('NG Rate (%)')
+    ax_cpk.plot(x, summary['MedianCPK'], marker='o', label='Median CPK')
+    ax_cpk.plot(x, summary['MinCPK'], marker='o', label='Min CPK')
+    ax_cpk.set_ylabel('CPK')
+    ax_cpk.legend(loc='upper left')
+    step = max(1, len(x) // 30)
+    ax_cpk.set_xticks(x[::step])
+    ax_cpk.set_xticklabels(summary['Bucket'].iloc[::step], rotation=45, ha='right')
+
+    title = f"按{WINDOW_RULES.get(rule, rule)}趋势"
+    if config.PLOT.get('title_prefix'):
+        title = f"{config.PLOT['title_prefix']} {title}"
+    ax_count.set_title(title)
+    with TRACER.span('tight_layout', 'layout'):
+        fig.tight_layout()
+    return fig
+
+def export_window_statistics(summary: pd.DataFrame, stats: pd.DataFrame, rule: str,
+                             output_dir: str, writer=None) -> str:
+    """导出时间窗口统计：工作表“汇总”（每个窗口一行）和“统计”（每个窗口、每列一行）"""
+    return save_statistics_workbook([('汇总', summary), ('统计', stats)],
+                                    os.path.join(output_dir, f'{rule}_statistics.xlsx'), writer)
@@ -0,0 +1,266 @@
+from collections import OrderedDict
+from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QListWidget,
+                           QComboBox, QLabel, QPushButton, QFileDialog,
+                           QSplitter)
+from PyQt5.QtCore import Qt, QThread, pyqtSignal
+from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg
+from matplotlib.figure import Figure
+import pandas as pd
+import seaborn as sns
+from ..data_processing import (clean_data, get_data_columns, preprocess_data,
+                               get_group_columns, add_group_key, GROUP_KEY_SEPARATOR)
+from ..plot_base import PlotStyle, PlotHelper
+
+ALL_GROUPS = '全部'
+
+class DataLoadThread(QThread):
+    """数据加载线程类"""
+    finished = pyqtSignal(object)  # 发送清理后的数据框
+    error = pyqtSignal(str)        # 发送错误信息
+
+    def __init__(self, data_path, config_obj):
+        super().__init__()
+        self.data_path = data_path
+        self.config = config_obj
+
+    def run(self):
+        try:
+            df = pd.read_excel(self.data_path)
+            self.finished.emit(clean_data(df, self.config))
+        except Exception as e:
+            self.error.emit(str(e))
+
+class ColumnBrowser(QWidget):
+    """交互式数据列浏览面板
+
+    从内存中的数据按需绘制所选列的分布图、分组箱线图或相关性视图。
+    已绘制的视图以像素缓冲的形式保存在LRU缓存中，切换时直接blit到画布上，
+    除非用户主动保存，否则不会写入磁盘。
+    """
+    VIEWS = {'分布图': 'distribution', '箱线图': 'boxplot', '相关性': 'correlation'}
+
+    def __init__(self, config_obj, cache_size=32, parent=None):
+        super().__init__(parent)
+        self.config = config_obj
+        self.cache_size = cache_size
+        self._view_cache = OrderedDict()  # (视图, 列, 组) -> 画布像素缓冲
+        self._drawn_key = None            # 当前Figure中实际绘制的视图
+        self._shown_key = None            # 当前画布上显示的视图
+
+        self.data_df = None
+        self.lsl_values = None
+        self.usl_values = None
+        self.data_columns = []
+        self.group_by = None
+        self.group_rows = {}
+        self._corr = None
+
+        layout = QHBoxLayout(self)
+        splitter = QSplitter(Qt.Horizontal)
+        splitter.addWidget(self.create_selector_panel())
+        splitter.addWidget(self.create_canvas_panel())
+        splitter.setStretchFactor(1, 1)
+        layout.addWidget(splitter)
+
+    def create_selector_panel(self):
+        """创建视图、列和分组选择区域"""
+        panel = QWidget()
+        layout = QVBoxLayout(panel)
+
+        self.view_combo = QComboBox()
+        self.view_combo.addItems(list(self.VIEWS))
+        self.view_combo.currentIndexChanged.connect(self.show_current)
+
+        self.column_list = QListWidget()
+        self.column_list.currentRowChanged.connect(self.show_current)
+
+        self.group_list = QListWidget()
+        self.group_list.currentRowChanged.connect(self.show_current)
+
+        layout.addWidget(QLabel("视图:"))
+        layout.addWidget(self.view_combo)
+        layout.addWidget(QLabel("数据列:"))
+        layout.addWidget(self.column_list, 3)
+        layout.addWidget(QLabel("分组:"))
+        layout.addWidget(self.group_list, 1)
+        return panel
+
+    def create_canvas_panel(self):
+        """创建嵌入式matplotlib画布区域"""
+        panel = QWidget()
+        layout = QVBoxLayout(panel)
+
+        self.figure = Figure(figsize=(8, 6))
+        self.canvas = FigureCanvasQTAgg(self.figure)
+        # 画布尺寸变化后缓存的像素缓冲不再可用
+        self.canvas.mpl_connect('resize_event', self._on_resize)
+
+        self.save_btn = QPushButton("保存当前图")
+        self.save_btn.clicked.connect(self.save_current)
+        self.save_btn.setEnabled(False)
+
+        layout.addWidget(self.canvas, 1)
+        layout.addWidget(self.save_btn)
+        return panel
+
+    def set_data(self, df):
+        """设置要浏览的数据（包含LSL/USL规格行的清理后数据框）"""
+        self.data_columns = get_data_columns(df, self.config)
+        self.data_df, self.lsl_values, self.usl_values = preprocess_data(df)
+        self._corr = None
+
+        group_columns = get_group_columns(self.config)
+        found = bool(group_columns) and all(col in df.columns for col in group_columns)
+        # 多个分组列时按组合分组名（如 'LineA+F1'）浏览
+        self.group_by = GROUP_KEY_SEPARATOR.join(group_columns) if found else None
+        self.group_rows = {}
+        if self.group_by:
+            actual_data = add_group_key(df.loc[self.data_df.index, group_columns], group_columns, self.group_by)
+            # 一次性建立分组到行位置的索引，切换分组时无需重新筛选
+            self.group_rows = actual_data.groupby(self.group_by).indices
+
+        self._view_cache.clear()
+        self._drawn_key = None
+        self._shown_key = None
+
+        self.column_list.blockSignals(True)
+        self.group_list.blockSignals(True)
+        self.column_list.clear()
+        self.column_list.addItems(self.data_columns)
+        self.group_list.clear()
+        self.group_list.addItem(ALL_GROUPS)
+        self.group_list.addItems([str(name) for name in self.group_rows])
+        self.column_list.setCurrentRow(0)
+        self.group_list.setCurrentRow(0)
+        self.column_list.blockSignals(False)
+        self.group_list.blockSignals(False)
+
+        self.save_btn.setEnabled(bool(self.data_columns))
+        self.show_current()
+
+    def current_key(self):
+        """返回当前选择对应的视图键"""
+        column_item = self.column_list.currentItem()
+        group_item = self.group_list.currentItem()
+        if column_item is None:
+            return None
+        view = self.VIEWS[self.view_combo.currentText()]
+        group = group_item.text() if group_item is not None else ALL_GROUPS
+        if view == 'boxplot':
+            # 箱线图总是并排显示所有分组
+            group = ALL_GROUPS
+        return (view, column_item.text(), group)
+
+    def show_current(self, *args):
+        """显示当前选择的视图，已缓存的视图直接blit"""
+        key = self.current_key()
+        if key is None or self.data_df is None or key == self._shown_key:
+            return
+
+        background = self._view_cache.get(key)
+        if background is not None:
+            self._view_cache.move_to_end(key)
+            self.canvas.restore_region(background)
+            self.canvas.blit(self.figure.bbox)
+        else:
+            self.render(key)
+        self._shown_key = key
+
+    def render(self, key):
+        """在内存中绘制视图并放入LRU缓存"""
+        view, col, group = key
+        self.figure.clear()
+        ax = self.figure.add_subplot(111)
+
+        data_df = self.data_df
+        if group != ALL_GROUPS:
+            group_name = next(name for name in self.group_rows if str(name) == group)
+            data_df = data_df.iloc[self.group_rows[group_name]]
+
+        if view == 'distribution':
+            self._draw_distribution(ax, data_df, col)
+        elif view == 'boxplot':
+            self._draw_boxplot(ax, col)
+        else:
+            self._draw_correlation(ax, data_df, col, group)
+
+        self.figure.tight_layout()
+        self.canvas.draw()
+        self._drawn_key = key
+
+        self._view_cache[key] = self.canvas.copy_from_bbox(self.figure.bbox)
+        if len(self._view_cache) > self.cache_size:
+            self._view_cache.popitem(last=False)
+
+    def _limits(self, col):
+        lsl = float(self.lsl_values[col]) if self.lsl_values is not None else None
+        usl = float(self.usl_values[col]) if self.usl_values is not None else None
+        return lsl, usl
+
+    def _draw_distribution(self, ax, data_df, col):
+        """绘制单列分布图"""
+        lsl, usl = self._limits(col)
+        data = data_df[col].astype(float).dropna()
+        PlotHelper.setup_distribution_plot(ax, data, col, lsl, usl, self.config,
+                                           PlotStyle(fontsize='small'))
+
+    def _draw_boxplot(self, ax, col):
+        """绘制单列的分组箱线图，未设置分组列时绘制整体箱线图"""
+        style = PlotStyle()
+        data = self.data_df[col].astype(float)
+        if self.group_by:
+            groups = pd.Series('', index=self.data_df.index)
+            for name, rows in self.group_rows.items():
+                groups.iloc[rows] = str(name)
+            sns.boxplot(x=groups, y=data, ax=ax, flierprops=style.flierprops)
+            ax.set_xlabel(self.group_by)
+        else:
+            sns.boxplot(y=data, ax=ax, flierprops=style.flierprops)
+
+        lsl, usl = self._limits(col)
+        if self.config.PLOT['show_lsl'] and lsl is not None:
+            ax.axhline(y=lsl, **style.lsl_style)
+        if self.config.PLOT['show_usl'] and usl is not None:
+            ax.axhline(y=usl, **style.usl_style)
+        ax.set_title(col)
+
+    def _draw_correlation(self, ax, data_df, col, group):
+        """绘制所选列与其他列的相关系数条形图"""
+        if group == ALL_GROUPS:
+            if self._corr is None:
+                self._corr = self.data_df[self.data_columns].astype(float).corr()
+            corr = self._corr
+        else:
+            corr = data_df[self.data_columns].astype(float).corr()
+        values = corr[col].drop(col).sort_values()
+        colors = ['C3' if v < 0 else 'C0' for v in values]
+        ax.barh(range(len(values)), values.values, color=colors)
+        ax.set_yticks(range(len(values)))
+        ax.set_yticklabels(values.index, fontsize='x-small')
+        ax.set_xlim(-1, 1)
+        ax.axvline(0, color='black', linewidth=0.8)
+        ax.set_title(f'{col} 相关系数')
+
+    def _on_resize(self, event):
+        """画布尺寸变化时清空缓存并重新绘制当前视图"""
+        self._view_cache.clear()
+        if self._shown_key is not None and self._shown_key != self._drawn_key:
+            self.render(self._shown_key)
+
+    def save_current(self):
+        """将当前视图保存为图片文件"""
+        key = self._shown_key
+        if key is None:
+            return
+        view, col, group = key
+        file_path, _ = QFileDialog.getSaveFileName(
+            self,
+            "保存图表",
+            f"{col}_{view}.png",
+            "PNG Files (*.png);;PDF Files (*.pdf);;All Files (*)"
+        )
+        if not file_path:
+            return
+        if self._drawn_key != key:
+            self.render(key)
+        self.figure.savefig(file_path)
@@ -0,0 +1,224 @@
+from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QListWidget, QLabel,
+                           QPushButton, QFileDialog, QSplitter, QCheckBox,
+                           QDoubleSpinBox, QTableWidget, QTableWidgetItem, QGridLayout)
+from PyQt5.QtCore import Qt, QThread, pyqtSignal
+import numpy as np
+from ..data_processing import get_data_columns, preprocess_data, get_group_columns
+from ..spec_whatif import SpecWhatIf
+from ..statistics_export import write_statistics_workbook
+
+# 规格限输入框的最少小数位数，原始规格限的位数更多时按原始规格限
+MIN_DECIMALS = 4
+
+# 表格中显示的列及格式
+RESULT_COLUMNS = [('Test', '{:.0f}'), ('NG', '{:.0f}'), ('Yield', '{:.2%}'), ('Mean', '{:.3f}'),
+                  ('Std', '{:.3f}'), ('CPK', '{:.3f}')]
+
+class WhatIfBuildThread(QThread):
+    """在后台排序数据列，完成后发送 SpecWhatIf"""
+    finished = pyqtSignal(object)
+    error = pyqtSignal(str)
+
+    def __init__(self, df, config_obj):
+        super().__init__()
+        self.df = df
+        self.config = config_obj
+
+    def run(self):
+        try:
+            data_columns = get_data_columns(self.df, self.config)
+            # 与分析时的单元良率一致：未启用分组分析时只计算整体
+            group_config = self.config.DATA_PROCESSING.get('group_analysis', {})
+            group_columns = get_group_columns(self.config) if group_config.get('enabled', False) else []
+            self.finished.emit(SpecWhatIf(self.df, preprocess_data(self.df), data_columns, group_columns))
+        except Exception as e:
+            self.error.emit(str(e))
+
+def _format(value, fmt):
+    return '' if value is None or (isinstance(value, float) and np.isnan(value)) else fmt.format(value)
+
+def _decimals(*values) -> int:
+    """完整显示这些规格限所需的小数位数（不少于 MIN_DECIMALS），输入框不会把原始规格限舍入"""
+    decimals = MIN_DECIMALS
+    for value in values:
+        if value is not None:
+            fraction = np.format_float_positional(value, trim='-').partition('.')[2]
+            decimals = max(decimals, len(fraction))
+    return decimals
+
+class LimitEditor(QWidget):
+    """规格限假设编辑器
+
+    修改某列的 LSL/USL 后立即显示该列整体和各分组的良率和CPK，并更新所有数据列的汇总表。
+    数据列只在加载时排序一次，每次修改只需在各分组的有序段上 searchsorted。
+    """
+    def __init__(self, config_obj, parent=None):
+        super().__init__(parent)
+        self.config = config_obj
+        self.whatif = None
+        self.limits = {}  # 列名 -> 候选 (LSL, USL)
+        self._col = None
+
+        layout = QVBoxLayout(self)
+        self.status = QLabel("在交互浏览页加载数据后，可在此修改规格限并查看良率和CPK的变化")
+        layout.addWidget(self.status)
+
+        splitter = QSplitter(Qt.Horizontal)
+        self.column_list = QListWidget()
+        self.column_list.currentRowChanged.connect(self.select_column)
+        splitter.addWidget(self.column_list)
+        splitter.addWidget(self.create_editor_panel())
+        splitter.setStretchFactor(1, 1)
+        layout.addWidget(splitter, 1)
+
+    def create_editor_panel(self):
+        """创建规格限输入和结果表格区域"""
+        panel = QWidget()
+        layout = QVBoxLayout(panel)
+
+        limit_layout = QGridLayout()
+        self.lsl_check = QCheckBox("LSL")
+        self.usl_check = QCheckBox("USL")
+        self.lsl_spin = QDoubleSpinBox()
+        self.usl_spin = QDoubleSpinBox()
+        for spin in (self.lsl_spin, self.usl_spin):
+            spin.setDecimals(MIN_DECIMALS)
+            spin.setRange(-1e12, 1e12)
+            spin.setKeyboardTracking(False)
+            spin.valueChanged.connect(self.limits_changed)
+        for check in (self.lsl_check, self.usl_check):
+            check.toggled.connect(self.limits_changed)
+        self.original_label = QLabel()
+        reset_btn = QPushButton("恢复原始规格限")
+        reset_btn.clicked.connect(self.reset_column)
+        limit_layout.addWidget(self.lsl_check, 0, 0)
+        limit_layout.addWidget(self.lsl_spin, 0, 1)
+        limit_layout.addWidget(self.usl_check, 1, 0)
+        limit_layout.addWidget(self.usl_spin, 1, 1)
+        limit_layout.addWidget(self.original_label, 0, 2)
+        limit_layout.addWidget(reset_btn, 1, 2)
+
+        # 所选列的整体和各分组结果
+        self.group_table = QTableWidget()
+        self.group_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        # 所有数据列的整体结果（使用各自的候选规格限）
+        self.column_table = QTableWidget()
+        self.column_table.setEditTriggers(QTableWidget.NoEditTriggers)
+
+        self.export_btn = QPushButton("导出结果")
+        self.export_btn.clicked.connect(self.export_results)
+        self.export_btn.setEnabled(False)
+
+        layout.addLayout(limit_layout)
+        layout.addWidget(QLabel("所选列（整体和各分组）:"))
+        layout.addWidget(self.group_table, 1)
+        layout.addWidget(QLabel("所有数据列（整体）:"))
+        layout.addWidget(self.column_table, 2)
+        layout.addWidget(self.export_btn)
+        return panel
+
+    def set_data(self, df):
+        """设置数据（包含LSL/USL规格行的清理后数据框），在后台线程中排序"""
+        self.status.setText("正在排序数据列...")
+        self.build_thread = WhatIfBuildThread(df, self.config)
+        self.build_thread.finished.connect(self.whatif_ready)
+        self.build_thread.error.connect(lambda msg: self.status.setText(f"加载失败: {msg}"))
+        self.build_thread.start()
+
+    def whatif_ready(self, whatif):
+        self.whatif = whatif
+        self.limits = {col: whatif.limits(col) for col in whatif.data_columns}
+        self._col = None
+
+        self.column_table.setRowCount(len(whatif.data_columns))
+        self.column_table.setColumnCount(2 + len(RESULT_COLUMNS))
+        self.column_table.setHorizontalHeaderLabels(['LSL', 'USL'] + [name for name, _ in RESULT_COLUMNS])
+        self.column_table.setVerticalHeaderLabels(whatif.data_columns)
+        for col in whatif.data_columns:
+            self.update_column_row(col)
+
+        self.column_list.blockSignals(True)
+        self.column_list.clear()
+        self.column_list.addItems(whatif.data_columns)
+        self.column_list.blockSignals(False)
+        self.column_list.setCurrentRow(0)
+        self.export_btn.setEnabled(bool(whatif.data_columns))
+        self.status.setText(f"{len(whatif.data_columns)} 个数据列，{len(whatif.groups)} 个分组")
+
+    def select_column(self, row):
+        """切换数据列时载入该列的候选规格限"""
+        if self.whatif is None or row < 0:
+            return
+        self._col = None
+        col = self.whatif.data_columns[row]
+        lsl, usl = self.limits[col]
+        original_lsl, original_usl = self.whatif.limits(col)
+        self.original_label.setText(f"原始: LSL={_format(original_lsl, '{:g}') or '无'}  "
+                                    f"USL={_format(original_usl, '{:g}') or '无'}")
+        widgets = (self.lsl_check, self.usl_check, self.lsl_spin, self.usl_spin)
+        for widget in widgets:
+            widget.blockSignals(True)
+        self.lsl_check.setChecked(lsl is not None)
+        self.usl_check.setChecked(usl is not None)
+        decimals = _decimals(lsl, usl, original_lsl, original_usl)
+        self.lsl_spin.setDecimals(decimals)
+        self.usl_spin.setDecimals(decimals)
+        self.lsl_spin.setValue(lsl if lsl is not None else original_lsl or 0.0)
+        self.usl_spin.setValue(usl if usl is not None else original_usl or 0.0)
+        for widget in widgets:
+            widget.blockSignals(False)
+        self._col = col
+        self.update_group_table()
+
+    def limits_changed(self, *args):
+        """规格限修改后立即重新计算"""
+        if self._col is None:
+            return
+        self.limits[self._col] = (self.lsl_spin.value() if self.lsl_check.isChecked() else None,
+                                  self.usl_spin.value() if self.usl_check.isChecked() else None)
+        self.update_group_table()
+        self.update_column_row(self._col)
+
+    def reset_column(self):
+        if self._col is None:
+            return
+        col = self._col
+        self.limits[col] = self.whatif.limits(col)
+        self.select_column(self.whatif.data_columns.index(col))
+        self.update_column_row(col)
+
+    def update_group_table(self):
+        result = self.whatif.evaluate(self._col, *self.limits[self._col])
+        self.group_table.setRowCount(len(result))
+        self.group_table.setColumnCount(len(RESULT_COLUMNS))
+        self.group_table.setHorizontalHeaderLabels([name for name, _ in RESULT_COLUMNS])
+        self.group_table.setVerticalHeaderLabels(list(result['Group']))
+        for i, row in enumerate(result.itertuples(index=False)):
+            for j, (name, fmt) in enumerate(RESULT_COLUMNS):
+                self.group_table.setItem(i, j, QTableWidgetItem(_format(getattr(row, name), fmt)))
+
+    def update_column_row(self, col):
+        row = self.whatif.data_columns.index(col)
+        result = self.whatif.evaluate(col, *self.limits[col]).iloc[0]
+        lsl, usl = self.limits[col]
+        cells = [_format(lsl, '{:g}'), _format(usl, '{:g}')]
+        cells += [_format(result[name], fmt) for name, fmt in RESULT_COLUMNS]
+        changed = self.limits[col] != self.whatif.limits(col)
+        for j, text in enumerate(cells):
+            item = QTableWidgetItem(text)
+            if changed:
+                # 修改过规格限的列以粗体显示
+                font = item.font()
+                font.setBold(True)
+                item.setFont(font)
+            self.column_table.setItem(row, j, item)
+
+    def export_results(self):
+        """把所有数据列、各分组在候选规格限下的结果导出到Excel"""
+        file_path, _ = QFileDialog.getSaveFileName(self, "导出结果", "spec_whatif.xlsx",
+                                                   "Excel Files (*.xlsx)")
+        if not file_path:
+            return
+        with open(file_path, 'wb') as f:
+            write_statistics_workbook([('假设规格限', self.whatif.evaluate_all(self.limits))], f)
+        self.status.setText(f"已导出: {file_path}")
@@ -1,26 +1,42 @@
 from PyQt5.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
                            QPushButton, QFileDialog, QLabel, QCheckBox, 
-                           QGroupBox, QLineEdit, QProgressBar, QMessageBox)
+                           QGroupBox, QLineEdit, QProgressBar, QMessageBox,
+                           QTabWidget, QTableWidget, QTableWidgetItem)
 from PyQt5.QtCore import Qt, QThread, pyqtSignal
 import sys
 import os
+import sqlite3
 from ..analyzer import analyze_data
+from ..results_store import ResultsStore, get_results_db_path
+from ..progress import CancelToken, AnalysisCancelled, format_progress
+from .column_browser import ColumnBrowser, DataLoadThread
+from .limit_editor import LimitEditor
 import config
 
 class AnalysisThread(QThread):
     """分析线程类"""
-    finished = pyqtSignal(str)  # 发送输出目录路径
-    error = pyqtSignal(str)     # 发送错误信息
-    progress = pyqtSignal(str)  # 发送进度信息
+    finished = pyqtSignal(str)     # 发送输出目录路径
+    error = pyqtSignal(str)        # 发送错误信息
+    progress = pyqtSignal(object)  # 发送进度事件 ProgressEvent
+    cancelled = pyqtSignal()       # 分析被取消
 
     def __init__(self, config_obj):
         super().__init__()
         self.config = config_obj
+        self.cancel_token = CancelToken()
+
+    def cancel(self):
+        """请求在当前工作单元结束后停止分析"""
+        self.cancel_token.cancel()
 
     def run(self):
         try:
-            output_dir = analyze_data(self.config.DATA['path'], self.config)
+            output_dir = analyze_data(self.config.DATA['path'], self.config,
+                                      progress=self.progress.emit,
+                                      cancel=self.cancel_token)
             self.finished.emit(output_dir)
+        except AnalysisCancelled:
+            self.cancelled.emit()
         except Exception as e:
             self.error.emit(str(e))
 
@@ -30,9 +46,19 @@ class MainWindow(QMainWindow):
         self.setWindowTitle("数据分析工具")
         self.setMinimumSize(800, 600)
         
+        # 初始化配置对象
+        self.config = config
+        
         # 创建主窗口部件和布局
+        tabs = QTabWidget()
+        self.setCentralWidget(tabs)
         main_widget = QWidget()
-        self.setCentralWidget(main_widget)
+        tabs.addTab(main_widget, "批量分析")
+        tabs.addTab(self.create_browser_tab(), "交互浏览")
+        # 规格限假设使用交互浏览页加载的数据
+        self.limit_editor = LimitEditor(self.config)
+        tabs.addTab(self.limit_editor, "规格限假设")
+        tabs.addTab(self.create_trace_tab(), "SN追溯")
         layout = QVBoxLayout(main_widget)
         
         # 添加各个配置区域
@@ -45,9 +71,48 @@ class MainWindow(QMainWindow):
         # 添加运行按钮和进度条
         layout.addWidget(self.create_run_section())
         
-        # 初始化配置对象
-        self.config = config
+    def create_browser_tab(self):
+        """创建交互浏览页"""
+        tab = QWidget()
+        layout = QVBoxLayout(tab)
+        
+        load_layout = QHBoxLayout()
+        self.load_btn = QPushButton("加载数据")
+        self.load_btn.clicked.connect(self.load_browser_data)
+        self.browser_status = QLabel("请先在批量分析页选择数据文件，然后加载")
+        load_layout.addWidget(self.load_btn)
+        load_layout.addWidget(self.browser_status, 1)
         
+        self.browser = ColumnBrowser(self.config)
+        
+        layout.addLayout(load_layout)
+        layout.addWidget(self.browser, 1)
+        return tab
+    
+    def create_trace_tab(self):
+        """创建SN追溯页：在结果数据库中查询某个单元的历次测量"""
+        tab = QWidget()
+        layout = QVBoxLayout(tab)
+        
+        search_layout = QHBoxLayout()
+        self.trace_input = QLineEdit()
+        self.trace_input.setPlaceholderText("输入 SN 或 Camera_S")
+        self.trace_input.returnPressed.connect(self.search_trace)
+        search_btn = QPushButton("查询")
+        search_btn.clicked.connect(self.search_trace)
+        search_layout.addWidget(self.trace_input, 1)
+        search_layout.addWidget(search_btn)
+        
+        self.trace_status = QLabel("分析时开启 OUTPUT['sn_index'] 的数据可在此按SN查询")
+        # 每个数据列一行，每次测试一列，超限的值标红
+        self.trace_table = QTableWidget()
+        self.trace_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        
+        layout.addLayout(search_layout)
+        layout.addWidget(self.trace_status)
+        layout.addWidget(self.trace_table, 1)
+        return tab
+    
     def create_file_section(self):
         """创建文件选择区域"""
         group = QGroupBox("文件选择")
@@ -131,7 +196,7 @@ class MainWindow(QMainWindow):
         
         self.group_enabled_check = QCheckBox("启用分组分析")
         self.group_by_input = QLineEdit()
-        self.group_by_input.setPlaceholderText("输入分组列名")
+        self.group_by_input.setPlaceholderText("输入分组列名，多个列用逗号分隔")
         
         layout.addWidget(self.group_enabled_check)
         layout.addWidget(self.group_by_input)
@@ -144,12 +209,23 @@ class MainWindow(QMainWindow):
         group = QGroupBox("运行")
         layout = QVBoxLayout()
         
+        button_layout = QHBoxLayout()
         self.run_btn = QPushButton("开始分析")
         self.run_btn.clicked.connect(self.run_analysis)
+        self.cancel_btn = QPushButton("取消")
+        self.cancel_btn.clicked.connect(self.cancel_analysis)
+        self.cancel_btn.setEnabled(False)
+        button_layout.addWidget(self.run_btn)
+        button_layout.addWidget(self.cancel_btn)
+        
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 100)
+        self.progress_bar.setValue(0)
         
         self.status_label = QLabel("就绪")
         
-        layout.addWidget(self.run_btn)
+        layout.addLayout(button_layout)
+        layout.addWidget(self.progress_bar)
         layout.addWidget(self.status_label)
         
         group.setLayout(layout)
@@ -170,7 +246,8 @@ class MainWindow(QMainWindow):
         
         group_config = self.config.DATA_PROCESSING.get('group_analysis', {})
         self.group_enabled_check.setChecked(group_config.get('enabled', False))
-        self.group_by_input.setText(group_config.get('group_by', 'Line'))
+        group_by = group_config.get('group_by', 'Line')
+        self.group_by_input.setText(group_by if isinstance(group_by, str) else ', '.join(group_by))
 
     def browse_file(self):
         """打开文件选择对话框"""
@@ -197,22 +274,48 @@ class MainWindow(QMainWindow):
             
             # 禁用运行按钮
             self.run_btn.setEnabled(False)
+            self.cancel_btn.setEnabled(True)
+            self.progress_bar.setValue(0)
             self.status_label.setText("正在分析...")
             
             # 创建并启动分析线程
             self.analysis_thread = AnalysisThread(self.config)
             self.analysis_thread.finished.connect(self.analysis_completed)
             self.analysis_thread.error.connect(self.analysis_error)
+            self.analysis_thread.progress.connect(self.analysis_progress)
+            self.analysis_thread.cancelled.connect(self.analysis_cancelled)
             self.analysis_thread.start()
             
         except Exception as e:
             QMessageBox.critical(self, "错误", f"分析过程中出现错误：{str(e)}")
             self.run_btn.setEnabled(True)
+            self.cancel_btn.setEnabled(False)
             self.status_label.setText("分析失败")
 
+    def cancel_analysis(self):
+        """取消正在进行的分析"""
+        self.cancel_btn.setEnabled(False)
+        self.status_label.setText("正在取消...")
+        self.analysis_thread.cancel()
+
+    def analysis_progress(self, event):
+        """分析进度的回调函数"""
+        self.progress_bar.setValue(int(event.percent))
+        if not self.analysis_thread.cancel_token.cancelled:
+            self.status_label.setText(format_progress(event))
+
+    def analysis_cancelled(self):
+        """分析取消的回调函数"""
+        self.run_btn.setEnabled(True)
+        self.cancel_btn.setEnabled(False)
+        self.progress_bar.setValue(0)
+        self.status_label.setText("分析已取消")
+
     def analysis_completed(self, output_dir):
         """分析完成的回调函数"""
         self.run_btn.setEnabled(True)
+        self.cancel_btn.setEnabled(False)
+        self.progress_bar.setValue(100)
         self.status_label.setText("分析完成")
         
         reply = QMessageBox.information(
@@ -229,5 +332,80 @@ class MainWindow(QMainWindow):
     def analysis_error(self, error_msg):
         """分析错误的回调函数"""
         self.run_btn.setEnabled(True)
+        self.cancel_btn.setEnabled(False)
         self.status_label.setText("分析失败")
-        QMessageBox.critical(self, "错误", f"分析过程中出现错误：{error_msg}")
\ No newline at end of file
+        QMessageBox.critical(self, "错误", f"分析过程中出现错误：{error_msg}")
+
+    def search_trace(self):
+        """查询SN的历次测量并填入表格"""
+        key = self.trace_input.text().strip()
+        if not key:
+            return
+        db_path = get_results_db_path(self.file_path.text() or self.config.DATA['path'], self.config)
+        if not db_path or not os.path.isfile(db_path):
+            QMessageBox.warning(self, "警告", f"结果数据库不存在：{db_path or '未启用 results_db'}")
+            return
+        try:
+            with ResultsStore(db_path) as store:
+                history = store.unit_history(key)
+        except sqlite3.Error as e:
+            # 数据库损坏、被锁定或由不兼容的版本创建
+            QMessageBox.critical(self, "错误", f"查询结果数据库失败：{str(e)}")
+            return
+        self.trace_table.clear()
+        if history.empty:
+            self.trace_table.setRowCount(0)
+            self.trace_table.setColumnCount(0)
+            self.trace_status.setText(f"没有找到 {key} 的记录")
+            return
+        
+        # (run_id, row) 唯一确定一次测试，同一次运行中的重复测试各占一列
+        tests = history.drop_duplicates(['run_id', 'row']).reset_index(drop=True)
+        items = list(dict.fromkeys(history['item']))
+        self.trace_table.setRowCount(len(items))
+        self.trace_table.setColumnCount(len(tests))
+        self.trace_table.setVerticalHeaderLabels(items)
+        self.trace_table.setHorizontalHeaderLabels(
+            [f"#{row.run_id} {row.time or ''}\n{row.sn} {row.result}" for row in tests.itertuples()])
+        row_of = {item: i for i, item in enumerate(items)}
+        column_of = {(row.run_id, row.row): i for i, row in enumerate(tests.itertuples())}
+        for row in history.itertuples():
+            if row.value != row.value:  # NaN
+                continue
+            cell = QTableWidgetItem(f"{row.value:.3f}")
+            if row.value < row.lsl or row.value > row.usl:
+                cell.setForeground(Qt.red)
+            self.trace_table.setItem(row_of[row.item], column_of[(row.run_id, row.row)], cell)
+        self.trace_table.resizeColumnsToContents()
+        self.trace_status.setText(f"{key}: {len(tests)} 次测试，来自 {tests['run_id'].nunique()} 次分析")
+
+    def load_browser_data(self):
+        """在后台线程中加载并清理数据，完成后送入交互浏览面板"""
+        if not self.file_path.text():
+            QMessageBox.warning(self, "警告", "请先选择数据文件！")
+            return
+        
+        from .utils import update_config
+        self.config = update_config(self.config, self)
+        
+        self.load_btn.setEnabled(False)
+        self.browser_status.setText("正在加载数据...")
+        
+        self.load_thread = DataLoadThread(self.config.DATA['path'], self.config)
+        self.load_thread.finished.connect(self.browser_data_loaded)
+        self.load_thread.error.connect(self.browser_load_error)
+        self.load_thread.start()
+
+    def browser_data_loaded(self, df):
+        """数据加载完成的回调函数"""
+        self.load_btn.setEnabled(True)
+        self.browser.set_data(df)
+        self.limit_editor.set_data(df)
+        self.browser_status.setText(f"已加载 {len(self.browser.data_df)} 行, "
+                                    f"{len(self.browser.data_columns)} 个数据列")
+
+    def browser_load_error(self, error_msg):
+        """数据加载错误的回调函数"""
+        self.load_btn.setEnabled(True)
+        self.browser_status.setText("加载失败")
+        QMessageBox.critical(self, "错误", f"加载数据时出现错误：{error_msg}")
\ No newline at end of file
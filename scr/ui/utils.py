@@ -23,10 +23,11 @@ def update_config(config, ui):
         'remove_invalid': ui.remove_invalid_check.isChecked()
     })
     
-    # 更新分组分析配置
+    # 更新分组分析配置（多个分组列用逗号分隔）
+    group_columns = [col.strip() for col in ui.group_by_input.text().replace('，', ',').split(',') if col.strip()]
     config.DATA_PROCESSING['group_analysis'].update({
         'enabled': ui.group_enabled_check.isChecked(),
-        'group_by': ui.group_by_input.text() if ui.group_by_input.text() else 'Line'
+        'group_by': (group_columns[0] if len(group_columns) == 1 else group_columns) or 'Line'
     })
     
     return config 
\ No newline at end of file
@@ -0,0 +1,143 @@
+"""单元良率
+
+calculate_out_of_spec 按数据点累计超限数，一个单元有三项超限时计为3次，不能作为良率。
+这里从同一个超限矩阵（行 x 列，calculate_fail_matrix 一次广播比较得到）导出：
+    - 每个单元的 PASS/FAIL、超限项数和第一个超限的数据列（按数据列顺序）
+    - 每个数据列的超限单元数
+    - 整体和各分组的单元良率（通过单元数 / 单元数）
+    - 各分组每个数据列的超限单元数（供 NG 柏拉图使用）
+
+全部为矩阵上的归约（any、sum、argmax、reduceat），不需要按单元或按分组循环。
+"""
+import os
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+from .data_processing import calculate_fail_matrix, add_group_key, GROUP_KEY_SEPARATOR
+from .statistics_export import save_statistics_workbook, add_sheet_or_csv
+from .instrument import traced
+
+UNIT_YIELD_WORKBOOK_NAME = 'unit_yield.xlsx'
+
+@dataclass
+class UnitYield:
+    """单元良率
+
+    first_fail 为每个单元第一个超限的数据列位置（通过的单元为-1），
+    groups 为各分组的良率表（未分组时为None），group_item_ng 为各分组（行，与 groups
+    的顺序相同）每个数据列（列）的超限单元数。
+    """
+    sn: np.ndarray
+    data_columns: List[str]
+    fail_count: np.ndarray
+    first_fail: np.ndarray
+    item_ng: np.ndarray
+    groups: Optional[pd.DataFrame] = None
+    group_item_ng: Optional[np.ndarray] = None
+
+    @property
+    def units(self) -> int:
+        return len(self.fail_count)
+
+    @property
+    def failed_units(self) -> int:
+        return int((self.fail_count > 0).sum())
+
+    @property
+    def yield_rate(self) -> float:
+        """单元良率（0-1），没有单元时为0"""
+        return (self.units - self.failed_units) / self.units if self.units else 0.0
+
+    def unit_table(self) -> pd.DataFrame:
+        """每个单元一行：SN、Result（PASS/FAIL）、FailCount、FirstFail"""
+        failed = self.fail_count > 0
+        columns = np.asarray(self.data_columns + [''], dtype=object)
+        return pd.DataFrame({
+            'SN': self.sn,
+            'Result': np.where(failed, 'FAIL', 'PASS'),
+            'FailCount': self.fail_count,
+            # first_fail 为-1时取到末尾的空字符串
+            'FirstFail': columns[self.first_fail],
+        })
+
+    def item_table(self) -> pd.DataFrame:
+        """每个数据列一行：超限单元数、占全部单元的比例、作为第一个超限项的单元数"""
+        first = np.bincount(self.first_fail[self.first_fail >= 0], minlength=len(self.data_columns))
+        return pd.DataFrame({
+            'Items': self.data_columns,
+            'NG': self.item_ng,
+            'Rate': self.item_ng / self.units if self.units else np.zeros(len(self.data_columns)),
+            'FirstFailUnits': first,
+        })
+
+    def summary(self) -> pd.DataFrame:
+        """良率表：第一行为整体，其后为各分组"""
+        overall = pd.DataFrame({'Group': ['整体'], 'Units': [self.units],
+                                'Pass': [self.units - self.failed_units],
+                                'Fail': [self.failed_units], 'Yield': [self.yield_rate]})
+        if self.groups is None:
+            return overall
+        return pd.concat([overall, self.groups], ignore_index=True)
+
+def _group_yield(df: pd.DataFrame, index: pd.Index, fails: np.ndarray,
+                 group_columns: Sequence[str]) -> Tuple[pd.DataFrame, np.ndarray]:
+    """各分组的良率表和每个数据列的超限单元数（行按分组排序后 reduceat，不按分组循环）"""
+    key = GROUP_KEY_SEPARATOR.join(group_columns)
+    labels = add_group_key(df.loc[index, list(group_columns)], list(group_columns), key)[key]
+    codes, names = pd.factorize(labels, sort=True)
+    valid = np.flatnonzero(codes >= 0)
+    order = valid[np.argsort(codes[valid], kind='stable')]
+    sorted_codes = codes[order]
+    item_ng = np.zeros((len(names), fails.shape[1]), dtype=np.int64)
+    units = np.bincount(sorted_codes, minlength=len(names))
+    failed = np.zeros(len(names), dtype=np.int64)
+    if len(order):
+        starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+        present = sorted_codes[starts]
+        group_fails = fails[order]
+        item_ng[present] = np.add.reduceat(group_fails, starts, axis=0, dtype=np.int64)
+        failed[present] = np.add.reduceat(group_fails.any(axis=1), starts, dtype=np.int64)
+    table = pd.DataFrame({'Group': np.asarray(names, dtype=object), 'Units': units,
+                          'Pass': units - failed, 'Fail': failed,
+                          'Yield': np.where(units > 0, (units - failed) / np.maximum(units, 1), 0.0)})
+    return table, item_ng
+
+@traced('compute_unit_yield', 'stats')
+def compute_unit_yield(df: pd.DataFrame, prepared: tuple, data_columns: Sequence[str],
+                       group_columns: Optional[Sequence[str]] = None) -> UnitYield:
+    """由超限矩阵计算单元良率
+    Args:
+        df: 清理后的数据（含分组列）
+        prepared: preprocess_data 的结果
+        data_columns: 数据列
+        group_columns: 分组列，为空时不计算分组良率
+    Returns:
+        UnitYield
+    """
+    data_df, lsl_values, usl_values = prepared
+    data_columns = list(data_columns)
+    fails = calculate_fail_matrix(data_df, data_columns, lsl_values, usl_values)
+    fail_count = fails.sum(axis=1)
+    failed = fail_count > 0
+    # argmax 返回第一个True的位置；全为False的行也返回0，用 failed 区分
+    first_fail = np.where(failed, fails.argmax(axis=1) if fails.shape[1] else 0, -1)
+    item_ng = fails.sum(axis=0)
+    groups = group_item_ng = None
+    if group_columns and all(col in df.columns for col in group_columns):
+        groups, group_item_ng = _group_yield(df, data_df.index, fails, group_columns)
+    sn = data_df['SN'].to_numpy() if 'SN' in data_df.columns else np.asarray(data_df.index)
+    return UnitYield(sn, data_columns, fail_count, first_fail, item_ng, groups, group_item_ng)
+
+def export_unit_yield(result: UnitYield, output_dir: str, writer=None) -> List[str]:
+    """导出单元良率：unit_yield.xlsx（工作表“良率”、“数据列”和“单元”）
+
+    单元数超过Excel的行数上限时，“单元”改为写入 unit_yield_units.csv。
+    Returns:
+        List[str]: 写出的文件路径
+    """
+    units = result.unit_table()
+    sheets = [('良率', result.summary()), ('数据列', result.item_table())]
+    csv_path = add_sheet_or_csv(sheets, '单元', units, os.path.join(output_dir, 'unit_yield_units.csv'), writer)
+    path = save_statistics_workbook(sheets, os.path.join(output_dir, UNIT_YIELD_WORKBOOK_NAME), writer)
+    return [path] + ([csv_path] if csv_path else [])
@@ -1,4 +1,6 @@
 import os
+import shutil
+import threading
 import config
 
 def format_number(value):
@@ -26,6 +28,18 @@ def get_output_dir(input_path: str) -> str:
                              f"{input_filename}_output")
     return output_dir
 
+def copy_file(src: str, dest: str) -> None:
+    """复制文件到目标位置：先复制为同目录下的临时文件再替换，读取方不会看到写了一半的文件
+
+    不使用硬链接：输出文件与渲染缓存条目共享数据时，修改或覆盖其中一个会同时改变另一个。
+    Args:
+        src: 源文件路径
+        dest: 目标文件路径，已存在时被替换
+    """
+    tmp_path = f'{dest}.{os.getpid()}.{threading.get_ident()}.tmp'
+    shutil.copyfile(src, tmp_path)
+    os.replace(tmp_path, dest)
+
 def check_path(path: str) -> str:
     """验证文件路径是否存在且有效
     Args:
@@ -0,0 +1,270 @@
+"""监视文件夹并自动分析新的数据文件
+
+检测方式优先使用 watchdog（Linux 下为 inotify），未安装 watchdog 或指定 --poll 时
+退回到定时扫描。网络共享上的 inotify 事件并不可靠，因此即使使用 watchdog 也会
+定期做一次完整扫描。
+"""
+import os
+import sys
+import time
+import fnmatch
+import sqlite3
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Optional, Tuple
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:  # watchdog 为可选依赖
+    Observer = None
+    FileSystemEventHandler = object
+
+class ProcessedLedger:
+    """已处理文件的持久化记录
+
+    以（路径, 大小, 修改时间）为键，文件被修改后会被视为新文件重新分析。
+    """
+    def __init__(self, db_path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS processed (
+                path TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime REAL NOT NULL,
+                status TEXT NOT NULL,
+                output_dir TEXT,
+                error TEXT,
+                processed_at REAL NOT NULL,
+                PRIMARY KEY (path, size, mtime)
+            )
+        """)
+        self.conn.commit()
+
+    def is_processed(self, path: str, size: int, mtime: float) -> bool:
+        row = self.conn.execute(
+            "SELECT 1 FROM processed WHERE path = ? AND size = ? AND mtime = ?",
+            (path, size, mtime)
+        ).fetchone()
+        return row is not None
+
+    def record(self, path: str, size: int, mtime: float, status: str,
+               output_dir: Optional[str] = None, error: Optional[str] = None) -> None:
+        self.conn.execute(
+            "INSERT OR REPLACE INTO processed VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (path, size, mtime, status, output_dir, error, time.time())
+        )
+        self.conn.commit()
+
+    def close(self) -> None:
+        self.conn.close()
+
+class _ChangeHandler(FileSystemEventHandler):
+    """把 watchdog 事件转换为待检查的路径"""
+    def __init__(self, watcher):
+        self.watcher = watcher
+
+    def on_any_event(self, event):
+        if event.is_directory:
+            return
+        self.watcher.notify(getattr(event, 'dest_path', '') or event.src_path)
+
+class FolderWatcher:
+    """监视文件夹，在文件写入完成后用常驻的工作进程池分析
+
+    Args:
+        folder: 监视的文件夹
+        overrides: 配置覆盖值（见 scr.cli.load_config_overrides）
+        pattern: 文件名匹配模式
+        recursive: 是否监视子文件夹（任意层级下与输出子文件夹同名的文件夹始终被排除，
+            其中是各数据文件的分析结果）
+        jobs: 工作进程数，同时最多分析 jobs 个文件
+        settle_seconds: 文件大小和修改时间保持不变多久后才认为写入完成
+        poll_interval: 检查间隔（秒）
+        rescan_interval: 使用 watchdog 时完整扫描的间隔（秒）
+        ledger_path: 已处理记录的数据库路径
+        use_polling: 强制使用定时扫描
+        verbose: 是否把分析日志输出到标准错误
+    """
+    def __init__(self, folder: str, overrides: Dict[str, dict], pattern: str = '*.xlsx',
+                 recursive: bool = False, jobs: int = 1, settle_seconds: float = 5.0,
+                 poll_interval: float = 2.0, rescan_interval: float = 60.0,
+                 ledger_path: Optional[str] = None, use_polling: bool = False,
+                 verbose: bool = False):
+        import config
+        self.folder = os.path.abspath(folder)
+        self.overrides = overrides
+        self.pattern = pattern
+        self.recursive = recursive
+        self.jobs = max(1, jobs)
+        self.settle_seconds = settle_seconds
+        self.poll_interval = poll_interval
+        self.rescan_interval = rescan_interval
+        self.use_polling = use_polling or Observer is None
+        self.verbose = verbose
+
+        output_section = dict(config.OUTPUT)
+        output_section.update(overrides.get('OUTPUT', {}))
+        self.output_subfolder = output_section['subfolder']
+        self.output_root = os.path.join(self.folder, self.output_subfolder)
+        self.ledger = ProcessedLedger(ledger_path or os.path.join(self.output_root, 'processed.sqlite'))
+
+        self._dirty = set()
+        self._dirty_lock = threading.Lock()
+        # 路径 -> (大小, 修改时间, 该状态首次出现的时间)
+        self._candidates: Dict[str, Tuple[int, float, float]] = {}
+        self._running: Dict[object, Tuple[str, int, float]] = {}
+        # 已处理过的文件 -> (大小, 修改时间)，避免重复查询数据库
+        self._done: Dict[str, Tuple[int, float]] = {}
+
+    def notify(self, path: str) -> None:
+        """记录发生变化的路径（可在 watchdog 线程中调用）"""
+        with self._dirty_lock:
+            self._dirty.add(os.path.abspath(path))
+
+    def _matches(self, path: str) -> bool:
+        name = os.path.basename(path)
+        if name.startswith('~$'):  # Excel的锁文件
+            return False
+        relative = os.path.relpath(os.path.dirname(path), self.folder)
+        if relative != os.curdir:
+            if not self.recursive:
+                return False
+            # 子文件夹中的数据文件的结果写在其旁边的输出子文件夹中，同样要排除
+            parts = relative.split(os.sep)
+            if parts[0] == os.pardir or self.output_subfolder in parts:
+                return False
+        return fnmatch.fnmatch(name, self.pattern)
+
+    def _scan(self) -> None:
+        """完整扫描文件夹"""
+        if self.recursive:
+            for root, dirs, files in os.walk(self.folder):
+                dirs[:] = [d for d in dirs if d != self.output_subfolder]
+                for name in files:
+                    self.notify(os.path.join(root, name))
+        else:
+            with os.scandir(self.folder) as entries:
+                for entry in entries:
+                    if entry.is_file():
+                        self.notify(entry.path)
+
+    def _update_candidates(self, now: float) -> None:
+        with self._dirty_lock:
+            dirty, self._dirty = self._dirty, set()
+        for path in dirty:
+            if self._matches(path):
+                self._candidates.setdefault(path, (-1, -1.0, now))
+
+        for path in list(self._candidates):
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                del self._candidates[path]
+                continue
+            if self._done.get(path) == (stat.st_size, stat.st_mtime):
+                del self._candidates[path]
+                continue
+            size, mtime, since = self._candidates[path]
+            if (stat.st_size, stat.st_mtime) != (size, mtime):
+                # 文件仍在变化，重新计时
+                self._candidates[path] = (stat.st_size, stat.st_mtime, now)
+
+    @staticmethod
+    def _is_readable(path: str) -> bool:
+        """写入中的文件在Windows上通常无法以读方式打开"""
+        try:
+            with open(path, 'rb') as f:
+                f.read(1)
+            return True
+        except OSError:
+            return False
+
+    def _submit_ready(self, pool, now: float) -> None:
+        from .cli import analyze_file
+        running_paths = {item[0] for item in self._running.values()}
+        for path, (size, mtime, since) in list(self._candidates.items()):
+            if len(self._running) >= self.jobs:
+                break
+            if now - since < self.settle_seconds or path in running_paths:
+                continue
+            del self._candidates[path]
+            if size <= 0:
+                continue
+            if self.ledger.is_processed(path, size, mtime):
+                self._done[path] = (size, mtime)
+                continue
+            if not self._is_readable(path):
+                self._candidates[path] = (size, mtime, now)
+                continue
+            try:
+                future = pool.submit(analyze_file, path, self.overrides, self.verbose)
+            except BrokenProcessPool:
+                # 放回候选，进程池重建后立即提交
+                self._candidates[path] = (size, mtime, since)
+                raise
+            print(f"开始分析: {path}")
+            self._running[future] = (path, size, mtime)
+
+    def _collect_results(self) -> None:
+        for future in [f for f in self._running if f.done()]:
+            path, size, mtime = self._running.pop(future)
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {'status': 'error', 'error': f"{type(e).__name__}: {e}"}
+            self.ledger.record(path, size, mtime, result['status'],
+                               result.get('output_dir'), result.get('error'))
+            self._done[path] = (size, mtime)
+            if result['status'] == 'ok':
+                print(f"分析完成: {path} -> {result['output_dir']} ({result['elapsed']:.1f}秒)")
+            else:
+                print(f"分析失败: {path}: {result['error']}", file=sys.stderr)
+
+    def run(self, stop_event: Optional[threading.Event] = None) -> None:
+        """持续监视，直到 stop_event 被设置或收到 KeyboardInterrupt"""
+        from .cli import _init_worker
+        stop_event = stop_event or threading.Event()
+
+        observer = None
+        if not self.use_polling:
+            observer = Observer()
+            observer.schedule(_ChangeHandler(self), self.folder, recursive=self.recursive)
+            observer.start()
+        mode = '定时扫描' if observer is None else '文件系统事件'
+        print(f"正在监视 {self.folder} ({self.pattern}, {mode}, {self.jobs} 个工作进程)")
+
+        # 工作进程常驻，pandas/matplotlib 只在进程启动时导入一次
+        pool = ProcessPoolExecutor(max_workers=self.jobs, initializer=_init_worker)
+        last_scan = 0.0
+        try:
+            while not stop_event.is_set():
+                now = time.time()
+                rescan = self.poll_interval if observer is None else self.rescan_interval
+                if now - last_scan >= rescan:
+                    self._scan()
+                    last_scan = now
+                self._collect_results()
+                self._update_candidates(now)
+                try:
+                    self._submit_ready(pool, now)
+                except BrokenProcessPool:
+                    # 工作进程异常退出（例如被系统终止）后进程池不再可用，
+                    # 当时正在分析的文件以失败记录，其余文件在新的进程池中继续
+                    print("工作进程异常退出，重新创建进程池", file=sys.stderr)
+                    pool.shutdown(wait=False)
+                    self._collect_results()
+                    pool = ProcessPoolExecutor(max_workers=self.jobs, initializer=_init_worker)
+                    self._submit_ready(pool, now)
+                stop_event.wait(self.poll_interval)
+        except KeyboardInterrupt:
+            print("正在停止，等待进行中的分析完成...")
+        finally:
+            if observer is not None:
+                observer.stop()
+                observer.join()
+            pool.shutdown(wait=True)
+            self._collect_results()
+            self.ledger.close()
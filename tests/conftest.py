@@ -0,0 +1,31 @@
+import os
+import sys
+import copy
+import matplotlib
+import pytest
+
+# 从仓库根目录导入 config 和 scr，绘图使用非交互式后端
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+matplotlib.use('Agg')
+
+import config  # noqa: E402
+from scr.data_generator import DataGenerator  # noqa: E402
+
+@pytest.fixture
+def table():
+    """带LSL/USL规格行的生成数据：3条线，部分SN复测，部分值超出规格"""
+    return DataGenerator(num_rows=600, num_columns=8, nan_rate=0.02, repeat_rate=0.1, seed=7).generate_table()
+
+@pytest.fixture
+def data_columns(table):
+    from scr.data_processing import get_data_columns
+    return get_data_columns(table, config)
+
+@pytest.fixture
+def restore_config():
+    """测试中修改的配置段在测试结束后恢复"""
+    sections = {name: copy.deepcopy(value) for name, value in vars(config).items()
+                if name.isupper() and isinstance(value, dict)}
+    yield config
+    for name, value in sections.items():
+        setattr(config, name, value)
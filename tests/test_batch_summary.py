@@ -0,0 +1,48 @@
+import json
+import os
+import pytest
+import scr.cli
+from scr.cli import run_batch
+
+@pytest.fixture
+def data_files(table, tmp_path):
+    paths = []
+    for name in ('a.xlsx', 'b.xlsx'):
+        path = tmp_path / name
+        table.to_excel(path, index=False)
+        paths.append(str(path))
+    return paths
+
+def test_batch_summary_round_trips_through_json(data_files, restore_config):
+    # 分组分析（统计立方体）和复测分析的结果包含 DataFrame 和数组，不能进入摘要
+    overrides = {
+        'PLOT': {'enable_distribution': False, 'enable_boxplot': False, 'enable_correlation': False},
+        'DATA_PROCESSING': {'group_analysis': {'enabled': True, 'group_by': 'Line', 'cube': True},
+                            'retest': {'enabled': True}},
+        'OUTPUT': {'render_cache': False, 'results_db': False},
+    }
+    summary = run_batch(data_files, overrides, jobs=1)
+    assert summary['failed'] == 0, summary['files']
+
+    loaded = json.loads(json.dumps(summary, ensure_ascii=False))
+    assert loaded == summary
+    for item in loaded['files']:
+        assert item['status'] == 'ok'
+        assert 'cube' not in item and 'retest' not in item
+        assert 0 < item['first_pass_yield'] <= 1
+        assert item['final_yield'] > 0
+
+def _crash(path, overrides, verbose=False):
+    os._exit(1)
+
+def test_worker_crash_is_recorded_per_file(data_files, monkeypatch):
+    # 工作进程异常退出时进程池不可用，每个文件记录为失败而不是中断整个批量运行
+    monkeypatch.setattr(scr.cli, 'analyze_file', _crash)
+    summary = run_batch(data_files, {}, jobs=2)
+    assert summary['failed'] == len(data_files)
+    assert [item['data_path'] for item in summary['files']] == data_files
+    for item in summary['files']:
+        assert item['status'] == 'error'
+        assert item['error'].startswith('BrokenProcessPool')
+        assert item['elapsed'] >= 0
+    json.dumps(summary)
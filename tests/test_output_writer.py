@@ -0,0 +1,61 @@
+import os
+import zipfile
+import pandas as pd
+from scr import statistics_export
+from scr.output_writer import (ArchiveWriter, list_archive, read_archive_entry, write_output_bytes,
+                               MANIFEST_NAME)
+from scr.statistics_export import add_sheet_or_csv
+
+def _write_run(writer, tmp_path):
+    root = writer.begin(str(tmp_path / 'run_output'))
+    writer.submit_bytes(os.path.join(root, 'stats', 'a.csv'), b'x,y\n1,2\n')
+    # 直接写入输出目录的文件在关闭时收入归档
+    with open(os.path.join(root, 'trace.json'), 'w') as f:
+        f.write('{}')
+    writer.flush()
+    return writer.archive_path
+
+def test_archive_is_finalized_with_manifest(tmp_path):
+    writer = ArchiveWriter()
+    archive_path = _write_run(writer, tmp_path)
+    writer.close()
+    assert os.listdir(tmp_path) == ['run_output.zip']
+    names = [entry['name'] for entry in list_archive(archive_path)]
+    assert sorted(names) == ['stats/a.csv', 'trace.json']
+    assert read_archive_entry(archive_path, 'stats/a.csv') == b'x,y\n1,2\n'
+
+def test_failed_run_leaves_partial_archive(tmp_path):
+    writer = ArchiveWriter()
+    archive_path = _write_run(writer, tmp_path)
+    writer.close(failed=True)
+    # 再次关闭（analyze 的 finally）不会完成归档
+    writer.close()
+    assert not os.path.exists(archive_path)
+    with zipfile.ZipFile(f'{archive_path}.partial') as archive:
+        assert MANIFEST_NAME not in archive.namelist()
+
+def test_cancelled_run_discards_archive(tmp_path):
+    writer = ArchiveWriter()
+    _write_run(writer, tmp_path)
+    writer.close(discard=True)
+    assert os.listdir(tmp_path) == []
+
+def test_write_output_bytes_with_and_without_writer(tmp_path):
+    write_output_bytes(str(tmp_path / 'direct.bin'), b'abc')
+    assert (tmp_path / 'direct.bin').read_bytes() == b'abc'
+    writer = ArchiveWriter()
+    root = writer.begin(str(tmp_path / 'run_output'))
+    write_output_bytes(os.path.join(root, 'queued.bin'), b'xyz', writer)
+    writer.close()
+    assert read_archive_entry(writer.archive_path, 'queued.bin') == b'xyz'
+
+def test_large_table_goes_to_csv(tmp_path, monkeypatch):
+    monkeypatch.setattr(statistics_export, 'EXCEL_MAX_ROWS', 3)
+    sheets = []
+    small = pd.DataFrame({'a': [1, 2, 3]})
+    assert add_sheet_or_csv(sheets, '小表', small, str(tmp_path / 'small.csv')) is None
+    large = pd.DataFrame({'a': [1, 2, 3, 4]})
+    csv_path = add_sheet_or_csv(sheets, '大表', large, str(tmp_path / 'large.csv'))
+    assert [title for title, _ in sheets] == ['小表']
+    assert pd.read_csv(csv_path, encoding='utf-8-sig')['a'].tolist() == [1, 2, 3, 4]
+    assert not (tmp_path / 'small.csv').exists()
@@ -0,0 +1,77 @@
+import threading
+import time
+import pytest
+from scr.pipeline import TaskGraph, StageTimer, PYPLOT_LOCK
+
+def test_nodes_added_during_run_are_executed():
+    graph = TaskGraph()
+    graph.add('load', lambda: [1, 2, 3])
+
+    def plan(values):
+        # 按数据内容动态添加节点，新节点可以依赖已完成的节点
+        for i, value in enumerate(values):
+            graph.add(f'square:{i}', lambda v=value: v * v)
+        graph.add('total', lambda *squares: sum(squares),
+                  [f'square:{i}' for i in range(len(values))])
+        graph.add('report', lambda data, total: (len(data), total), ['load', 'total'])
+
+    graph.add('plan', plan, ['load'])
+    results = graph.run(max_workers=4)
+    assert results['total'] == 14
+    assert results['report'] == (3, 14)
+    assert list(graph.tasks)[:2] == ['load', 'plan']
+
+def test_duplicate_node_is_added_once():
+    graph = TaskGraph()
+    calls = []
+    graph.add('a', lambda: calls.append('first'))
+    assert graph.add('a', lambda: calls.append('second')) == 'a'
+    graph.run()
+    assert calls == ['first']
+
+def test_error_propagates_and_stops_dependents():
+    graph = TaskGraph()
+    executed = []
+
+    def fail():
+        raise RuntimeError('boom')
+
+    graph.add('bad', fail)
+    graph.add('after', lambda _: executed.append('after'), ['bad'])
+    with pytest.raises(RuntimeError, match='boom'):
+        graph.run(max_workers=2)
+    assert executed == []
+
+def test_missing_dependency_is_rejected():
+    graph = TaskGraph()
+    graph.add('a', lambda: 1)
+    with pytest.raises(ValueError):
+        graph.add('b', lambda a, c: a + c, ['a', 'c'])
+    assert list(graph.tasks) == ['a']
+
+def test_missing_dependency_added_during_run_is_raised():
+    graph = TaskGraph()
+    graph.add('plan', lambda: graph.add('late', lambda _: None, ['unknown']))
+    with pytest.raises(ValueError):
+        graph.run()
+
+def test_plot_timer_excludes_lock_wait():
+    graph = TaskGraph()
+    graph.add('draw', lambda: None, kind='plot', stage='plots')
+    timer = StageTimer()
+    acquired = threading.Event()
+
+    def hold_lock():
+        with PYPLOT_LOCK:
+            acquired.set()
+            time.sleep(0.3)
+
+    holder = threading.Thread(target=hold_lock)
+    holder.start()
+    acquired.wait()
+    start = time.perf_counter()
+    graph.run(listeners=[timer])
+    holder.join()
+    # 任务本身等待了锁，但阶段耗时只包含任务函数的执行时间
+    assert time.perf_counter() - start >= 0.2
+    assert timer.stage_seconds['plots'] < 0.1
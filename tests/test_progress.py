@@ -0,0 +1,33 @@
+from scr.pipeline import TaskGraph
+from scr.progress import ProgressTracker
+
+def _run(planning_task):
+    graph = TaskGraph()
+    for name in ('load', 'clean', 'columns'):
+        graph.add(name, lambda *_: None, [] if name == 'load' else ['load'])
+
+    def plan(*_):
+        # 规划节点追加的节点数远多于之前已有的节点
+        for i in range(20):
+            graph.add(f'plot:{i}', lambda: None, kind='plot')
+
+    graph.add('plan', plan, ['clean', 'columns'])
+    events = []
+    graph.run(max_workers=1, listeners=[ProgressTracker(events.append, planning_task)])
+    return events
+
+def test_percent_never_decreases_when_plan_adds_nodes():
+    events = _run('plan')
+    percents = [event.percent for event in events]
+    assert percents == sorted(percents)
+    assert percents[-1] == 100
+    # 规划节点结束前只计入固定份额，且不估计剩余时间
+    planned = next(i for i, event in enumerate(events) if event.kind == 'item' and event.item == 'plan')
+    assert all(event.percent <= ProgressTracker.planning_share * 100 for event in events[:planned])
+    assert all(event.eta is None for event in events[:planned])
+    assert events[-1].eta == 0
+
+def test_without_planning_task_counts_nodes():
+    events = _run(None)
+    assert [event.percent for event in events] == sorted(event.percent for event in events)
+    assert events[-1].percent == 100
@@ -0,0 +1,24 @@
+import os
+import config
+from scr.render_cache import RenderCache
+
+def test_fetched_figure_is_independent_of_cache_entry(tmp_path):
+    cache = RenderCache(str(tmp_path / 'cache'), config)
+    key = cache.make_key('a.png', 'digest')
+    source = tmp_path / 'rendered.png'
+    source.write_bytes(b'png')
+    cache.store(key, str(source))
+    assert not cache.fetch(cache.make_key('b.png'), str(tmp_path / 'b.png'))
+
+    output = tmp_path / 'out' / 'a.png'
+    output.parent.mkdir()
+    assert cache.fetch(key, str(output))
+    assert (cache.hits, cache.misses) == (1, 1)
+    # 输出文件和缓存条目不共享数据：覆盖输出的图表不会改变缓存
+    entry = cache.lookup(key)
+    assert not os.path.samefile(entry, output)
+    with open(output, 'wb') as f:
+        f.write(b'edited')
+    source.write_bytes(b'changed')
+    with open(entry, 'rb') as f:
+        assert f.read() == b'png'
@@ -0,0 +1,27 @@
+import pandas as pd
+import config
+from scr.analyzer import run_analysis
+from scr.results_store import ResultsStore
+
+def test_repeated_tests_at_same_time_stay_separate(table, data_columns, tmp_path, restore_config):
+    # 同一SN、同一时间的两次测试（例如重复上传的记录），测量值不同
+    spec = table['SN'].isin(['LSL', 'USL'])
+    unit = table[~spec & table[data_columns].notna().all(axis=1)].iloc[[0]]
+    repeat = unit.assign(**{data_columns[0]: unit[data_columns[0]] + 1})
+    path = tmp_path / 'data.xlsx'
+    pd.concat([table, repeat], ignore_index=True).to_excel(path, index=False)
+
+    db_path = str(tmp_path / 'results.sqlite')
+    config.PLOT.update({'enable_distribution': False, 'enable_boxplot': False, 'enable_correlation': False})
+    config.OUTPUT.update({'results_db': db_path, 'sn_index': True, 'render_cache': False})
+    run_analysis(str(path), config)
+
+    sn = unit['SN'].iloc[0]
+    with ResultsStore(db_path) as store:
+        tests = store.unit_tests(sn)
+        history = store.unit_history(sn)
+    assert len(tests) >= 2
+    assert history.groupby(['run_id', 'row']).ngroups == len(tests)
+    first = history[history['item'] == data_columns[0]]
+    repeated = first[first.duplicated('time', keep=False)]['value']
+    assert sorted(repeated - repeated.min()) == [0, 1]
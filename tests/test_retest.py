@@ -0,0 +1,36 @@
+import numpy as np
+import pandas as pd
+from scr.data_processing import preprocess_data
+from scr.retest import segment_index, compute_retest
+
+def test_segment_index_orders_by_sn_and_time():
+    sn = np.array(['B', 'A', 'B', None, 'A', 'C'], dtype=object)
+    times = np.array(['2024-01-03', '2024-01-02', '2024-01-01', '2024-01-01', 'NaT', '2024-01-05'],
+                     dtype='datetime64[ns]')
+    order, starts, ends = segment_index(sn, times)
+    # 各段按SN的首次出现顺序，段内按时间（NaT最早），空SN不属于任何段
+    segments = [order[s:e].tolist() for s, e in zip(starts, ends)]
+    assert segments == [[2, 0], [4, 1], [5]]
+
+def test_segment_index_without_times_keeps_row_order():
+    order, starts, ends = segment_index(np.array(['x', 'y', 'x', 'x'], dtype=object))
+    assert [order[s:e].tolist() for s, e in zip(starts, ends)] == [[0, 2, 3], [1]]
+
+def test_compute_retest_matches_groupby(table, data_columns):
+    prepared = preprocess_data(table)
+    result = compute_retest(table, prepared, data_columns)
+    data_df, lsl_values, usl_values = prepared
+    lsl = lsl_values[data_columns].astype(float)
+    usl = usl_values[data_columns].astype(float)
+    rows = table.loc[data_df.index, ['SN', 'Time']].assign(
+        Fail=((data_df[data_columns] < lsl) | (data_df[data_columns] > usl)).any(axis=1))
+    rows = rows.sort_values('Time', kind='stable')
+    first = rows.groupby('SN', sort=False)['Fail'].first()
+    final = rows.groupby('SN', sort=False)['Fail'].last()
+    assert result.units == len(first)
+    assert result.retested_units == int((rows['SN'].value_counts() > 1).sum())
+    assert result.retested_units > 0
+    np.testing.assert_allclose(result.first_pass_yield, 1 - first.mean())
+    np.testing.assert_allclose(result.final_yield, 1 - final.mean())
+    assert result.summary()['Tests'].iloc[0] == len(rows)
+    assert isinstance(result.unit_table(), pd.DataFrame)
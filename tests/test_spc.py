@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+from scr.spc import western_electric, WESTERN_ELECTRIC_RULES
+
+def _reference(z, rule):
+    """逐点检查：该点超出界限，且包含该点的最近 window 个点中至少 required 个在同一侧超出"""
+    window, required, limit = WESTERN_ELECTRIC_RULES[rule]
+    flags = np.zeros(len(z), dtype=bool)
+    for i in range(len(z)):
+        recent = z[max(0, i - window + 1):i + 1]
+        if z[i] > limit and (recent > limit).sum() >= required:
+            flags[i] = True
+        if z[i] < -limit and (recent < -limit).sum() >= required:
+            flags[i] = True
+    return flags
+
+@pytest.mark.parametrize('rule', [1, 2, 3, 4])
+def test_rules_match_reference(rule):
+    rng = np.random.default_rng(rule)
+    # 均值漂移的列更容易触发规则3、4
+    points = rng.normal(0, 1, (400, 3)) + np.array([0.0, 0.8, -1.2])
+    flags = western_electric(points, np.zeros(3), np.ones(3), [rule])[rule]
+    for j in range(points.shape[1]):
+        expected = _reference(points[:, j], rule)
+        assert expected.any()
+        assert (flags[:, j] == expected).all()
+
+def test_windows_do_not_span_sides():
+    # 交替在中心线两侧的点不触发规则4
+    points = np.tile([0.5, -0.5], 20)[:, None]
+    assert not western_electric(points, np.zeros(1), np.ones(1), [4])[4].any()
+    # 连续8点在同一侧时只有第8点及之后的点被标记
+    points = np.r_[np.full(10, 0.5), -0.5][:, None]
+    flags = western_electric(points, np.zeros(1), np.ones(1), [4])[4][:, 0]
+    assert flags.tolist() == [False] * 7 + [True] * 3 + [False]
+
+def test_rule_2_needs_two_of_three_on_same_side():
+    points = np.array([2.5, -2.5, 2.5, 0.0, 2.5, 2.5])[:, None]
+    flags = western_electric(points, np.zeros(1), np.ones(1), [2])[2][:, 0]
+    assert flags.tolist() == [False, False, True, False, True, True]
+
+def test_zero_sigma_flags_nothing():
+    points = np.ones((10, 1))
+    flags = western_electric(points, np.ones(1), np.zeros(1))
+    assert not any(flag.any() for flag in flags.values())
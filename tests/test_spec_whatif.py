@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+from scr.data_processing import preprocess_data, calculate_cpk, calculate_out_of_spec_column
+from scr.spec_whatif import SpecWhatIf, OVERALL_SCOPE
+
+@pytest.fixture
+def whatif(table, data_columns):
+    return SpecWhatIf(table, preprocess_data(table), data_columns, ['Line'])
+
+def _reference(values, lsl, usl):
+    ng = int(calculate_out_of_spec_column(values, lsl, usl))
+    cpk = calculate_cpk(values, usl, lsl)
+    return ng, np.nan if cpk is None else cpk
+
+@pytest.mark.parametrize('limits', [None, (60.0, 80.0), (None, 70.0), (55.5, None)])
+def test_evaluate_matches_reference(table, data_columns, whatif, limits):
+    data_df = preprocess_data(table)[0]
+    lines = table.loc[data_df.index, 'Line']
+    for col in data_columns:
+        lsl, usl = whatif.limits(col) if limits is None else limits
+        result = whatif.evaluate(col, lsl, usl).set_index('Group')
+        assert list(result.index) == [OVERALL_SCOPE, 'LineA', 'LineB', 'LineC']
+        for group in result.index:
+            values = data_df[col] if group == OVERALL_SCOPE else data_df.loc[lines == group, col]
+            ng, cpk = _reference(values, lsl, usl)
+            row = result.loc[group]
+            assert row['Test'] == len(values)
+            assert row['NG'] == ng
+            np.testing.assert_allclose(row['CPK'], cpk, rtol=1e-9, equal_nan=True)
+
+def test_limits_on_sample_values(table, data_columns, whatif):
+    # 规格限恰好等于某个测量值时该值不算超限（与 calculate_out_of_spec_column 相同）
+    col = data_columns[0]
+    values = preprocess_data(table)[0][col].dropna().to_numpy()
+    lsl, usl = np.sort(values)[[5, -5]]
+    overall = whatif.evaluate(col, lsl, usl).iloc[0]
+    assert overall['NG'] == (values < lsl).sum() + (values > usl).sum()
+
+def test_no_limits(whatif, data_columns):
+    result = whatif.evaluate(data_columns[0], None, float('nan'))
+    assert (result['NG'] == 0).all()
+    assert result['CPK'].isna().all()
+
+def test_evaluate_all_uses_original_limits(whatif, data_columns):
+    result = whatif.evaluate_all({data_columns[0]: (None, None)})
+    assert len(result) == 4 * len(data_columns)
+    first = result[result['Items'] == data_columns[0]]
+    assert (first['NG'] == 0).all()
+    second = result[result['Items'] == data_columns[1]].reset_index(drop=True)
+    expected = whatif.evaluate(data_columns[1], *whatif.limits(data_columns[1]))
+    assert second['NG'].tolist() == expected['NG'].tolist()
@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scr.data_processing import preprocess_data
+from scr.statistics_export import compute_statistics, STAT_COLUMNS
+from scr.stats_cube import build_stats_cube, CardinalityError
+
+def _assert_same_statistics(actual, expected):
+    actual = actual.set_index('Items').loc[expected['Items'], STAT_COLUMNS[1:]]
+    expected = expected.set_index('Items')[STAT_COLUMNS[1:]]
+    assert (actual['Test'].to_numpy() == expected['Test'].to_numpy()).all()
+    assert (actual['NG'].to_numpy() == expected['NG'].to_numpy()).all()
+    for col in ['Rate', 'LSL', 'USL', 'Mean', 'Std', 'CPK']:
+        np.testing.assert_allclose(actual[col].to_numpy(dtype=float), expected[col].to_numpy(dtype=float),
+                                   rtol=1e-9, atol=1e-12, equal_nan=True, err_msg=col)
+
+def _group_statistics(table, data_columns, mask):
+    spec = table['SN'].isin(['LSL', 'USL'])
+    return compute_statistics(preprocess_data(table[spec | mask]), data_columns)
+
+def test_overall_level_matches_compute_statistics(table, data_columns):
+    cube = build_stats_cube(table, preprocess_data(table), data_columns, ['Line'])
+    _assert_same_statistics(cube.level(), compute_statistics(preprocess_data(table), data_columns))
+
+def test_group_levels_match_compute_statistics(table, data_columns):
+    table = table.assign(Fixture=np.where(np.arange(len(table)) % 2 == 0, 'F1', 'F2'))
+    cube = build_stats_cube(table, preprocess_data(table), data_columns, ['Line', 'Fixture'])
+    for line in ['LineA', 'LineB', 'LineC']:
+        _assert_same_statistics(cube.slice(Line=line),
+                                _group_statistics(table, data_columns, table['Line'] == line))
+        for fixture in ['F1', 'F2']:
+            mask = (table['Line'] == line) & (table['Fixture'] == fixture)
+            _assert_same_statistics(cube.slice(Line=line, Fixture=fixture),
+                                    _group_statistics(table, data_columns, mask))
+    _assert_same_statistics(cube.slice(Fixture='F2'),
+                            _group_statistics(table, data_columns, table['Fixture'] == 'F2'))
+
+def test_cardinality_limit(table, data_columns):
+    table = table.assign(Unit=np.arange(len(table)).astype(str))
+    with pytest.raises(CardinalityError):
+        build_stats_cube(table, preprocess_data(table), data_columns, ['Unit'], max_combinations=10)
+
+def test_count_valid_matches_compute_statistics(table, data_columns):
+    prepared = preprocess_data(table)
+    # 生成的数据中有空值，排除模式下被排除的值同样为空
+    assert prepared[0][data_columns].isna().any().any()
+    expected = compute_statistics(prepared, data_columns, count_valid=True)
+    assert (expected['Test'].to_numpy() == prepared[0][data_columns].count().to_numpy()).all()
+    assert (expected['Test'] < len(prepared[0])).any()
+    cube = build_stats_cube(table, prepared, data_columns, ['Line'], count_valid=True)
+    _assert_same_statistics(cube.level(), expected)
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+from scr.time_windows import bucket_starts
+
+def _times(*texts):
+    return np.array(texts, dtype='datetime64[ns]')
+
+SHIFTS = [{'name': '白班', 'start': '08:00'}, {'name': '夜班', 'start': '20:00'}]
+
+def test_shift_wraps_past_midnight():
+    times = _times('2024-03-01T07:59', '2024-03-01T08:00', '2024-03-01T19:59',
+                   '2024-03-01T20:00', '2024-03-02T00:00', '2024-03-02T01:00', '2024-03-02T08:00')
+    starts, ids = bucket_starts(times, 'shift', SHIFTS)
+    # 08:00 之前的数据属于前一天开始的夜班
+    assert starts.tolist() == _times('2024-02-29T20:00', '2024-03-01T08:00', '2024-03-01T08:00',
+                                     '2024-03-01T20:00', '2024-03-01T20:00', '2024-03-01T20:00',
+                                     '2024-03-02T08:00').tolist()
+    assert ids.tolist() == [1, 0, 0, 1, 1, 1, 0]
+
+def test_shift_order_independent_of_calendar_order():
+    times = _times('2024-03-01T03:00', '2024-03-01T12:00')
+    starts, ids = bucket_starts(times, 'shift', SHIFTS[::-1])
+    assert starts.tolist() == _times('2024-02-29T20:00', '2024-03-01T08:00').tolist()
+    # 班次序号按开始时间排序
+    assert ids.tolist() == [1, 0]
+
+def test_three_shifts():
+    shifts = [{'name': 'A', 'start': '06:00'}, {'name': 'B', 'start': '14:00'}, {'name': 'C', 'start': '22:00'}]
+    times = _times('2024-01-01T05:59', '2024-01-01T06:00', '2024-01-01T21:59', '2024-01-01T23:30')
+    starts, ids = bucket_starts(times, 'shift', shifts)
+    assert starts.tolist() == _times('2023-12-31T22:00', '2024-01-01T06:00',
+                                     '2024-01-01T14:00', '2024-01-01T22:00').tolist()
+    assert ids.tolist() == [2, 0, 1, 2]
+
+def test_day_and_iso_week():
+    times = _times('2024-01-01T23:59', '2024-01-07T12:00', '2024-01-08T00:00', '2023-12-31T10:00')
+    days, ids = bucket_starts(times, 'day')
+    assert ids is None
+    assert days.tolist() == _times('2024-01-01', '2024-01-07', '2024-01-08', '2023-12-31').tolist()
+    # ISO周从周一开始：2024-01-01 是周一，2023-12-31 是周日
+    weeks, _ = bucket_starts(times, 'week')
+    assert weeks.tolist() == _times('2024-01-01', '2024-01-01', '2024-01-08', '2023-12-25').tolist()
+
+def test_unknown_rule():
+    with pytest.raises(ValueError):
+        bucket_starts(_times('2024-01-01'), 'month')
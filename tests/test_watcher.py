@@ -0,0 +1,68 @@
+import os
+import pytest
+from concurrent.futures.process import BrokenProcessPool
+from scr.watcher import FolderWatcher
+
+def _touch(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(b'data')
+    return path
+
+@pytest.fixture
+def watcher_factory(tmp_path):
+    watchers = []
+
+    def create(**kwargs):
+        watcher = FolderWatcher(str(tmp_path / 'in'), {'OUTPUT': {'subfolder': 'output'}},
+                                ledger_path=str(tmp_path / 'ledger.sqlite'),
+                                use_polling=True, **kwargs)
+        watchers.append(watcher)
+        return watcher
+
+    yield create
+    for watcher in watchers:
+        watcher.ledger.close()
+
+def test_nested_output_folders_are_excluded(watcher_factory):
+    watcher = watcher_factory(recursive=True)
+    folder = watcher.folder
+    assert watcher._matches(os.path.join(folder, 'a.xlsx'))
+    assert watcher._matches(os.path.join(folder, 'line1', 'b.xlsx'))
+    # 子文件夹中的数据文件的结果写在 line1/output 下
+    assert not watcher._matches(os.path.join(folder, 'output', 'unit_yield.xlsx'))
+    assert not watcher._matches(os.path.join(folder, 'line1', 'output', 'b_output_1', 'unit_yield.xlsx'))
+    assert not watcher._matches(os.path.join(folder, 'line1', '~$b.xlsx'))
+    assert not watcher._matches(os.path.join(os.path.dirname(folder), 'other.xlsx'))
+
+def test_non_recursive_only_matches_top_level(watcher_factory):
+    watcher = watcher_factory()
+    assert watcher._matches(os.path.join(watcher.folder, 'a.xlsx'))
+    assert not watcher._matches(os.path.join(watcher.folder, 'line1', 'b.xlsx'))
+    assert not watcher._matches(os.path.join(watcher.folder, 'a.csv'))
+
+def test_scan_prunes_nested_output_folders(watcher_factory):
+    watcher = watcher_factory(recursive=True)
+    folder = watcher.folder
+    expected = {_touch(os.path.join(folder, 'a.xlsx')),
+                _touch(os.path.join(folder, 'line1', 'b.xlsx'))}
+    _touch(os.path.join(folder, 'output', 'a_output_1', 'unit_yield.xlsx'))
+    _touch(os.path.join(folder, 'line1', 'output', 'b_output_1', 'unit_yield.xlsx'))
+    watcher._scan()
+    assert watcher._dirty == expected
+
+def test_submit_to_broken_pool_keeps_candidate(watcher_factory):
+    watcher = watcher_factory(settle_seconds=0)
+    path = _touch(os.path.join(watcher.folder, 'a.xlsx'))
+    stat = os.stat(path)
+    watcher._candidates[path] = (stat.st_size, stat.st_mtime, 0.0)
+
+    class BrokenPool:
+        def submit(self, *args):
+            raise BrokenProcessPool('worker died')
+
+    with pytest.raises(BrokenProcessPool):
+        watcher._submit_ready(BrokenPool(), 10.0)
+    # 文件仍在候选中，进程池重建后会被重新提交
+    assert watcher._candidates[path] == (stat.st_size, stat.st_mtime, 0.0)
+    assert not watcher._running